@@ -9,10 +9,12 @@ from app.config import settings
 # Création du moteur de base de données
 engine = create_engine(
     settings.DATABASE_URL,
-    echo=settings.DEBUG,
+    echo=settings.SQL_ECHO,
     pool_pre_ping=True,  # Vérifie la connexion avant utilisation
-    pool_size=10,
-    max_overflow=20
+    pool_size=settings.POOL_SIZE,
+    max_overflow=settings.MAX_OVERFLOW,
+    pool_recycle=settings.POOL_RECYCLE,  # Évite les connexions PostgreSQL périmées
+    pool_timeout=settings.POOL_TIMEOUT
 )
 
 # Session locale
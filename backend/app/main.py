@@ -5,12 +5,16 @@ Description: API REST pour analyses géospatiales et visualisation LIDAR
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
+from functools import lru_cache
+from sqlalchemy import text
+import time
 
 
-from app.routers import spatial_analysis, lidar, simulation
-from app.routers import lidar_advanced as lidar
+from app.routers import spatial_analysis, lidar, lidar_advanced, simulation, simulation_advanced
 from app.database import engine, Base
 from app.config import settings
 
@@ -42,6 +46,7 @@ app = FastAPI(
     """,
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,  # Sérialisation orjson (rapide sur les données numériques)
     docs_url="/api/docs",
     redoc_url="/api/redoc"
 )
@@ -55,6 +60,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compression gzip des réponses JSON (les réponses binaires fixent Content-Encoding: identity)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=6)
+
 # Inclusion des routers
 app.include_router(
     spatial_analysis.router,
@@ -62,7 +70,12 @@ app.include_router(
     tags=["Analyses Spatiales"]
 )
 
-# Ajouter le router
+app.include_router(
+    lidar.router,
+    prefix="/api/lidar",
+    tags=["LIDAR"]
+)
+
 app.include_router(
     lidar_advanced.router,
     prefix="/api/lidar/advanced",
@@ -70,11 +83,18 @@ app.include_router(
 )
 
 app.include_router(
-    simulation.router,
+    simulation_advanced.router,
     prefix="/api/simulation",
     tags=["Simulations"]
 )
 
+# Version simplifiée (démo) des simulations, conservée pour les anciens clients
+app.include_router(
+    simulation.router,
+    prefix="/api/simulation/basic",
+    tags=["Simulations (basique)"]
+)
+
 
 @app.get("/", tags=["Health"])
 async def root():
@@ -87,18 +107,21 @@ async def root():
     }
 
 
-@app.get("/api/health", tags=["Health"])
-async def health_check():
-    """Vérification de l'état de l'API et de la base de données"""
+@lru_cache(maxsize=1)
+def _database_status(second: int) -> str:
+    """Test de connexion à la base, mis en cache une seconde (clé = horodatage entier)"""
     try:
-        from app.database import SessionLocal
-        db = SessionLocal()
-        # Test simple de connexion
-        db.execute("SELECT 1")
-        db.close()
-        db_status = "connected"
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return "connected"
     except Exception as e:
-        db_status = f"error: {str(e)}"
+        return f"error: {str(e)}"
+
+
+@app.get("/api/health", tags=["Health"])
+def health_check():
+    """Vérification de l'état de l'API et de la base de données"""
+    db_status = _database_status(int(time.time()))
     
     return {
         "api": "healthy",
@@ -108,10 +131,14 @@ async def health_check():
 
 
 if __name__ == "__main__":
+    # Développement uniquement ; en production : gunicorn app.main:app -c gunicorn_conf.py
     import uvicorn
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True
+        reload=True,
+        loop="uvloop",
+        http="httptools",
+        limit_concurrency=500
     )
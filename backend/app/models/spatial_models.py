@@ -1,6 +1,7 @@
 """Modèles de données spatiales avec PostGIS"""
-from sqlalchemy import Column, Integer, String, Float, DateTime, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, Index
 from sqlalchemy.sql import func
+from sqlalchemy.dialects.postgresql import JSONB
 from geoalchemy2 import Geometry
 from app.database import Base
 
@@ -15,12 +16,16 @@ class SpatialFeature(Base):
     description = Column(String)
     
     # Géométrie (peut être Point, LineString, Polygon, etc.)
-    geom = Column(Geometry(geometry_type='GEOMETRY', srid=4326))
+    geom = Column(Geometry(geometry_type='GEOMETRY', srid=4326, spatial_index=False))
     
     # Métadonnées
     properties = Column(JSON)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    __table_args__ = (
+        Index("ix_spatial_features_geom_spgist", "geom", postgresql_using="spgist"),
+    )
 
 
 class Building(Base):
@@ -34,9 +39,13 @@ class Building(Base):
     floors = Column(Integer)
     
     # Géométrie 2D (empreinte au sol)
-    geom = Column(Geometry(geometry_type='POLYGON', srid=4326))
+    geom = Column(Geometry(geometry_type='POLYGON', srid=4326, spatial_index=False))
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_buildings_geom_spgist", "geom", postgresql_using="spgist"),
+    )
 
 
 class LidarData(Base):
@@ -53,15 +62,32 @@ class LidarData(Base):
     max_elevation = Column(Float)
     
     # Emprise géographique
-    bounds = Column(Geometry(geometry_type='POLYGON', srid=4326))
+    bounds = Column(Geometry(geometry_type='POLYGON', srid=4326, spatial_index=False))
     
     # Métadonnées
     crs = Column(String(100))
     point_format = Column(String(50))
-    metadata = Column(JSON)
+    lidar_metadata = Column("metadata", JSONB)  # "metadata" est réservé par le modèle déclaratif
+    class_histogram = Column(JSONB)  # Nombre de points par code de classification LAS
     
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
     processed = Column(Integer, default=0)  # 0: non traité, 1: traité
+    
+    __table_args__ = (
+        # SP-GiST plutôt que GiST : partitionnement sans recouvrement des emprises
+        Index("ix_lidar_bounds_spgist", "bounds", postgresql_using="spgist"),
+        # Insertions en ordre chronologique : un index BRIN suffit pour le tri/filtre par date
+        Index(
+            "ix_lidar_uploaded_at_brin",
+            "uploaded_at",
+            postgresql_using="brin",
+            postgresql_with={"pages_per_range": 32}
+        ),
+        # Filtres sur les métadonnées (opérateur @>)
+        Index("ix_lidar_meta_gin", "metadata", postgresql_using="gin"),
+        # Recherche des fichiers à traiter (processed = 0) par les tâches de fond
+        Index("ix_lidar_processed_id", "processed", "id"),
+    )
 
 
 class AnalysisResult(Base):
@@ -91,7 +117,7 @@ class SimulationResult(Base):
     name = Column(String(255))
     
     # Zone d'étude
-    area_geom = Column(Geometry(geometry_type='POLYGON', srid=4326))
+    area_geom = Column(Geometry(geometry_type='POLYGON', srid=4326, spatial_index=False))
     
     # Paramètres de simulation
     parameters = Column(JSON)
@@ -102,3 +128,7 @@ class SimulationResult(Base):
     statistics = Column(JSON)
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_simulation_results_area_geom_spgist", "area_geom", postgresql_using="spgist"),
+    )
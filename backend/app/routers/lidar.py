@@ -1,9 +1,16 @@
 """Router pour le traitement LIDAR"""
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, BackgroundTasks, Response
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy import func, insert
+from geoalchemy2.shape import to_shape
+from typing import List, Optional, Tuple
 import laspy
 import numpy as np
+import asyncio
+import os
+import shutil
+from functools import lru_cache
 from pathlib import Path
 import json
 from datetime import datetime
@@ -11,9 +18,142 @@ from datetime import datetime
 from app.database import get_db
 from app.models.spatial_models import LidarData
 from app.config import settings
+from app.utils.point_cloud import xyz_bounds
+from app.utils.upload import read_header, save_upload
+from app.routers.lidar_advanced import _evict_processor
 
 router = APIRouter()
 
+# Nombre de points décodés par bloc lors des lectures LAS en streaming
+READ_CHUNK_SIZE = 1_000_000
+
+# Noms de classes standards LAS
+CLASS_NAMES = {
+    0: "Never classified",
+    1: "Unassigned",
+    2: "Ground",
+    3: "Low Vegetation",
+    4: "Medium Vegetation",
+    5: "High Vegetation",
+    6: "Building",
+    7: "Low Point",
+    9: "Water",
+    17: "Bridge Deck"
+}
+
+
+def _header_bounds(filepath, header: laspy.LasHeader) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Emprise (mins, maxs) du fichier LAS
+    
+    Utilise l'en-tête s'il est renseigné ; sinon recalcule l'emprise en une seule
+    passe par bloc (noyau Numba fusionnant les six min/max).
+    """
+    mins = np.asarray(header.mins, dtype=np.float64)
+    maxs = np.asarray(header.maxs, dtype=np.float64)
+    if np.all(maxs >= mins) and (np.any(mins != 0) or np.any(maxs != 0)):
+        return mins, maxs
+    
+    mins = np.full(3, np.inf)
+    maxs = np.full(3, -np.inf)
+    with laspy.open(filepath) as reader:
+        for chunk in reader.chunk_iterator(READ_CHUNK_SIZE):
+            bounds = xyz_bounds(np.asarray(chunk.x), np.asarray(chunk.y), np.asarray(chunk.z))
+            mins = np.minimum(mins, bounds[0::2])
+            maxs = np.maximum(maxs, bounds[1::2])
+    
+    return mins, maxs
+
+
+@lru_cache(maxsize=16)
+def _cached_header_summary(filepath: str, mtime: float) -> Tuple[int, Tuple[float, ...], Tuple[float, ...]]:
+    """(point_count, mins, maxs) d'un fichier, mis en cache par (chemin, date de modification)"""
+    header = read_header(filepath)
+    mins, maxs = _header_bounds(filepath, header)
+    return int(header.point_count), tuple(float(v) for v in mins), tuple(float(v) for v in maxs)
+
+
+def _header_summary(filepath) -> Tuple[int, Tuple[float, ...], Tuple[float, ...]]:
+    """Résumé d'en-tête, invalidé automatiquement si le fichier est modifié"""
+    return _cached_header_summary(str(filepath), os.path.getmtime(filepath))
+
+
+def _read_sampled_points(filepath: str, indices: np.ndarray,
+                         chunk_size: int = READ_CHUNK_SIZE) -> dict:
+    """
+    Lit uniquement les points d'indices donnés (triés) en parcourant le fichier par blocs
+    
+    La mémoire reste bornée à O(chunk_size + k) au lieu de décoder tout le nuage.
+    """
+    k = len(indices)
+    sample = {
+        "x": np.empty(k, dtype=np.float64),
+        "y": np.empty(k, dtype=np.float64),
+        "z": np.empty(k, dtype=np.float64),
+        "classification": np.empty(k, dtype=np.uint8),
+        "intensity": np.empty(k, dtype=np.uint16),
+    }
+    
+    with laspy.open(filepath) as reader:
+        offset = 0
+        for chunk in reader.chunk_iterator(chunk_size):
+            # Indices échantillonnés tombant dans [offset, offset + len(chunk))
+            start = np.searchsorted(indices, offset)
+            end = np.searchsorted(indices, offset + len(chunk))
+            if end > start:
+                local = indices[start:end] - offset
+                sample["x"][start:end] = chunk.x[local]
+                sample["y"][start:end] = chunk.y[local]
+                sample["z"][start:end] = chunk.z[local]
+                sample["classification"][start:end] = chunk.classification[local]
+                sample["intensity"][start:end] = chunk.intensity[local]
+            offset += len(chunk)
+            if end == k:
+                break
+    
+    return sample
+
+
+def _sample_to_arrow(sample: dict, bounds: dict) -> bytes:
+    """
+    Sérialise un échantillon en flux Arrow IPC
+    
+    Les coordonnées sont décalées sur (min_x, min_y, min_z) avant la conversion en
+    float32 pour conserver une précision centimétrique sur des coordonnées projetées.
+    """
+    import pyarrow as pa
+    
+    table = pa.table({
+        "x": (sample["x"] - bounds["min_x"]).astype(np.float32),
+        "y": (sample["y"] - bounds["min_y"]).astype(np.float32),
+        "z": (sample["z"] - bounds["min_z"]).astype(np.float32),
+        "classification": sample["classification"],
+        "intensity": sample["intensity"],
+    })
+    table = table.replace_schema_metadata({"bounds": json.dumps(bounds)})
+    
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    
+    return sink.getvalue().to_pybytes()
+
+
+def _class_histogram(filepath: str, chunk_size: int = READ_CHUNK_SIZE) -> List[int]:
+    """Histogramme des classes LAS (nombre de points par code) calculé par blocs"""
+    histogram = np.zeros(32, dtype=np.int64)
+    
+    with laspy.open(filepath) as reader:
+        for chunk in reader.chunk_iterator(chunk_size):
+            counts = np.bincount(
+                np.asarray(chunk.classification, dtype=np.uint8), minlength=len(histogram)
+            )
+            if len(counts) > len(histogram):
+                histogram = np.pad(histogram, (0, len(counts) - len(histogram)))
+            histogram += counts
+    
+    return histogram.tolist()
+
 
 @router.post("/upload")
 async def upload_lidar_file(
@@ -42,65 +182,57 @@ async def upload_lidar_file(
         safe_filename = f"{timestamp}_{file.filename}"
         filepath = lidar_dir / safe_filename
         
-        content = await file.read()
-        
-        # Vérification de la taille
-        if len(content) > settings.MAX_UPLOAD_SIZE:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Fichier trop volumineux (max {settings.MAX_UPLOAD_SIZE / 1024 / 1024} MB)"
-            )
-        
-        with open(filepath, "wb") as f:
-            f.write(content)
+        # Copie hors de la boucle d'événements, taille limitée (HTTP 400 au-delà)
+        await save_upload(file, filepath)
         
-        # Lecture des métadonnées LIDAR
-        las = laspy.read(filepath)
+        # Lecture de l'en-tête LIDAR uniquement (pas de décompression des points)
+        header = await asyncio.to_thread(read_header, filepath)
+        mins, maxs = await asyncio.to_thread(_header_bounds, filepath, header)
         
         # Extraction des informations
-        min_elevation = float(las.z.min())
-        max_elevation = float(las.z.max())
-        point_count = len(las.points)
+        point_count = int(header.point_count)
+        min_x, min_y, min_elevation = (float(v) for v in mins)
+        max_x, max_y, max_elevation = (float(v) for v in maxs)
         
-        # Calcul de l'emprise (bounding box)
-        min_x, max_x = float(las.x.min()), float(las.x.max())
-        min_y, max_y = float(las.y.min()), float(las.y.max())
-        
-        # Création du polygon bounds en WKT
-        bounds_wkt = f"SRID=4326;POLYGON(({min_x} {min_y},{max_x} {min_y},{max_x} {max_y},{min_x} {max_y},{min_x} {min_y}))"
+        # Emprise construite par PostGIS à partir de 4 valeurs liées (pas de WKT)
+        bounds_geom = func.ST_MakeEnvelope(min_x, min_y, max_x, max_y, 4326)
         
         # Métadonnées complètes
         metadata = {
-            "point_format": str(las.point_format),
-            "version": f"{las.header.version.major}.{las.header.version.minor}",
-            "creation_date": str(las.header.creation_date) if las.header.creation_date else None,
-            "system_identifier": las.header.system_identifier,
-            "generating_software": las.header.generating_software,
-            "scales": [float(las.header.x_scale), float(las.header.y_scale), float(las.header.z_scale)],
-            "offsets": [float(las.header.x_offset), float(las.header.y_offset), float(las.header.z_offset)]
+            "point_format": str(header.point_format),
+            "version": f"{header.version.major}.{header.version.minor}",
+            "creation_date": str(header.creation_date) if header.creation_date else None,
+            "system_identifier": header.system_identifier,
+            "generating_software": header.generating_software,
+            "scales": [float(v) for v in header.scales],
+            "offsets": [float(v) for v in header.offsets]
         }
+        crs = header.parse_crs()
+        
+        # Histogramme des classes, calculé une seule fois et mis en cache en base
+        class_histogram = await asyncio.to_thread(_class_histogram, filepath)
         
-        # Sauvegarde en base de données
-        lidar_entry = LidarData(
+        # Sauvegarde en base de données (INSERT ... RETURNING : un seul aller-retour)
+        stmt = insert(LidarData).values(
             filename=safe_filename,
             filepath=str(filepath),
             point_count=point_count,
             min_elevation=min_elevation,
             max_elevation=max_elevation,
-            bounds=bounds_wkt,
-            crs=las.header.parse_crs().to_string() if las.header.parse_crs() else "Unknown",
-            point_format=str(las.point_format),
-            metadata=metadata,
+            bounds=bounds_geom,
+            crs=crs.to_string() if crs else "Unknown",
+            point_format=str(header.point_format),
+            lidar_metadata=metadata,
+            class_histogram=class_histogram,
             processed=0
-        )
+        ).returning(LidarData.id)
         
-        db.add(lidar_entry)
+        lidar_id = db.execute(stmt).scalar_one()
         db.commit()
-        db.refresh(lidar_entry)
         
         return {
             "status": "success",
-            "lidar_id": lidar_entry.id,
+            "lidar_id": lidar_id,
             "filename": safe_filename,
             "point_count": point_count,
             "elevation_range": {
@@ -116,6 +248,8 @@ async def upload_lidar_file(
             "message": "Fichier LIDAR uploadé avec succès"
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Erreur lors de l'upload: {str(e)}")
@@ -148,7 +282,7 @@ async def list_lidar_files(db: Session = Depends(get_db)):
 @router.get("/files/{lidar_id}")
 async def get_lidar_info(lidar_id: int, db: Session = Depends(get_db)):
     """Informations détaillées sur un fichier LIDAR"""
-    lidar = db.query(LidarData).filter(LidarData.id == lidar_id).first()
+    lidar = db.get(LidarData, lidar_id)
     
     if not lidar:
         raise HTTPException(status_code=404, detail="Fichier LIDAR non trouvé")
@@ -163,7 +297,7 @@ async def get_lidar_info(lidar_id: int, db: Session = Depends(get_db)):
         },
         "crs": lidar.crs,
         "point_format": lidar.point_format,
-        "metadata": lidar.metadata,
+        "metadata": lidar.lidar_metadata,
         "uploaded_at": lidar.uploaded_at.isoformat()
     }
 
@@ -172,61 +306,63 @@ async def get_lidar_info(lidar_id: int, db: Session = Depends(get_db)):
 async def get_lidar_sample(
     lidar_id: int,
     sample_size: int = 10000,
+    format: str = "json",  # json, arrow
     db: Session = Depends(get_db)
 ):
     """
     Récupère un échantillon de points LIDAR pour visualisation 3D
     
     - **sample_size**: Nombre de points à retourner (max 50000)
+    - **format**: `json` (défaut) ou `arrow` (flux Arrow IPC binaire, coordonnées
+      float32 relatives à l'origine `min_x/min_y/min_z` indiquée dans les métadonnées)
     """
-    lidar = db.query(LidarData).filter(LidarData.id == lidar_id).first()
+    lidar = db.get(LidarData, lidar_id)
     
     if not lidar:
         raise HTTPException(status_code=404, detail="Fichier LIDAR non trouvé")
     
     try:
-        # Lecture du fichier LIDAR
-        las = laspy.read(lidar.filepath)
+        # Nombre de points et emprise depuis l'en-tête (en cache entre les requêtes)
+        point_count, mins, maxs = await asyncio.to_thread(_header_summary, lidar.filepath)
+        min_x, min_y, min_z = mins
+        max_x, max_y, max_z = maxs
         
         # Limite de sécurité
-        sample_size = min(sample_size, 50000, len(las.points))
+        sample_size = min(sample_size, 50000, point_count)
         
-        # Échantillonnage aléatoire
-        indices = np.random.choice(len(las.points), sample_size, replace=False)
+        # Échantillonnage aléatoire sans remise (Floyd, O(k) au lieu d'une permutation O(N))
+        rng = np.random.default_rng()
+        indices = np.sort(rng.choice(point_count, size=sample_size, replace=False, shuffle=False))
         
-        # Extraction des coordonnées
-        x = las.x[indices].tolist()
-        y = las.y[indices].tolist()
-        z = las.z[indices].tolist()
+        # Lecture par blocs des seuls points échantillonnés
+        sample = await asyncio.to_thread(_read_sampled_points, lidar.filepath, indices)
         
-        # Classification (si disponible)
-        classifications = None
-        if hasattr(las, 'classification'):
-            classifications = las.classification[indices].tolist()
+        bounds = {
+            "min_x": min_x,
+            "max_x": max_x,
+            "min_y": min_y,
+            "max_y": max_y,
+            "min_z": min_z,
+            "max_z": max_z
+        }
         
-        # Intensité (si disponible)
-        intensities = None
-        if hasattr(las, 'intensity'):
-            intensities = las.intensity[indices].tolist()
+        if format == "arrow":
+            # Colonnes binaires float32 (4 octets/valeur) au lieu de listes JSON
+            content = await asyncio.to_thread(_sample_to_arrow, sample, bounds)
+            return Response(content=content, media_type="application/vnd.apache.arrow.stream")
         
-        return {
+        # Tableaux NumPy sérialisés directement par orjson (pas de listes Python)
+        return ORJSONResponse({
             "point_count": sample_size,
             "points": {
-                "x": x,
-                "y": y,
-                "z": z
+                "x": sample["x"],
+                "y": sample["y"],
+                "z": sample["z"]
             },
-            "classifications": classifications,
-            "intensities": intensities,
-            "bounds": {
-                "min_x": float(las.x.min()),
-                "max_x": float(las.x.max()),
-                "min_y": float(las.y.min()),
-                "max_y": float(las.y.max()),
-                "min_z": float(las.z.min()),
-                "max_z": float(las.z.max())
-            }
-        }
+            "classifications": sample["classification"],
+            "intensities": sample["intensity"],
+            "bounds": bounds
+        })
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lecture LIDAR: {str(e)}")
@@ -246,59 +382,48 @@ async def process_lidar(
     - **density**: Carte de densité de points
     - **classification**: Statistiques par classification
     """
-    lidar = db.query(LidarData).filter(LidarData.id == lidar_id).first()
+    lidar = db.get(LidarData, lidar_id)
     
     if not lidar:
         raise HTTPException(status_code=404, detail="Fichier LIDAR non trouvé")
     
     try:
-        las = laspy.read(lidar.filepath)
-        
         if operation == "classification":
-            # Statistiques par classe
-            if hasattr(las, 'classification'):
-                unique, counts = np.unique(las.classification, return_counts=True)
-                
-                # Noms de classes standards LAS
-                class_names = {
-                    0: "Never classified",
-                    1: "Unassigned",
-                    2: "Ground",
-                    3: "Low Vegetation",
-                    4: "Medium Vegetation",
-                    5: "High Vegetation",
-                    6: "Building",
-                    7: "Low Point",
-                    9: "Water",
-                    17: "Bridge Deck"
-                }
-                
-                stats = {
-                    str(int(cls)): {
-                        "name": class_names.get(int(cls), "Unknown"),
-                        "count": int(count),
-                        "percentage": float(count / len(las.points) * 100)
-                    }
-                    for cls, count in zip(unique, counts)
-                }
-                
-                return {
-                    "operation": "classification",
-                    "total_points": len(las.points),
-                    "classes": stats
+            # Statistiques par classe depuis l'histogramme en cache
+            histogram = lidar.class_histogram
+            if histogram is None:
+                # Fichier uploadé avant la mise en cache : calcul puis persistance
+                histogram = await asyncio.to_thread(_class_histogram, lidar.filepath)
+                lidar.class_histogram = histogram
+                db.commit()
+            
+            total_points = sum(histogram)
+            stats = {
+                str(cls): {
+                    "name": CLASS_NAMES.get(cls, "Unknown"),
+                    "count": int(count),
+                    "percentage": float(count / total_points * 100)
                 }
-            else:
-                return {"error": "Pas de classification disponible"}
+                for cls, count in enumerate(histogram)
+                if count > 0
+            }
+            
+            return {
+                "operation": "classification",
+                "total_points": total_points,
+                "classes": stats
+            }
         
         elif operation == "density":
-            # Calcul simple de densité
-            area = (las.x.max() - las.x.min()) * (las.y.max() - las.y.min())
-            density = len(las.points) / area if area > 0 else 0
+            # Calcul simple de densité depuis l'emprise stockée
+            min_x, min_y, max_x, max_y = to_shape(lidar.bounds).bounds
+            area = (max_x - min_x) * (max_y - min_y)
+            density = lidar.point_count / area if area > 0 else 0
             
             return {
                 "operation": "density",
                 "points_per_sqm": float(density),
-                "total_points": len(las.points),
+                "total_points": lidar.point_count,
                 "area_sqm": float(area)
             }
         
@@ -313,23 +438,31 @@ async def process_lidar(
 
 
 @router.delete("/files/{lidar_id}")
-async def delete_lidar_file(lidar_id: int, db: Session = Depends(get_db)):
+async def delete_lidar_file(
+    lidar_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
     """Supprime un fichier LIDAR"""
-    lidar = db.query(LidarData).filter(LidarData.id == lidar_id).first()
+    lidar = db.get(LidarData, lidar_id)
     
     if not lidar:
         raise HTTPException(status_code=404, detail="Fichier LIDAR non trouvé")
     
     try:
-        # Suppression du fichier physique
         filepath = Path(lidar.filepath)
-        if filepath.exists():
-            filepath.unlink()
         
         # Suppression de la base de données
         db.delete(lidar)
         db.commit()
         
+        # Suppression du fichier physique et des tuiles précalculées après l'envoi de la réponse
+        background_tasks.add_task(filepath.unlink, missing_ok=True)
+        background_tasks.add_task(
+            shutil.rmtree, Path(settings.LIDAR_CACHE_DIR) / str(lidar_id), ignore_errors=True
+        )
+        _evict_processor(filepath)
+        
         return {"status": "success", "message": "Fichier supprimé"}
     
     except Exception as e:
@@ -16,25 +16,69 @@ Fonctionnalités:
 """
 
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, BackgroundTasks, Query
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse, FileResponse
 from sqlalchemy.orm import Session
+from sqlalchemy import func, insert
 from typing import List, Optional, Dict, Tuple
 import laspy
 import numpy as np
 from pathlib import Path
 import json
 import asyncio
+import threading
 from datetime import datetime
+from functools import cached_property
+from collections import OrderedDict
 import struct
+import hashlib
 import zlib
 import io
+import math
+import os
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
 
-from app.database import get_db
+from app.database import SessionLocal, get_db
 from app.models.spatial_models import LidarData
 from app.config import settings
+from app.utils.upload import read_header, save_upload
+from app.utils.point_cloud import (
+    MORTON_MAX_BITS, QUANTIZERS, morton_codes, morton_decode, morton_encode, xyz_bounds
+)
 
 router = APIRouter()
 
+# Taille des blocs des réponses binaires en streaming (1 MiB)
+STREAM_CHUNK_SIZE = 1 << 20
+
+# Nombre de points décodés par bloc lors de la lecture des fichiers LAS
+READ_CHUNK_SIZE = 1_000_000
+
+# Taille des tuiles et nombre de niveaux LOD précalculés à l'upload
+DEFAULT_TILE_SIZE = 100.0
+LOD_LEVELS = 5
+
+# Nombre de cellules par axe de la grille d'index X/Y (prefiltre des requêtes par emprise)
+GRID_INDEX_SIZE = 64
+
+# Taille maximale (en cellules) d'un DTM de zone multi-fichiers
+MAX_AREA_CELLS = 50_000_000
+
+# Nombre de nuages décodés conservés en mémoire entre les requêtes
+PROCESSOR_CACHE_SIZE = 8
+
+# Pool partagé pour exécuter en parallèle les traitements indépendants d'un même fichier
+# (threads : le processeur est partagé en mémoire et NumPy/Numba libèrent le GIL)
+_processing_pool = ThreadPoolExecutor(max_workers=os.cpu_count())
+
+# En-têtes des réponses binaires : déjà compactes (ou entropiquement codées pour Draco/zlib),
+# le GZipMiddleware les laisse passer telles quelles si Content-Encoding est fixé
+BINARY_HEADERS = {'Content-Encoding': 'identity', 'Vary': 'Accept-Encoding'}
+
+# Pool de processus pour l'encodage Draco (DracoPy ne libère pas le GIL), créé au premier usage
+_encode_pool: Optional[ProcessPoolExecutor] = None
+_encode_pool_lock = threading.Lock()
+
 
 # ==================== CLASSES UTILITAIRES ====================
 
@@ -49,20 +93,23 @@ class OctreeNode:
         self.point_count = 0
         self.max_points_per_node = 50000
     
+    def _center(self) -> Tuple[float, float, float]:
+        """Centre du nœud"""
+        min_x, max_x, min_y, max_y, min_z, max_z = self.bounds
+        return (min_x + max_x) / 2, (min_y + max_y) / 2, (min_z + max_z) / 2
+    
     def get_octant(self, point: Tuple[float, float, float]) -> int:
-        """Détermine l'octant (0-7) d'un point"""
+        """Détermine l'octant (0-7) d'un point (x: +1, y: +2, z: +4), sans branchement"""
         x, y, z = point
-        min_x, max_x, min_y, max_y, min_z, max_z = self.bounds
-        mid_x = (min_x + max_x) / 2
-        mid_y = (min_y + max_y) / 2
-        mid_z = (min_z + max_z) / 2
-        
-        octant = 0
-        if x >= mid_x: octant |= 1
-        if y >= mid_y: octant |= 2
-        if z >= mid_z: octant |= 4
-        
-        return octant
+        mid_x, mid_y, mid_z = self._center()
+        return (x >= mid_x) | ((y >= mid_y) << 1) | ((z >= mid_z) << 2)
+    
+    def get_octants(self, points: np.ndarray) -> np.ndarray:
+        """Octants d'un tableau de points (n, 3), en une expression vectorisée"""
+        mid_x, mid_y, mid_z = self._center()
+        return ((points[:, 0] >= mid_x).astype(np.uint8)
+                | ((points[:, 1] >= mid_y).astype(np.uint8) << 1)
+                | ((points[:, 2] >= mid_z).astype(np.uint8) << 2))
     
     def subdivide(self):
         """Subdivise le nœud en 8 enfants"""
@@ -93,9 +140,9 @@ class OctreeNode:
         # Si le nœud n'est pas subdivisé et a atteint sa capacité
         if self.children[0] is None and len(self.points) >= self.max_points_per_node:
             self.subdivide()
-            # Redistribuer les points existants
-            for p, attr in self.points:
-                octant = self.get_octant(p)
+            # Redistribuer les points existants (octants calculés en bloc)
+            octants = self.get_octants(np.array([p for p, _ in self.points], dtype=np.float64))
+            for (p, attr), octant in zip(self.points, octants):
                 self.children[octant].insert(p, attr)
             self.points = []  # Vider ce nœud
         
@@ -118,71 +165,284 @@ class OctreeNode:
         }
 
 
+class LinearOctree:
+    """
+    Octree linéaire : feuilles décrites par (code de Morton de départ, niveau)
+    
+    Les points sont triés par code de Morton ; chaque feuille correspond à une plage
+    contiguë de `order`, sans nœuds chaînés ni attributs par point.
+    """
+    
+    def __init__(self, mins: np.ndarray, ranges: np.ndarray, max_level: int,
+                 order: np.ndarray, leaf_codes: np.ndarray, leaf_levels: np.ndarray,
+                 offsets: np.ndarray, counts: np.ndarray):
+        self.mins = mins
+        self.ranges = ranges
+        self.max_level = max_level
+        self.order = order  # Indices des points triés par code de Morton
+        self.leaf_codes = leaf_codes
+        self.leaf_levels = leaf_levels
+        self.offsets = offsets  # Début de chaque feuille dans `order`
+        self.counts = counts
+    
+    @property
+    def bounds(self) -> Tuple[float, float, float, float, float, float]:
+        maxs = self.mins + self.ranges
+        return (float(self.mins[0]), float(maxs[0]), float(self.mins[1]),
+                float(maxs[1]), float(self.mins[2]), float(maxs[2]))
+    
+    def leaf_points(self, leaf: int) -> np.ndarray:
+        """Indices (dans le nuage d'origine) des points d'une feuille"""
+        start = self.offsets[leaf]
+        return self.order[start:start + self.counts[leaf]]
+    
+    def leaf_bounds(self) -> np.ndarray:
+        """Emprises des feuilles, tableau (n_feuilles, 6) au format OctreeNode.bounds"""
+        cell = self.ranges / (1 << self.max_level)
+        ix, iy, iz = morton_decode(self.leaf_codes)
+        size = (1 << (self.max_level - self.leaf_levels)).astype(np.float64)
+        lows = [self.mins[axis] + idx.astype(np.float64) * cell[axis]
+                for axis, idx in enumerate((ix, iy, iz))]
+        return np.column_stack([
+            edge
+            for axis, low in enumerate(lows)
+            for edge in (low, low + size * cell[axis])
+        ])
+    
+    def to_dict(self) -> Dict:
+        """Convertit l'octree en dictionnaire pour sérialisation"""
+        leaf_bounds = self.leaf_bounds()
+        return {
+            'bounds': self.bounds,
+            'max_level': self.max_level,
+            'depth': int(self.leaf_levels.max()) if len(self.leaf_levels) else 0,
+            'point_count': int(self.counts.sum()),
+            'leaf_count': len(self.counts),
+            'leaves': [
+                {
+                    'code': int(code),
+                    'level': int(level),
+                    'point_count': int(count),
+                    'bounds': tuple(float(v) for v in bounds)
+                }
+                for code, level, count, bounds in zip(
+                    self.leaf_codes, self.leaf_levels, self.counts, leaf_bounds
+                )
+            ]
+        }
+
+
+def _build_linear_octree(points: np.ndarray, max_level: int = 10,
+                         max_points_per_node: int = 50000) -> LinearOctree:
+    """
+    Construit un octree linéaire par codes de Morton
+    
+    1. Quantification des points sur une grille 2^L par axe et encodage Morton
+       (noyau Numba parallèle, une seule passe)
+    2. Tri des points par code
+    3. Partant de la racine, découpage en 8 de toute feuille dépassant la capacité ;
+       les effectifs sont obtenus par recherche dichotomique dans les codes triés.
+    """
+    max_level = min(max_level, MORTON_MAX_BITS)
+    mins = points.min(axis=0)
+    ranges = points.max(axis=0) - mins
+    ranges[ranges == 0] = 1.0
+    
+    codes = morton_codes(np.ascontiguousarray(points, dtype=np.float64), mins, ranges, max_level)
+    
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    
+    leaf_codes = np.zeros(1, dtype=np.uint64)
+    leaf_levels = np.zeros(1, dtype=np.int64)
+    final_codes, final_levels = [], []
+    
+    while len(leaf_codes):
+        # Plage de codes couverte par chaque feuille : 8^(L - niveau)
+        spans = np.left_shift(np.uint64(1), (3 * (max_level - leaf_levels)).astype(np.uint64))
+        counts = (np.searchsorted(sorted_codes, leaf_codes + spans)
+                  - np.searchsorted(sorted_codes, leaf_codes))
+        
+        split = (counts > max_points_per_node) & (leaf_levels < max_level)
+        keep = ~split & (counts > 0)
+        final_codes.append(leaf_codes[keep])
+        final_levels.append(leaf_levels[keep])
+        
+        # Les 8 enfants d'une feuille découpée
+        child_spans = spans[split] >> np.uint64(3)
+        leaf_codes = (leaf_codes[split][:, None]
+                      + child_spans[:, None] * np.arange(8, dtype=np.uint64)).ravel()
+        leaf_levels = np.repeat(leaf_levels[split] + 1, 8)
+    
+    leaf_codes = np.concatenate(final_codes)
+    leaf_levels = np.concatenate(final_levels)
+    z_order = np.argsort(leaf_codes)
+    leaf_codes, leaf_levels = leaf_codes[z_order], leaf_levels[z_order]
+    
+    offsets = np.searchsorted(sorted_codes, leaf_codes)
+    spans = np.left_shift(np.uint64(1), (3 * (max_level - leaf_levels)).astype(np.uint64))
+    counts = np.searchsorted(sorted_codes, leaf_codes + spans) - offsets
+    
+    return LinearOctree(mins, ranges, max_level, order, leaf_codes, leaf_levels, offsets, counts)
+
+
 class LidarProcessor:
     """Processeur LIDAR avancé avec toutes les fonctionnalités pro"""
     
     def __init__(self, filepath: Path):
         self.filepath = filepath
-        self.las = laspy.read(filepath)
-        self.points = np.column_stack((self.las.x, self.las.y, self.las.z))
-        
-        # Attributs optionnels
-        self.intensity = self.las.intensity if hasattr(self.las, 'intensity') else None
-        self.classification = self.las.classification if hasattr(self.las, 'classification') else None
-        self.colors = None
-        if hasattr(self.las, 'red'):
-            self.colors = np.column_stack((self.las.red, self.las.green, self.las.blue))
-    
-    def build_octree(self, max_level: int = 10) -> OctreeNode:
-        """Construit un octree pour organisation hiérarchique"""
-        # Calculer les bounds
-        min_x, min_y, min_z = self.points.min(axis=0)
-        max_x, max_y, max_z = self.points.max(axis=0)
-        
-        # Créer la racine
-        root = OctreeNode((min_x, max_x, min_y, max_y, min_z, max_z))
-        
-        # Insérer tous les points
-        for i, point in enumerate(self.points):
-            attributes = {'index': i}
+        
+        # Lecture du fichier par blocs dans des tableaux préalloués : la mémoire
+        # utilisée se limite aux tableaux conservés plus un bloc de points décodé.
+        with laspy.open(filepath) as reader:
+            self.header = header = reader.header
+            point_count = int(header.point_count)
+            dimensions = set(header.point_format.dimension_names)
+            
+            # Coordonnées stockées par axe (tableaux contigus), pas en (n, 3) entrelacé.
+            # En float32 : X/Y relatifs à une origine (coin de l'emprise) pour garder une
+            # précision millimétrique, Z en absolu.
+            self.origin = np.array([np.floor(header.mins[0]), np.floor(header.mins[1]), 0.0])
+            self.x = np.empty(point_count, dtype=np.float32)
+            self.y = np.empty(point_count, dtype=np.float32)
+            self.z = np.empty(point_count, dtype=np.float32)
+            
+            # Attributs optionnels (selon les dimensions du format de points)
+            self.intensity = (
+                np.empty(point_count, dtype=np.uint16) if 'intensity' in dimensions else None
+            )
+            self.classification = (
+                np.empty(point_count, dtype=np.uint8) if 'classification' in dimensions else None
+            )
+            self.colors = np.empty((point_count, 3), dtype=np.uint16) if 'red' in dimensions else None
+            
+            start = 0
+            for chunk in reader.chunk_iterator(READ_CHUNK_SIZE):
+                end = start + len(chunk)
+                self.x[start:end] = self._local_axis(chunk.X, header.scales[0],
+                                                     header.offsets[0] - self.origin[0])
+                self.y[start:end] = self._local_axis(chunk.Y, header.scales[1],
+                                                     header.offsets[1] - self.origin[1])
+                self.z[start:end] = self._local_axis(chunk.Z, header.scales[2], header.offsets[2])
+                if self.intensity is not None:
+                    self.intensity[start:end] = chunk.intensity
+                if self.classification is not None:
+                    self.classification[start:end] = chunk.classification
+                if self.colors is not None:
+                    self.colors[start:end, 0] = chunk.red
+                    self.colors[start:end, 1] = chunk.green
+                    self.colors[start:end, 2] = chunk.blue
+                start = end
+        
+        # En-tête annonçant plus de points que le fichier n'en contient
+        if start < point_count:
+            self.x, self.y, self.z = self.x[:start], self.y[:start], self.z[:start]
             if self.intensity is not None:
-                attributes['intensity'] = float(self.intensity[i])
+                self.intensity = self.intensity[:start]
             if self.classification is not None:
-                attributes['classification'] = int(self.classification[i])
+                self.classification = self.classification[:start]
             if self.colors is not None:
-                attributes['color'] = self.colors[i].tolist()
-            
-            root.insert(tuple(point), attributes)
+                self.colors = self.colors[:start]
         
-        return root
+        # Décimales significatives par axe (échelle LAS), pour restituer les valeurs
+        # absolues sans le bruit d'arrondi du float32
+        self.decimals = tuple(max(0, int(np.ceil(-np.log10(scale)))) for scale in header.scales)
+        
+        # Instance partagée entre requêtes (voir _get_processor) : tableaux en lecture seule
+        for array in (self.x, self.y, self.z, self.intensity, self.classification, self.colors):
+            if array is not None:
+                array.flags.writeable = False
+    
+    @staticmethod
+    def _local_axis(raw: np.ndarray, scale: float, offset: float) -> np.ndarray:
+        """Coordonnées float32 d'un axe à partir des entiers bruts du fichier LAS"""
+        return (np.asarray(raw) * scale + offset).astype(np.float32)
+    
+    @cached_property
+    def points(self) -> np.ndarray:
+        """Points (n, 3) en coordonnées absolues, construits à la demande"""
+        points = self._stack(slice(None))
+        points.flags.writeable = False
+        return points
+    
+    def _stack(self, index, absolute: bool = True) -> np.ndarray:
+        """
+        Points (k, 3) d'un sous-ensemble (indices, masque ou slice)
+        
+        En absolu (float64) par défaut, sinon en coordonnées locales float32.
+        """
+        local = np.column_stack((self.x[index], self.y[index], self.z[index]))
+        if not absolute:
+            return local
+        
+        points = local + self.origin
+        for axis, decimals in enumerate(self.decimals):
+            np.round(points[:, axis], decimals, out=points[:, axis])
+        return points
+    
+    def bounds(self) -> Tuple[float, float, float, float, float, float]:
+        """Emprise absolue (min_x, max_x, min_y, max_y, min_z, max_z)"""
+        min_x, max_x, min_y, max_y, min_z, max_z = xyz_bounds(self.x, self.y, self.z)
+        return self._absolute_bounds(min_x, max_x, min_y, max_y) + (
+            round(float(min_z), self.decimals[2]), round(float(max_z), self.decimals[2])
+        )
+    
+    def build_octree(self, max_level: int = 10) -> LinearOctree:
+        """
+        Construit un octree pour organisation hiérarchique
+        
+        Les attributs d'une feuille s'obtiennent par ses indices de points, par ex.
+        `self.intensity[octree.leaf_points(k)]`.
+        """
+        return _build_linear_octree(self.points, max_level)
+    
+    @staticmethod
+    def _cell_keys(x: np.ndarray, y: np.ndarray,
+                   cell_size: float) -> Tuple[np.ndarray, int, float, float]:
+        """
+        Identifiant de cellule carrée (ordre x puis y) de chaque point
+        
+        Returns:
+            (clés = ix * ny + iy, ny, min_x, min_y)
+        """
+        min_x, max_x = x.min(), x.max()
+        min_y, max_y = y.min(), y.max()
+        nx = max(1, int(np.ceil((max_x - min_x) / cell_size)))
+        ny = max(1, int(np.ceil((max_y - min_y) / cell_size)))
+        
+        # Les points sur le bord max sont rattachés à la dernière cellule
+        ix = np.minimum(((x - min_x) // cell_size).astype(np.int64), nx - 1)
+        iy = np.minimum(((y - min_y) // cell_size).astype(np.int64), ny - 1)
+        
+        return ix * ny + iy, ny, min_x, min_y
+    
+    @staticmethod
+    def _run_starts(sorted_keys: np.ndarray) -> np.ndarray:
+        """Positions de début de chaque plage de clés identiques dans un tableau trié"""
+        return np.flatnonzero(np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1])))
     
     def generate_tiles(self, tile_size: float = 100.0) -> List[Dict]:
-        """Génère des tuiles spatiales carrées"""
-        min_x, min_y = self.points[:, :2].min(axis=0)
-        max_x, max_y = self.points[:, :2].max(axis=0)
+        """Génère des tuiles spatiales carrées (tri des points par tuile, une seule passe)"""
+        keys, ny, min_x, min_y = self._cell_keys(self.x, self.y, tile_size)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        sorted_points = self._stack(order)
+        
+        starts = self._run_starts(sorted_keys)
+        ends = np.append(starts[1:], len(sorted_keys))
         
+        min_x, _, min_y, _ = self._absolute_bounds(min_x, min_x, min_y, min_y)
         tiles = []
-        x = min_x
-        while x < max_x:
-            y = min_y
-            while y < max_y:
-                # Points dans cette tuile
-                mask = (
-                    (self.points[:, 0] >= x) & (self.points[:, 0] < x + tile_size) &
-                    (self.points[:, 1] >= y) & (self.points[:, 1] < y + tile_size)
-                )
-                
-                tile_points = self.points[mask]
-                if len(tile_points) > 0:
-                    tiles.append({
-                        'bounds': (x, x + tile_size, y, y + tile_size),
-                        'point_count': len(tile_points),
-                        'points': tile_points,
-                        'center': ((x + x + tile_size) / 2, (y + y + tile_size) / 2)
-                    })
-                
-                y += tile_size
-            x += tile_size
+        for start, end in zip(starts, ends):
+            ix, iy = divmod(int(sorted_keys[start]), ny)
+            x = min_x + ix * tile_size
+            y = min_y + iy * tile_size
+            tiles.append({
+                'bounds': (x, x + tile_size, y, y + tile_size),
+                'point_count': int(end - start),
+                'points': sorted_points[start:end],
+                'center': ((x + x + tile_size) / 2, (y + y + tile_size) / 2)
+            })
         
         return tiles
     
@@ -200,60 +460,40 @@ class LidarProcessor:
     
     def extract_ground_points(self) -> np.ndarray:
         """Extrait les points de sol (classification 2)"""
+        return self._stack(self._ground_indices())
+    
+    def _ground_indices(self) -> np.ndarray:
+        """Indices des points de sol"""
         if self.classification is None:
             # Méthode simple: points les plus bas dans chaque cellule
             return self._extract_ground_simple()
         
         # Utiliser la classification LAS
-        ground_mask = self.classification == 2
-        return self.points[ground_mask]
+        return np.flatnonzero(self.classification == 2)
     
     def _extract_ground_simple(self, cell_size: float = 1.0) -> np.ndarray:
-        """Extraction sol simple par grille"""
-        min_x, min_y = self.points[:, :2].min(axis=0)
-        max_x, max_y = self.points[:, :2].max(axis=0)
-        
-        ground_points = []
-        
-        x = min_x
-        while x < max_x:
-            y = min_y
-            while y < max_y:
-                mask = (
-                    (self.points[:, 0] >= x) & (self.points[:, 0] < x + cell_size) &
-                    (self.points[:, 1] >= y) & (self.points[:, 1] < y + cell_size)
-                )
-                cell_points = self.points[mask]
-                if len(cell_points) > 0:
-                    # Point le plus bas = sol
-                    lowest = cell_points[cell_points[:, 2].argmin()]
-                    ground_points.append(lowest)
-                
-                y += cell_size
-            x += cell_size
+        """Extraction sol simple par grille : indice du point le plus bas de chaque cellule"""
+        keys, _, _, _ = self._cell_keys(self.x, self.y, cell_size)
         
-        return np.array(ground_points)
+        # Tri par cellule puis par Z : le premier point de chaque plage est le plus bas
+        order = np.lexsort((self.z, keys))
+        return order[self._run_starts(keys[order])]
     
     def generate_dtm(self, resolution: float = 1.0) -> Dict:
         """Génère un Modèle Numérique de Terrain (DTM)"""
-        ground = self.extract_ground_points()
+        ground = self._ground_indices()
+        x, y, z = self.x[ground], self.y[ground], self.z[ground]
         
         # Créer une grille
-        min_x, min_y = ground[:, :2].min(axis=0)
-        max_x, max_y = ground[:, :2].max(axis=0)
+        min_x, max_x = x.min(), x.max()
+        min_y, max_y = y.min(), y.max()
         
         nx = int((max_x - min_x) / resolution) + 1
         ny = int((max_y - min_y) / resolution) + 1
         
-        dtm = np.full((ny, nx), np.nan)
-        
-        # Remplir la grille
-        for point in ground:
-            i = int((point[0] - min_x) / resolution)
-            j = int((point[1] - min_y) / resolution)
-            if 0 <= i < nx and 0 <= j < ny:
-                if np.isnan(dtm[j, i]) or point[2] < dtm[j, i]:
-                    dtm[j, i] = point[2]
+        # Remplir la grille : Z minimal par cellule
+        dtm = self._rasterize(x, y, z, min_x, min_y, nx, ny, resolution, np.minimum)
+        dtm = np.round(dtm, self.decimals[2])
         
         # Interpoler les trous (simple: moyenne des voisins)
         dtm = self._fill_nan_grid(dtm)
@@ -261,52 +501,133 @@ class LidarProcessor:
         return {
             'grid': dtm,
             'resolution': resolution,
-            'bounds': (min_x, max_x, min_y, max_y),
+            'bounds': self._absolute_bounds(min_x, max_x, min_y, max_y),
             'shape': (ny, nx)
         }
     
     def generate_dsm(self, resolution: float = 1.0) -> Dict:
         """Génère un Modèle Numérique de Surface (DSM)"""
         # DSM = point le plus haut dans chaque cellule
-        min_x, min_y = self.points[:, :2].min(axis=0)
-        max_x, max_y = self.points[:, :2].max(axis=0)
+        min_x, max_x = self.x.min(), self.x.max()
+        min_y, max_y = self.y.min(), self.y.max()
         
         nx = int((max_x - min_x) / resolution) + 1
         ny = int((max_y - min_y) / resolution) + 1
         
-        dsm = np.full((ny, nx), -np.inf)
-        
-        for point in self.points:
-            i = int((point[0] - min_x) / resolution)
-            j = int((point[1] - min_y) / resolution)
-            if 0 <= i < nx and 0 <= j < ny:
-                if point[2] > dsm[j, i]:
-                    dsm[j, i] = point[2]
-        
-        dsm[dsm == -np.inf] = np.nan
+        dsm = self._rasterize(self.x, self.y, self.z, min_x, min_y, nx, ny, resolution, np.maximum)
+        dsm = np.round(dsm, self.decimals[2])
         dsm = self._fill_nan_grid(dsm)
         
         return {
             'grid': dsm,
             'resolution': resolution,
-            'bounds': (min_x, max_x, min_y, max_y),
+            'bounds': self._absolute_bounds(min_x, max_x, min_y, max_y),
             'shape': (ny, nx)
         }
     
-    def _fill_nan_grid(self, grid: np.ndarray) -> np.ndarray:
-        """Remplit les NaN par interpolation simple"""
-        from scipy.ndimage import generic_filter
+    def generate_dtm_dsm(self, resolution: float = 1.0) -> Tuple[Dict, Dict]:
+        """
+        Génère DTM et DSM sur une même grille en une seule passe sur les points
+        
+        Un seul tri des points par cellule donne le Z max de tous les points (DSM) et le
+        Z min des points de sol (DTM) ; les trous des deux grilles sont remplis ensemble.
+        """
+        min_x, max_x = self.x.min(), self.x.max()
+        min_y, max_y = self.y.min(), self.y.max()
+        
+        nx = int((max_x - min_x) / resolution) + 1
+        ny = int((max_y - min_y) / resolution) + 1
+        
+        i = np.minimum(((self.x - min_x) / resolution).astype(np.int64), nx - 1)
+        j = np.minimum(((self.y - min_y) / resolution).astype(np.int64), ny - 1)
+        cells = j * nx + i
         
-        def fill_nan(values):
-            valid = values[~np.isnan(values)]
-            return valid.mean() if len(valid) > 0 else np.nan
+        order = np.argsort(cells, kind='stable')
+        cells = cells[order]
+        starts = self._run_starts(cells)
         
-        # Appliquer un filtre de moyenne sur les voisins
-        filled = generic_filter(grid, fill_nan, size=3, mode='constant', cval=np.nan)
+        ground = np.zeros(len(self.z), dtype=bool)
+        ground[self._ground_indices()] = True
+        z = self.z[order]
+        ground_z = np.where(ground[order], z, np.inf)
         
-        # Si encore des NaN, remplir avec la moyenne globale
-        global_mean = np.nanmean(filled)
-        filled[np.isnan(filled)] = global_mean
+        grids = np.full((2, ny * nx), np.nan)
+        grids[0, cells[starts]] = np.minimum.reduceat(ground_z, starts)
+        grids[1, cells[starts]] = np.maximum.reduceat(z, starts)
+        grids[np.isinf(grids)] = np.nan  # Cellules sans point de sol
+        
+        grids = np.round(grids.reshape(2, ny, nx), self.decimals[2])
+        dtm_grid, dsm_grid = self._fill_nan_grid(grids)
+        
+        bounds = self._absolute_bounds(min_x, max_x, min_y, max_y)
+        return (
+            {'grid': dtm_grid, 'resolution': resolution, 'bounds': bounds, 'shape': (ny, nx)},
+            {'grid': dsm_grid, 'resolution': resolution, 'bounds': bounds, 'shape': (ny, nx)}
+        )
+    
+    def _absolute_bounds(self, min_x, max_x, min_y, max_y) -> Tuple[float, float, float, float]:
+        """Emprise 2D locale -> absolue"""
+        ox, oy = self.origin[0], self.origin[1]
+        dx, dy = self.decimals[0], self.decimals[1]
+        return (round(float(min_x + ox), dx), round(float(max_x + ox), dx),
+                round(float(min_y + oy), dy), round(float(max_y + oy), dy))
+    
+    @staticmethod
+    def _rasterize(x: np.ndarray, y: np.ndarray, z: np.ndarray, min_x: float, min_y: float,
+                   nx: int, ny: int, resolution: float, reducer: np.ufunc) -> np.ndarray:
+        """
+        Réduit les Z des points par cellule de grille (np.minimum ou np.maximum)
+        
+        Tri des points par indice de cellule puis `reducer.reduceat` sur chaque plage :
+        une seule passe vectorisée. Les cellules vides valent NaN.
+        """
+        i = ((x - min_x) / resolution).astype(np.int64)
+        j = ((y - min_y) / resolution).astype(np.int64)
+        inside = (i >= 0) & (i < nx) & (j >= 0) & (j < ny)
+        cells = (j * nx + i)[inside]
+        z = z[inside]
+        
+        grid = np.full(ny * nx, np.nan)
+        if len(cells) == 0:
+            return grid.reshape(ny, nx)
+        
+        order = np.argsort(cells, kind='stable')
+        cells = cells[order]
+        z = z[order]
+        
+        # Début de chaque plage de cellule identique
+        starts = np.flatnonzero(np.concatenate(([True], cells[1:] != cells[:-1])))
+        grid[cells[starts]] = reducer.reduceat(z, starts)
+        
+        return grid.reshape(ny, nx)
+    
+    @staticmethod
+    def _fill_nan_grid(grid: np.ndarray, passes: int = 3) -> np.ndarray:
+        """
+        Remplit les NaN par interpolation simple (moyenne des voisins valides 3x3)
+        
+        Accepte aussi une pile de grilles (..., ny, nx), traitées indépendamment.
+        """
+        from scipy.ndimage import uniform_filter
+        
+        size = (1,) * (grid.ndim - 2) + (3, 3)
+        filled = grid.copy()
+        for _ in range(passes):
+            valid = ~np.isnan(filled)
+            if valid.all():
+                break
+            
+            # Somme et nombre de voisins valides, les NaN comptant pour zéro
+            sums = uniform_filter(np.where(valid, filled, 0.0), size=size, mode='constant') * 9
+            counts = uniform_filter(valid.astype(np.float64), size=size, mode='constant') * 9
+            
+            with np.errstate(invalid='ignore', divide='ignore'):
+                means = np.where(counts > 0.5, sums / counts, np.nan)
+            filled = np.where(valid, filled, means)
+        
+        # Si encore des NaN, remplir avec la moyenne globale (de chaque grille)
+        global_mean = np.nanmean(filled, axis=(-2, -1), keepdims=True)
+        filled = np.where(np.isnan(filled), global_mean, filled)
         
         return filled
     
@@ -319,45 +640,68 @@ class LidarProcessor:
         building_mask = height_model > building_threshold
         
         # Segmenter les bâtiments (connexité)
-        from scipy.ndimage import label
-        labeled, num_buildings = label(building_mask)
-        
-        buildings = []
-        for building_id in range(1, num_buildings + 1):
-            mask = labeled == building_id
-            if mask.sum() < 10:  # Trop petit
-                continue
-            
-            heights = height_model[mask]
-            
-            # Calculer position et statistiques
-            y_indices, x_indices = np.where(mask)
-            
-            buildings.append({
-                'id': building_id,
-                'area_cells': int(mask.sum()),
-                'area_m2': float(mask.sum() * dtm['resolution'] ** 2),
-                'height_min': float(heights.min()),
-                'height_max': float(heights.max()),
-                'height_mean': float(heights.mean()),
-                'center_x': float(x_indices.mean() * dtm['resolution'] + dtm['bounds'][0]),
-                'center_y': float(y_indices.mean() * dtm['resolution'] + dtm['bounds'][2])
-            })
-        
-        return buildings
+        from scipy import ndimage
+        labeled, num_buildings = ndimage.label(building_mask)
+        
+        # Taille de chaque composante, écarter les trop petites
+        counts = np.bincount(labeled.ravel(), minlength=num_buildings + 1)
+        ids = np.flatnonzero(counts >= 10)
+        ids = ids[ids > 0]
+        if len(ids) == 0:
+            return []
+        
+        # Statistiques de toutes les composantes en un appel chacune
+        heights_min = ndimage.minimum(height_model, labeled, ids)
+        heights_max = ndimage.maximum(height_model, labeled, ids)
+        heights_mean = ndimage.mean(height_model, labeled, ids)
+        centers = ndimage.center_of_mass(building_mask, labeled, ids)  # (y, x) en indices
+        
+        resolution = dtm['resolution']
+        return [
+            {
+                'id': int(building_id),
+                'area_cells': int(counts[building_id]),
+                'area_m2': float(counts[building_id] * resolution ** 2),
+                'height_min': float(h_min),
+                'height_max': float(h_max),
+                'height_mean': float(h_mean),
+                'center_x': float(center[1] * resolution + dtm['bounds'][0]),
+                'center_y': float(center[0] * resolution + dtm['bounds'][2])
+            }
+            for building_id, h_min, h_max, h_mean, center in zip(
+                ids, heights_min, heights_max, heights_mean, centers
+            )
+        ]
     
-    def calculate_volume(self, polygon_coords: List[Tuple[float, float]], base_height: float = 0) -> float:
-        """Calcule le volume d'une zone au-dessus d'une hauteur de base"""
-        from shapely.geometry import Point, Polygon
-        
-        poly = Polygon(polygon_coords)
-        volume = 0.0
+    def calculate_volume(self, polygon: np.ndarray, base_height: float = 0) -> float:
+        """Calcule le volume d'une zone (polygone en tableau (V, 2)) au-dessus d'une hauteur de base"""
+        import shapely
+        from shapely.geometry import Polygon
+        
+        # Polygone ramené dans le repère local des coordonnées
+        polygon = np.asarray(polygon, dtype=np.float64)
+        poly = Polygon(polygon - self.origin[:2])
+        shapely.prepare(poly)
+        
+        # Préfiltre : points des cellules de la grille d'index touchées par l'emprise,
+        # puis emprise exacte ; le test point-dans-polygone ne porte que sur les candidats
+        min_x, min_y, max_x, max_y = poly.bounds
+        candidates = self._grid_candidates(min_x, min_y, max_x, max_y)
+        x, y = self.x[candidates], self.y[candidates]
+        candidates = candidates[
+            (x >= min_x) & (x <= max_x) &
+            (y >= min_y) & (y <= max_y) &
+            (self.z[candidates] > base_height)
+        ]
         
-        for point in self.points:
-            p = Point(point[0], point[1])
-            if poly.contains(p) and point[2] > base_height:
-                # Volume approximatif par point
-                volume += (point[2] - base_height)
+        # Test point-dans-polygone vectorisé (shapely 2) ; un rectangle aligné sur les axes
+        # se réduit à l'emprise (bords exclus, comme contains)
+        x, y = self.x[candidates], self.y[candidates]
+        if self._is_axis_rect(polygon):
+            inside = (x > min_x) & (x < max_x) & (y > min_y) & (y < max_y)
+        else:
+            inside = shapely.contains_xy(poly, x, y)
+        volume = float((self.z[candidates[inside]] - base_height).sum(dtype=np.float64))
         
         # Convertir en volume réel (approximation)
         # En supposant une densité de points connue
@@ -366,56 +710,130 @@ class LidarProcessor:
         
         return volume * cell_area
     
+    @staticmethod
+    def _is_axis_rect(coords: np.ndarray, tol: float = 1e-9) -> bool:
+        """Vrai si le polygone (tableau (V, 2)) est un rectangle aux côtés parallèles aux axes"""
+        if len(coords) == 5 and np.allclose(coords[0], coords[-1], rtol=0, atol=tol):
+            coords = coords[:4]
+        if len(coords) != 4:
+            return False
+        
+        # Chaque côté est horizontal ou vertical, en alternance
+        edges = np.roll(coords, -1, axis=0) - coords
+        horizontal = np.abs(edges[:, 1]) <= tol
+        vertical = np.abs(edges[:, 0]) <= tol
+        return bool(
+            (horizontal[0::2].all() and vertical[1::2].all()) or
+            (vertical[0::2].all() and horizontal[1::2].all())
+        )
+    
+    @cached_property
+    def xy_grid(self) -> Tuple[np.ndarray, np.ndarray, float, float, float, float]:
+        """
+        Index spatial : grille uniforme GRID_INDEX_SIZE x GRID_INDEX_SIZE sur l'emprise X/Y
+        
+        Returns:
+            (indices des points triés par cellule, début de chaque cellule dans ce tri
+             (taille + 1), min_x, min_y, largeur et hauteur de cellule)
+        """
+        n = GRID_INDEX_SIZE
+        min_x, max_x = float(self.x.min()), float(self.x.max())
+        min_y, max_y = float(self.y.min()), float(self.y.max())
+        cell_w = max(max_x - min_x, 1e-9) / n
+        cell_h = max(max_y - min_y, 1e-9) / n
+        
+        # Clé ligne par ligne (iy * n + ix) : les cellules d'une ligne sont contiguës
+        ix = np.minimum(((self.x - min_x) / cell_w).astype(np.int64), n - 1)
+        iy = np.minimum(((self.y - min_y) / cell_h).astype(np.int64), n - 1)
+        keys = iy * n + ix
+        
+        order = np.argsort(keys, kind='stable').astype(np.int32 if len(keys) < 2**31 else np.int64)
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(keys, minlength=n * n))))
+        return order, offsets, min_x, min_y, cell_w, cell_h
+    
+    def _grid_candidates(self, min_x: float, min_y: float,
+                         max_x: float, max_y: float) -> np.ndarray:
+        """Indices des points des cellules de l'index qui recoupent une emprise (X/Y locaux)"""
+        order, offsets, grid_x, grid_y, cell_w, cell_h = self.xy_grid
+        n = GRID_INDEX_SIZE
+        ix0 = max(0, int((min_x - grid_x) // cell_w))
+        ix1 = min(n - 1, int((max_x - grid_x) // cell_w))
+        iy0 = max(0, int((min_y - grid_y) // cell_h))
+        iy1 = min(n - 1, int((max_y - grid_y) // cell_h))
+        if ix0 > ix1 or iy0 > iy1:
+            return np.empty(0, dtype=np.int64)
+        
+        # Une tranche contiguë du tri par ligne de cellules
+        return np.concatenate([
+            order[offsets[iy * n + ix0]:offsets[iy * n + ix1 + 1]] for iy in range(iy0, iy1 + 1)
+        ])
+    
+    @cached_property
+    def xy_tree(self):
+        """Index cKDTree 2D (X/Y locaux) de tout le nuage, construit une fois par processeur"""
+        from scipy.spatial import cKDTree
+        return cKDTree(np.column_stack((self.x, self.y)), leafsize=40)
+    
     def _estimate_point_spacing(self) -> float:
         """Estime l'espacement moyen entre points"""
         # Prendre un échantillon
-        sample_size = min(1000, len(self.points))
-        sample = self.points[np.random.choice(len(self.points), sample_size, replace=False)]
+        sample_size = min(1000, len(self.x))
+        index = np.random.choice(len(self.x), sample_size, replace=False)
+        sample = np.column_stack((self.x[index], self.y[index]))
         
-        # Distance au plus proche voisin
-        from scipy.spatial import cKDTree
-        tree = cKDTree(sample[:, :2])
-        distances, _ = tree.query(sample[:, :2], k=2)
+        # Distance au plus proche voisin dans le nuage complet
+        distances, _ = self.xy_tree.query(sample, k=2)
         
         return distances[:, 1].mean()  # Distance au 2ème plus proche (1er = lui-même)
     
     def generate_mesh(self, dtm: Dict, simplification: float = 0.1) -> Dict:
-        """Génère un mesh triangulé du terrain"""
-        from scipy.spatial import Delaunay
+        """
+        Génère un mesh triangulé du terrain
         
+        La simplification sous-échantillonne la grille avec un pas régulier (environ
+        simplification x cellules conservées) ; chaque maille dont les 4 coins sont
+        valides donne 2 triangles, sans triangulation de Delaunay.
+        """
         grid = dtm['grid']
         ny, nx = grid.shape
         
-        # Créer les points du mesh
-        x = np.linspace(dtm['bounds'][0], dtm['bounds'][1], nx)
-        y = np.linspace(dtm['bounds'][2], dtm['bounds'][3], ny)
-        xx, yy = np.meshgrid(x, y)
-        
-        points_2d = np.column_stack((xx.ravel(), yy.ravel()))
-        z_values = grid.ravel()
-        
-        # Retirer les NaN
-        valid = ~np.isnan(z_values)
-        points_2d = points_2d[valid]
-        z_values = z_values[valid]
+        min_x, max_x, min_y, max_y = dtm['bounds']
+        step_x = (max_x - min_x) / (nx - 1) if nx > 1 else 0.0
+        step_y = (max_y - min_y) / (ny - 1) if ny > 1 else 0.0
         
-        # Simplification (décimation)
+        # Simplification (décimation régulière, dernière ligne/colonne conservée)
+        stride = 1
         if simplification > 0 and simplification < 1:
-            keep = int(len(points_2d) * simplification)
-            indices = np.random.choice(len(points_2d), keep, replace=False)
-            points_2d = points_2d[indices]
-            z_values = z_values[indices]
-        
-        # Triangulation de Delaunay
-        tri = Delaunay(points_2d)
-        
-        # Construire les vertices et faces
-        vertices = np.column_stack((points_2d, z_values))
-        faces = tri.simplices
+            stride = max(1, int(round(1 / math.sqrt(simplification))))
+        row_index = np.unique(np.append(np.arange(0, ny, stride), ny - 1))
+        col_index = np.unique(np.append(np.arange(0, nx, stride), nx - 1))
+        sub = grid[np.ix_(row_index, col_index)]
+        
+        # Vertices des seules cellules valides et leur numéro dans la grille réduite
+        valid = ~np.isnan(sub)
+        rows, cols = np.nonzero(valid)
+        vertex_id = np.full(sub.shape, -1, dtype=np.int64)
+        vertex_id[rows, cols] = np.arange(len(rows))
+        vertices = np.column_stack((
+            min_x + col_index[cols] * step_x,
+            min_y + row_index[rows] * step_y,
+            sub[rows, cols]
+        ))
+        for axis, decimals in enumerate(self.decimals):
+            np.round(vertices[:, axis], decimals, out=vertices[:, axis])
+        
+        # Mailles complètes : deux triangles (a, b, d) et (a, d, c)
+        quads = valid[:-1, :-1] & valid[:-1, 1:] & valid[1:, :-1] & valid[1:, 1:]
+        qr, qc = np.nonzero(quads)
+        a = vertex_id[qr, qc]
+        b = vertex_id[qr, qc + 1]
+        c = vertex_id[qr + 1, qc]
+        d = vertex_id[qr + 1, qc + 1]
+        faces = np.concatenate((np.column_stack((a, b, d)), np.column_stack((a, d, c))))
         
         return {
-            'vertices': vertices.tolist(),
-            'faces': faces.tolist(),
+            'vertices': vertices,
+            'faces': faces,
             'vertex_count': len(vertices),
             'face_count': len(faces)
         }
@@ -428,8 +846,7 @@ class LidarProcessor:
     ) -> Dict:
         """Planifie une trajectoire de drone pour couverture"""
         if bounds is None:
-            min_x, min_y = self.points[:, :2].min(axis=0)
-            max_x, max_y = self.points[:, :2].max(axis=0)
+            min_x, max_x, min_y, max_y, _, _ = self.bounds()
         else:
             min_x, max_x, min_y, max_y = bounds
         
@@ -440,31 +857,20 @@ class LidarProcessor:
         # Calculer espacement entre lignes de vol
         line_spacing = fov_height * (1 - overlap)
         
-        # Générer les waypoints
-        waypoints = []
-        y = min_y
-        direction = 1  # Alterne droite-gauche
-        
-        while y <= max_y:
-            if direction == 1:
-                waypoints.append((min_x, y, altitude))
-                waypoints.append((max_x, y, altitude))
-            else:
-                waypoints.append((max_x, y, altitude))
-                waypoints.append((min_x, y, altitude))
-            
-            y += line_spacing
-            direction *= -1
+        # Générer les waypoints : lignes de vol en aller-retour (boustrophédon)
+        num_lines = int(np.floor((max_y - min_y) / line_spacing)) + 1
+        ys = min_y + line_spacing * np.arange(num_lines)
+        forward = np.arange(num_lines) % 2 == 0
+        xs = np.column_stack((np.where(forward, min_x, max_x), np.where(forward, max_x, min_x)))
+        
+        waypoints = np.column_stack((xs.ravel(), np.repeat(ys, 2), np.full(2 * num_lines, altitude)))
         
         # Calculer distance totale
-        total_distance = 0
-        for i in range(len(waypoints) - 1):
-            dx = waypoints[i+1][0] - waypoints[i][0]
-            dy = waypoints[i+1][1] - waypoints[i][1]
-            total_distance += np.sqrt(dx**2 + dy**2)
+        steps = np.diff(waypoints[:, :2], axis=0)
+        total_distance = float(np.hypot(steps[:, 0], steps[:, 1]).sum())
         
         return {
-            'waypoints': waypoints,
+            'waypoints': waypoints.tolist(),
             'total_distance_m': total_distance,
             'num_waypoints': len(waypoints),
             'altitude_m': altitude,
@@ -472,28 +878,61 @@ class LidarProcessor:
             'estimated_time_min': total_distance / (10 * 60)  # 10 m/s vitesse
         }
     
-    def compress_points_draco(self, points: np.ndarray, quantization_bits: int = 14) -> bytes:
-        """Compresse les points avec Draco (simulation - nécessite DracoPy en réel)"""
-        # NOTE: Véritable compression Draco nécessite la lib DracoPy
-        # Ici on fait une compression zlib comme placeholder
-        
-        # Quantification pour réduire la précision
+    @staticmethod
+    def compress_points_draco(points: np.ndarray, quantization_bits: int = 14,
+                              compression_level: int = 10) -> Tuple[bytes, str]:
+        """
+        Compresse les points avec Draco (DracoPy), ou zlib si DracoPy n'est pas installé
+        
+        Format de repli 'zlib' : en-tête little-endian (uint32 nombre de points, uint8 bits,
+        3 float32 minimums, 3 float32 étendues) suivi du flux zlib de 3 plans (X, Y, Z) de
+        uint16. Chaque plan contient les deltas zigzag des coordonnées quantifiées, points
+        triés par code de Morton ; décodage : d = (v >> 1) ^ -(v & 1), puis somme cumulée
+        modulo 2^16.
+        
+        Returns:
+            (données compressées, encodage 'draco' ou 'zlib')
+        """
+        points = np.ascontiguousarray(points, dtype=np.float32)
+        
+        try:
+            import DracoPy
+        except ImportError:
+            DracoPy = None
+        
+        if DracoPy is not None:
+            compressed = DracoPy.encode(
+                points,
+                quantization_bits=quantization_bits,
+                compression_level=compression_level
+            )
+            return compressed, 'draco'
+        
+        # Repli : quantification sur N bits (coordonnées locales float32)
         min_vals = points.min(axis=0)
         max_vals = points.max(axis=0)
         ranges = max_vals - min_vals
+        ranges[ranges == 0] = 1.0
         
-        # Quantifier sur N bits
-        quantized = ((points - min_vals) / ranges * ((1 << quantization_bits) - 1)).astype(np.uint16)
+        quantized = QUANTIZERS[quantization_bits](points, min_vals, ranges)
         
-        # Compresser avec zlib
-        compressed = zlib.compress(quantized.tobytes(), level=9)
+        # Tri spatial (Morton) : des points voisins dans le flux donnent de petits deltas
+        order = np.argsort(morton_encode(quantized[:, 0], quantized[:, 1], quantized[:, 2]))
+        planes = np.ascontiguousarray(quantized[order].T)
         
-        return compressed
-    
-    def estimate_streaming_budget(self, target_fps: int = 60, points_per_frame: int = 1000000) -> Dict:
-        """Estime le budget de points pour streaming GPU"""
-        total_points = len(self.points)
+        # Deltas modulo 2^16 puis zigzag : petites valeurs positives, bien compressées
+        deltas = np.diff(planes, axis=1, prepend=np.zeros((3, 1), dtype=np.uint16)).view(np.int16)
+        zigzag = ((deltas << 1) ^ (deltas >> 15)).view(np.uint16)
+        
+        header = struct.pack('<IB3f3f', len(points), quantization_bits, *min_vals, *ranges)
+        compressed = header + zlib.compress(zigzag.tobytes(), level=9)
         
+        return compressed, 'zlib'
+    
+    @staticmethod
+    def estimate_streaming_budget(total_points: int, target_fps: int = 60,
+                                  points_per_frame: int = 1000000) -> Dict:
+        """Estime le budget de points pour streaming GPU (ne dépend que du nombre de points)"""
         # Calcul des niveaux LOD nécessaires
         lod_levels = []
         current_points = total_points
@@ -518,10 +957,391 @@ class LidarProcessor:
         }
 
 
+_processor_lock = threading.Lock()
+# chemin -> (date de modification, Future du processeur), du moins au plus récemment utilisé
+_processor_cache: "OrderedDict[str, Tuple[float, Future]]" = OrderedDict()
+
+
+def _get_processor(filepath) -> LidarProcessor:
+    """
+    Processeur partagé d'un fichier LIDAR, rechargé seulement si le fichier change
+    
+    Une seule entrée par chemin : une version périmée est remplacée dès que le fichier
+    est modifié, et au plus PROCESSOR_CACHE_SIZE nuages restent en mémoire.
+    Chaque entrée est un Future : le verrou global ne couvre que la consultation et
+    l'insertion, le décodage se fait hors verrou et les requêtes simultanées sur le
+    même fichier attendent ce Future au lieu de le décoder une seconde fois.
+    """
+    path = Path(filepath)
+    key = str(path)
+    mtime = path.stat().st_mtime
+    with _processor_lock:
+        entry = _processor_cache.get(key)
+        if entry is not None and entry[0] == mtime:
+            _processor_cache.move_to_end(key)
+            future = entry[1]
+            owner = False
+        else:
+            future = Future()
+            owner = True
+            _processor_cache[key] = (mtime, future)
+            _processor_cache.move_to_end(key)
+            while len(_processor_cache) > PROCESSOR_CACHE_SIZE:
+                _processor_cache.popitem(last=False)
+    
+    if not owner:
+        return future.result()
+    
+    # Décodage hors du verrou global : les autres fichiers restent servis
+    try:
+        processor = LidarProcessor(path)
+    except BaseException as e:
+        with _processor_lock:
+            if _processor_cache.get(key, (None, None))[1] is future:
+                del _processor_cache[key]
+        future.set_exception(e)
+        raise
+    
+    future.set_result(processor)
+    return processor
+
+
+def _evict_processor(filepath):
+    """Retire un fichier du cache des processeurs (suppression)"""
+    with _processor_lock:
+        _processor_cache.pop(str(Path(filepath)), None)
+
+
+def _array_response(array: np.ndarray, filename: str,
+                    headers: Optional[Dict[str, str]] = None) -> StreamingResponse:
+    """
+    Réponse binaire brute d'un tableau (float32 little-endian, ordre C)
+    
+    La forme et le type sont donnés par les en-têtes X-Shape et X-Dtype.
+    """
+    data = np.ascontiguousarray(array, dtype='<f4')
+    return StreamingResponse(
+        io.BytesIO(data.tobytes()),
+        media_type="application/octet-stream",
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'X-Shape': ','.join(str(n) for n in data.shape),
+            'X-Dtype': 'float32',
+            **BINARY_HEADERS,
+            **(headers or {})
+        }
+    )
+
+
+async def _iter_array_bytes(*arrays: np.ndarray):
+    """Octets de tableaux contigus, à la suite, par blocs de STREAM_CHUNK_SIZE"""
+    for array in arrays:
+        data = array.reshape(-1).view(np.uint8)
+        for start in range(0, len(data), STREAM_CHUNK_SIZE):
+            yield data[start:start + STREAM_CHUNK_SIZE].tobytes()
+
+
+def _grid_statistics(grid: np.ndarray) -> Dict:
+    """Statistiques d'une grille DTM/DSM"""
+    return {
+        'min': float(np.nanmin(grid)),
+        'max': float(np.nanmax(grid)),
+        'mean': float(np.nanmean(grid)),
+        'std': float(np.nanstd(grid))
+    }
+
+
+def _grid_headers(model: Dict) -> Dict[str, str]:
+    """En-têtes de géoréférencement d'une grille DTM/DSM"""
+    return {
+        'X-Resolution': str(model['resolution']),
+        'X-Bounds': ','.join(str(v) for v in model['bounds'])
+    }
+
+
 # ==================== ENDPOINTS API ====================
 
-@router.post("/upload/advanced")
+def _cache_dir(lidar_id: int) -> Path:
+    """Répertoire des tuiles et LOD précalculés d'un fichier"""
+    return Path(settings.LIDAR_CACHE_DIR) / str(lidar_id)
+
+
+def _read_cache_index(lidar_id: int) -> Optional[Dict]:
+    """Index des données précalculées (None si absent ou incomplet)"""
+    path = _cache_dir(lidar_id) / "index.json"
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def _write_cache(lidar_id: int, processor: LidarProcessor,
+                 tiles: Optional[List[Dict]], lod_levels: Optional[List[np.ndarray]]):
+    """
+    Enregistre tuiles et LOD en .npy (XYZ float32 locaux) et leur index JSON
+    
+    L'index est écrit en dernier : sa présence garantit que les fichiers sont complets.
+    """
+    cache_dir = _cache_dir(lidar_id)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    origin = processor.origin
+    index = {'origin': [float(v) for v in origin], 'tile_size': None, 'tiles': None, 'lod_levels': 0}
+    
+    if tiles is not None:
+        for k, tile in enumerate(tiles):
+            np.save(cache_dir / f"tile_{k}.npy", (tile['points'] - origin).astype(np.float32))
+        index['tile_size'] = DEFAULT_TILE_SIZE
+        index['tiles'] = [
+            {'bounds': tile['bounds'], 'point_count': tile['point_count'], 'center': tile['center']}
+            for tile in tiles
+        ]
+    
+    if lod_levels is not None:
+        for level in range(len(lod_levels)):
+            np.save(cache_dir / f"lod_{level}.npy",
+                    processor._stack(slice(None, None, 4 ** level), absolute=False))
+        index['lod_levels'] = len(lod_levels)
+    
+    (cache_dir / "index.json").write_text(json.dumps(index))
+
+
+def _load_lod(lidar_id: int, filepath: str, level: int,
+              max_points: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Points d'un niveau LOD (float32 locaux) et origine : fichier précalculé, sinon calcul"""
+    index = _read_cache_index(lidar_id)
+    if index is not None and level < index['lod_levels']:
+        points = np.load(_cache_dir(lidar_id) / f"lod_{level}.npy", mmap_mode='r')
+        return points[:max_points], np.asarray(index['origin'])
+    
+    processor = _get_processor(filepath)
+    stride = 4 ** level
+    stop = None if max_points is None else max_points * stride
+    return processor._stack(slice(None, stop, stride), absolute=False), processor.origin
+
+
+def _load_tiles_meta(lidar_id: int, filepath: str, tile_size: float) -> List[Dict]:
+    """Métadonnées des tuiles : index précalculé si même taille, sinon calcul"""
+    index = _read_cache_index(lidar_id)
+    if index is not None and index['tiles'] is not None and index['tile_size'] == tile_size:
+        return index['tiles']
+    
+    tiles = _get_processor(filepath).generate_tiles(tile_size=tile_size)
+    return [
+        {'bounds': tile['bounds'], 'point_count': tile['point_count'], 'center': tile['center']}
+        for tile in tiles
+    ]
+
+
+def _load_tile(lidar_id: int, filepath: str, tile_id: int,
+               stride: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Points d'une tuile (float32 locaux, décimés) et origine ; None si la tuile n'existe pas"""
+    index = _read_cache_index(lidar_id)
+    if index is not None and index['tiles'] is not None:
+        if not 0 <= tile_id < len(index['tiles']):
+            return None
+        points = np.load(_cache_dir(lidar_id) / f"tile_{tile_id}.npy", mmap_mode='r')
+        return points[::stride], np.asarray(index['origin'])
+    
+    processor = _get_processor(filepath)
+    tiles = processor.generate_tiles(tile_size=DEFAULT_TILE_SIZE)
+    if not 0 <= tile_id < len(tiles):
+        return None
+    return tiles[tile_id]['points'][::stride] - processor.origin, processor.origin
+
+
+def _get_encode_pool() -> ProcessPoolExecutor:
+    """
+    Pool de processus d'encodage, démarré en mode spawn
+    
+    Un fork hériterait des threads et connexions du serveur ; spawn repart d'un
+    interpréteur neuf. Limité à settings.ENCODE_WORKERS processus : chaque worker
+    gunicorn a son propre pool et les 2n+1 workers occupent déjà les cœurs.
+    """
+    global _encode_pool
+    with _encode_pool_lock:
+        if _encode_pool is None:
+            _encode_pool = ProcessPoolExecutor(
+                max_workers=settings.ENCODE_WORKERS, mp_context=multiprocessing.get_context('spawn')
+            )
+        return _encode_pool
+
+
+def _load_compressed(lidar_id: int, filepath: str, lod: int, quantization_bits: int,
+                     compression_level: int) -> Tuple[Path, Dict]:
+    """
+    Points compressés d'un niveau LOD : fichier déjà encodé, sinon encodage et écriture
+    
+    La clé (chemin, date de modification, paramètres) invalide les versions d'un fichier
+    modifié. Le blob est renommé atomiquement, puis ses métadonnées écrites en dernier.
+    
+    Returns:
+        (chemin du blob, métadonnées : encodage, origine, nombre de points)
+    """
+    source = Path(filepath)
+    key = f"{source.resolve()}|{source.stat().st_mtime_ns}|{lod}|{quantization_bits}|{compression_level}"
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+    cache_dir = _cache_dir(lidar_id) / "compressed"
+    blob_path = cache_dir / f"{digest}.bin"
+    meta_path = cache_dir / f"{digest}.json"
+    
+    if meta_path.exists():
+        return blob_path, json.loads(meta_path.read_text())
+    
+    points, origin = _load_lod(lidar_id, filepath, lod)
+    compressed, encoding = _get_encode_pool().submit(
+        LidarProcessor.compress_points_draco,
+        np.ascontiguousarray(points), quantization_bits, compression_level
+    ).result()
+    meta = {
+        'encoding': encoding,
+        'origin': [float(v) for v in origin],
+        'point_count': len(points),
+        'compressed_size': len(compressed),
+    }
+    
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    for path, data in ((blob_path, compressed), (meta_path, json.dumps(meta).encode())):
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+    
+    return blob_path, meta
+
+
+def _rasterize_area_dtm(filepaths: List[str], bounds: Tuple[float, float, float, float],
+                        resolution: float, chunk_size: int) -> np.ndarray:
+    """
+    DTM d'une zone couverte par plusieurs fichiers, calculé par blocs en parallèle
+    
+    1. Partition : les points de sol de chaque fichier sont répartis par bloc de
+       chunk_size x chunk_size cellules de la grille de la zone (un tri par fichier).
+    2. Chaque bloc est rastérisé indépendamment (Z min, tous fichiers confondus)
+       dans le pool de traitement.
+    3. Les blocs sont assemblés, puis les trous remplis sur la grille complète.
+    """
+    min_x, min_y, max_x, max_y = bounds
+    nx = max(1, math.ceil((max_x - min_x) / resolution))
+    ny = max(1, math.ceil((max_y - min_y) / resolution))
+    blocks_x = math.ceil(nx / chunk_size)
+    
+    parts: Dict[int, List[Tuple[np.ndarray, np.ndarray, np.ndarray]]] = {}
+    for filepath in filepaths:
+        processor = _get_processor(filepath)
+        ground = processor._ground_indices()
+        
+        i = np.floor((processor.x[ground] + (processor.origin[0] - min_x)) / resolution).astype(np.int64)
+        j = np.floor((processor.y[ground] + (processor.origin[1] - min_y)) / resolution).astype(np.int64)
+        inside = (i >= 0) & (i < nx) & (j >= 0) & (j < ny)
+        i, j, z = i[inside], j[inside], processor.z[ground][inside]
+        
+        blocks = (j // chunk_size) * blocks_x + i // chunk_size
+        order = np.argsort(blocks, kind='stable')
+        blocks = blocks[order]
+        starts = LidarProcessor._run_starts(blocks)
+        ends = np.append(starts[1:], len(blocks))
+        for start, end in zip(starts, ends):
+            index = order[start:end]
+            parts.setdefault(int(blocks[start]), []).append((i[index], j[index], z[index]))
+    
+    def rasterize_block(block: int) -> Tuple[int, int, np.ndarray]:
+        by, bx = divmod(block, blocks_x)
+        i0, j0 = bx * chunk_size, by * chunk_size
+        width, height = min(chunk_size, nx - i0), min(chunk_size, ny - j0)
+        grid = np.full((height, width), np.nan)
+        for i, j, z in parts[block]:
+            grid = np.fmin(grid, LidarProcessor._rasterize(
+                i - i0, j - j0, z, 0, 0, width, height, 1.0, np.minimum
+            ))
+        return i0, j0, grid
+    
+    dtm = np.full((ny, nx), np.nan)
+    for i0, j0, grid in _processing_pool.map(rasterize_block, list(parts)):
+        dtm[j0:j0 + grid.shape[0], i0:i0 + grid.shape[1]] = grid
+    
+    return LidarProcessor._fill_nan_grid(dtm)
+
+
+def _process_advanced_upload(lidar_id: int, filepath: Path, options: Dict[str, bool]):
+    """
+    Traitements avancés d'un fichier uploadé (tâche de fond)
+    
+    Le résultat (ou l'erreur) est enregistré dans les métadonnées de l'entrée LIDAR.
+    """
+    db = SessionLocal()
+    try:
+        lidar = db.get(LidarData, lidar_id)
+        if lidar is None:
+            return
+        
+        try:
+            processor = _get_processor(filepath)
+            processing = {}
+            
+            # Lancement en parallèle des traitements demandés (indépendants entre eux)
+            jobs = {}
+            if options['generate_tiles']:
+                jobs['tiles'] = _processing_pool.submit(processor.generate_tiles, DEFAULT_TILE_SIZE)
+            if options['generate_lod']:
+                jobs['lod'] = _processing_pool.submit(processor.generate_lod_levels, LOD_LEVELS)
+            if options['extract_dtm'] and options['extract_dsm']:
+                jobs['dtm_dsm'] = _processing_pool.submit(processor.generate_dtm_dsm, 1.0)
+            elif options['extract_dtm']:
+                jobs['dtm'] = _processing_pool.submit(processor.generate_dtm, 1.0)
+            elif options['extract_dsm']:
+                jobs['dsm'] = _processing_pool.submit(processor.generate_dsm, 1.0)
+            
+            results = {name: job.result() for name, job in jobs.items()}
+            if 'dtm_dsm' in results:
+                results['dtm'], results['dsm'] = results.pop('dtm_dsm')
+            
+            # Tuiles et LOD enregistrés sur disque pour les requêtes de streaming
+            if 'tiles' in results or 'lod' in results:
+                _write_cache(lidar_id, processor, results.get('tiles'), results.get('lod'))
+            
+            if options['generate_octree']:
+                # Note: Sauvegarde simplifiée, en réel sauver l'octree complet
+                processing['octree'] = {'status': 'generated', 'max_level': 10}
+            
+            if 'tiles' in results:
+                processing['tiles'] = {
+                    'count': len(results['tiles']),
+                    'tile_size': DEFAULT_TILE_SIZE
+                }
+            
+            if 'lod' in results:
+                processing['lod'] = {
+                    'levels': len(results['lod']),
+                    'points_per_level': [len(lod) for lod in results['lod']]
+                }
+            
+            if 'dtm' in results:
+                dtm = results['dtm']
+                processing['dtm'] = {
+                    'resolution': dtm['resolution'],
+                    'shape': dtm['shape'],
+                    'bounds': dtm['bounds']
+                }
+            
+            if 'dsm' in results:
+                dsm = results['dsm']
+                processing['dsm'] = {
+                    'resolution': dsm['resolution'],
+                    'shape': dsm['shape'],
+                    'bounds': dsm['bounds']
+                }
+            
+            lidar.lidar_metadata = {'status': 'completed', **processing}
+            lidar.processed = 1
+        except Exception as e:
+            lidar.lidar_metadata = {'status': 'failed', 'error': str(e)}
+        
+        db.commit()
+    finally:
+        db.close()
+
+
+@router.post("/upload/advanced", status_code=202)
 async def upload_lidar_advanced(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     generate_octree: bool = True,
     generate_tiles: bool = True,
@@ -533,6 +1353,10 @@ async def upload_lidar_advanced(
     """
     Upload LIDAR avec traitement avancé complet
     
+    Le fichier est enregistré puis la réponse est renvoyée immédiatement
+    (status: processing) ; les traitements s'exécutent en tâche de fond et leur
+    état se consulte via /files/{lidar_id}/status.
+    
     - **generate_octree**: Construit un octree hiérarchique
     - **generate_tiles**: Génère des tuiles spatiales
     - **generate_lod**: Crée plusieurs niveaux de détail
@@ -551,87 +1375,89 @@ async def upload_lidar_advanced(
         safe_filename = f"{timestamp}_{file.filename}"
         filepath = lidar_dir / safe_filename
         
-        content = await file.read()
-        with open(filepath, "wb") as f:
-            f.write(content)
-        
-        # Créer le processeur
-        processor = LidarProcessor(filepath)
+        # Copie hors de la boucle d'événements, taille limitée (HTTP 400 au-delà)
+        await save_upload(file, filepath)
         
-        # Métadonnées de base
-        las = processor.las
+        # Métadonnées de base, depuis l'en-tête (sans décoder les points)
+        header = await asyncio.to_thread(read_header, filepath)
+        min_x, min_y, min_z = (float(v) for v in header.mins)
+        max_x, max_y, max_z = (float(v) for v in header.maxs)
         result = {
             'filename': safe_filename,
-            'point_count': len(processor.points),
+            'point_count': int(header.point_count),
             'bounds': {
-                'min_x': float(processor.points[:, 0].min()),
-                'max_x': float(processor.points[:, 0].max()),
-                'min_y': float(processor.points[:, 1].min()),
-                'max_y': float(processor.points[:, 1].max()),
-                'min_z': float(processor.points[:, 2].min()),
-                'max_z': float(processor.points[:, 2].max())
-            },
-            'processing': {}
-        }
-        
-        # Traitement conditionnel
-        if generate_octree:
-            # Note: Sauvegarde simplifiée, en réel sauver l'octree complet
-            result['processing']['octree'] = {'status': 'generated', 'max_level': 10}
-        
-        if generate_tiles:
-            tiles = processor.generate_tiles(tile_size=100.0)
-            result['processing']['tiles'] = {
-                'count': len(tiles),
-                'tile_size': 100.0
-            }
-        
-        if generate_lod:
-            lod_levels = processor.generate_lod_levels(num_levels=5)
-            result['processing']['lod'] = {
-                'levels': len(lod_levels),
-                'points_per_level': [len(lod) for lod in lod_levels]
-            }
-        
-        if extract_dtm:
-            dtm = processor.generate_dtm(resolution=1.0)
-            result['processing']['dtm'] = {
-                'resolution': dtm['resolution'],
-                'shape': dtm['shape'],
-                'bounds': dtm['bounds']
-            }
-        
-        if extract_dsm:
-            dsm = processor.generate_dsm(resolution=1.0)
-            result['processing']['dsm'] = {
-                'resolution': dsm['resolution'],
-                'shape': dsm['shape'],
-                'bounds': dsm['bounds']
+                'min_x': min_x,
+                'max_x': max_x,
+                'min_y': min_y,
+                'max_y': max_y,
+                'min_z': min_z,
+                'max_z': max_z
             }
+        }
         
-        # Sauvegarder en base
-        lidar_entry = LidarData(
+        # Sauvegarder en base (INSERT ... RETURNING)
+        stmt = insert(LidarData).values(
             filename=safe_filename,
             filepath=str(filepath),
-            point_count=len(processor.points),
-            min_elevation=float(processor.points[:, 2].min()),
-            max_elevation=float(processor.points[:, 2].max()),
-            bounds=f"SRID=4326;POLYGON(({result['bounds']['min_x']} {result['bounds']['min_y']},{result['bounds']['max_x']} {result['bounds']['min_y']},{result['bounds']['max_x']} {result['bounds']['max_y']},{result['bounds']['min_x']} {result['bounds']['max_y']},{result['bounds']['min_x']} {result['bounds']['min_y']}))",
-            metadata=result['processing'],
-            processed=1
-        )
-        db.add(lidar_entry)
+            point_count=result['point_count'],
+            min_elevation=min_z,
+            max_elevation=max_z,
+            bounds=func.ST_MakeEnvelope(min_x, min_y, max_x, max_y, 4326),
+            lidar_metadata={'status': 'processing'},
+            processed=0
+        ).returning(LidarData.id)
+        
+        lidar_id = db.execute(stmt).scalar_one()
         db.commit()
-        db.refresh(lidar_entry)
         
-        result['lidar_id'] = lidar_entry.id
+        # Traitements lourds après l'envoi de la réponse
+        background_tasks.add_task(
+            _process_advanced_upload,
+            lidar_id,
+            filepath,
+            {
+                'generate_octree': generate_octree,
+                'generate_tiles': generate_tiles,
+                'generate_lod': generate_lod,
+                'extract_dtm': extract_dtm,
+                'extract_dsm': extract_dsm
+            }
+        )
+        
+        result['lidar_id'] = lidar_id
+        result['status'] = 'processing'
         
         return result
         
+    except HTTPException:
+        raise
     except Exception as e:
+        db.rollback()
         raise HTTPException(status_code=500, detail=f"Erreur traitement: {str(e)}")
 
 
+@router.get("/files/{lidar_id}/status")
+async def get_processing_status(
+    lidar_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    État des traitements avancés lancés à l'upload
+    """
+    lidar = db.get(LidarData, lidar_id)
+    if not lidar:
+        raise HTTPException(status_code=404, detail="Fichier LIDAR non trouvé")
+    
+    metadata = lidar.lidar_metadata or {}
+    
+    return {
+        'lidar_id': lidar.id,
+        'processed': bool(lidar.processed),
+        'status': metadata.get('status', 'completed' if lidar.processed else 'unknown'),
+        'processing': {k: v for k, v in metadata.items() if k != 'status'}
+    }
+
+
 @router.get("/files/{lidar_id}/octree/{level}")
 async def get_octree_level(
     lidar_id: int,
@@ -640,29 +1466,31 @@ async def get_octree_level(
 ):
     """
     Récupère un niveau spécifique de l'octree pour streaming
+    
+    Réponse binaire : XYZ float32 (n, 3), X/Y relatifs à l'origine de l'en-tête X-Origin.
     """
-    lidar = db.query(LidarData).filter(LidarData.id == lidar_id).first()
+    lidar = db.get(LidarData, lidar_id)
     if not lidar:
         raise HTTPException(status_code=404, detail="Fichier LIDAR non trouvé")
     
     try:
-        processor = LidarProcessor(Path(lidar.filepath))
-        
-        # Générer LOD pour ce niveau
+        # LOD de ce niveau (précalculé à l'upload si disponible), limité pour le streaming
         stride = 4 ** level
-        points = processor.points[::stride]
-        
-        # Limiter pour streaming
         max_points = 100000
-        if len(points) > max_points:
-            points = points[:max_points]
+        points, origin = await asyncio.to_thread(
+            _load_lod, lidar_id, lidar.filepath, level, max_points
+        )
         
-        return {
-            'level': level,
-            'point_count': len(points),
-            'points': points.tolist(),
-            'stride': stride
-        }
+        return _array_response(
+            points,
+            f"octree_level{level}.f32",
+            headers={
+                'X-Level': str(level),
+                'X-Point-Count': str(len(points)),
+                'X-Stride': str(stride),
+                'X-Origin': ','.join(str(float(v)) for v in origin)
+            }
+        )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -677,23 +1505,13 @@ async def get_spatial_tiles(
     """
     Récupère les tuiles spatiales
     """
-    lidar = db.query(LidarData).filter(LidarData.id == lidar_id).first()
+    lidar = db.get(LidarData, lidar_id)
     if not lidar:
         raise HTTPException(status_code=404, detail="Fichier LIDAR non trouvé")
     
     try:
-        processor = LidarProcessor(Path(lidar.filepath))
-        tiles = processor.generate_tiles(tile_size=tile_size)
-        
-        # Retourner uniquement les métadonnées des tuiles (pas les points)
-        tiles_meta = [
-            {
-                'bounds': tile['bounds'],
-                'point_count': tile['point_count'],
-                'center': tile['center']
-            }
-            for tile in tiles
-        ]
+        # Uniquement les métadonnées des tuiles (pas les points)
+        tiles_meta = await asyncio.to_thread(_load_tiles_meta, lidar_id, lidar.filepath, tile_size)
         
         return {
             'tile_count': len(tiles_meta),
@@ -714,31 +1532,36 @@ async def stream_tile_points(
 ):
     """
     Streaming adaptatif d'une tuile spécifique
+    
+    Réponse binaire : XYZ float32 (n, 3), X/Y relatifs à l'origine de l'en-tête X-Origin.
     """
-    lidar = db.query(LidarData).filter(LidarData.id == lidar_id).first()
+    lidar = db.get(LidarData, lidar_id)
     if not lidar:
         raise HTTPException(status_code=404, detail="Fichier LIDAR non trouvé")
     
     try:
-        processor = LidarProcessor(Path(lidar.filepath))
-        tiles = processor.generate_tiles()
+        # Points de la tuile (précalculée à l'upload si disponible), avec LOD appliqué
+        stride = 4 ** lod
+        tile = await asyncio.to_thread(_load_tile, lidar_id, lidar.filepath, tile_id, stride)
         
-        if tile_id >= len(tiles):
+        if tile is None:
             raise HTTPException(status_code=404, detail="Tuile non trouvée")
         
-        tile_points = tiles[tile_id]['points']
-        
-        # Appliquer LOD
-        stride = 4 ** lod
-        tile_points = tile_points[::stride]
+        tile_points, origin = tile
         
-        return {
-            'tile_id': tile_id,
-            'lod': lod,
-            'point_count': len(tile_points),
-            'points': tile_points.tolist()
-        }
+        return _array_response(
+            tile_points,
+            f"tile{tile_id}_lod{lod}.f32",
+            headers={
+                'X-Tile-Id': str(tile_id),
+                'X-Lod': str(lod),
+                'X-Point-Count': str(len(tile_points)),
+                'X-Origin': ','.join(str(float(v)) for v in origin)
+            }
+        )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -752,27 +1575,47 @@ async def generate_dtm_endpoint(
     """
     Génère un Modèle Numérique de Terrain (DTM)
     
+    Réponse binaire : grille float32 (ny, nx), lignes d'Y croissant ; résolution et
+    emprise dans les en-têtes. Statistiques via /dtm/meta.
+    
     - **resolution**: Résolution de la grille en mètres
     """
-    lidar = db.query(LidarData).filter(LidarData.id == lidar_id).first()
+    lidar = db.get(LidarData, lidar_id)
     if not lidar:
         raise HTTPException(status_code=404, detail="Fichier LIDAR non trouvé")
     
     try:
-        processor = LidarProcessor(Path(lidar.filepath))
-        dtm = processor.generate_dtm(resolution=resolution)
+        processor = await asyncio.to_thread(_get_processor, lidar.filepath)
+        dtm = await asyncio.to_thread(processor.generate_dtm, resolution=resolution)
+        
+        return _array_response(dtm['grid'], "dtm.f32", headers=_grid_headers(dtm))
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/files/{lidar_id}/dtm/meta")
+async def get_dtm_meta(
+    lidar_id: int,
+    resolution: float = Query(1.0, ge=0.1, le=10.0),
+    db: Session = Depends(get_db)
+):
+    """
+    Métadonnées et statistiques du DTM, sans la grille
+    """
+    lidar = db.get(LidarData, lidar_id)
+    if not lidar:
+        raise HTTPException(status_code=404, detail="Fichier LIDAR non trouvé")
+    
+    try:
+        processor = await asyncio.to_thread(_get_processor, lidar.filepath)
+        dtm = await asyncio.to_thread(processor.generate_dtm, resolution=resolution)
         
         return {
             'resolution': dtm['resolution'],
             'shape': dtm['shape'],
             'bounds': dtm['bounds'],
-            'grid': dtm['grid'].tolist(),  # Attention: peut être volumineux
-            'statistics': {
-                'min': float(np.nanmin(dtm['grid'])),
-                'max': float(np.nanmax(dtm['grid'])),
-                'mean': float(np.nanmean(dtm['grid'])),
-                'std': float(np.nanstd(dtm['grid']))
-            }
+            'statistics': _grid_statistics(dtm['grid'])
         }
         
     except Exception as e:
@@ -787,32 +1630,107 @@ async def generate_dsm_endpoint(
 ):
     """
     Génère un Modèle Numérique de Surface (DSM)
+    
+    Réponse binaire, même format que /dtm. Statistiques via /dsm/meta.
+    """
+    lidar = db.get(LidarData, lidar_id)
+    if not lidar:
+        raise HTTPException(status_code=404, detail="Fichier LIDAR non trouvé")
+    
+    try:
+        processor = await asyncio.to_thread(_get_processor, lidar.filepath)
+        dsm = await asyncio.to_thread(processor.generate_dsm, resolution=resolution)
+        
+        return _array_response(dsm['grid'], "dsm.f32", headers=_grid_headers(dsm))
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/files/{lidar_id}/dsm/meta")
+async def get_dsm_meta(
+    lidar_id: int,
+    resolution: float = Query(1.0, ge=0.1, le=10.0),
+    db: Session = Depends(get_db)
+):
     """
-    lidar = db.query(LidarData).filter(LidarData.id == lidar_id).first()
+    Métadonnées et statistiques du DSM, sans la grille
+    """
+    lidar = db.get(LidarData, lidar_id)
     if not lidar:
         raise HTTPException(status_code=404, detail="Fichier LIDAR non trouvé")
     
     try:
-        processor = LidarProcessor(Path(lidar.filepath))
-        dsm = processor.generate_dsm(resolution=resolution)
+        processor = await asyncio.to_thread(_get_processor, lidar.filepath)
+        dsm = await asyncio.to_thread(processor.generate_dsm, resolution=resolution)
         
         return {
             'resolution': dsm['resolution'],
             'shape': dsm['shape'],
             'bounds': dsm['bounds'],
-            'grid': dsm['grid'].tolist(),
-            'statistics': {
-                'min': float(np.nanmin(dsm['grid'])),
-                'max': float(np.nanmax(dsm['grid'])),
-                'mean': float(np.nanmean(dsm['grid'])),
-                'std': float(np.nanstd(dsm['grid']))
-            }
+            'statistics': _grid_statistics(dsm['grid'])
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/area/dtm")
+async def generate_area_dtm(
+    bounds: List[float],  # [min_x, min_y, max_x, max_y]
+    resolution: float = Query(1.0, ge=0.1, le=10.0),
+    chunk_size: int = Query(1024, ge=64, le=4096),
+    lidar_ids: Optional[List[int]] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """
+    DTM d'une zone couverte par plusieurs fichiers LIDAR, calculé par blocs en parallèle
+    
+    Réponse binaire, même format que /files/{lidar_id}/dtm.
+    
+    - **bounds**: Emprise [min_x, min_y, max_x, max_y]
+    - **resolution**: Résolution de la grille en mètres
+    - **chunk_size**: Taille des blocs de calcul (en cellules)
+    - **lidar_ids**: Fichiers à utiliser (défaut: tous ceux qui recoupent l'emprise)
+    """
+    if len(bounds) != 4 or bounds[0] >= bounds[2] or bounds[1] >= bounds[3]:
+        raise HTTPException(status_code=400, detail="Emprise invalide: [min_x, min_y, max_x, max_y]")
+    
+    cells = math.ceil((bounds[2] - bounds[0]) / resolution) * math.ceil((bounds[3] - bounds[1]) / resolution)
+    if cells > MAX_AREA_CELLS:
+        raise HTTPException(status_code=400, detail=f"Zone trop grande ({cells} cellules, max {MAX_AREA_CELLS})")
+    
+    # Fichiers dont l'emprise recoupe la zone (index spatial sur bounds)
+    query = db.query(LidarData.filepath).filter(
+        func.ST_Intersects(LidarData.bounds, func.ST_MakeEnvelope(*bounds, 4326))
+    )
+    if lidar_ids:
+        query = query.filter(LidarData.id.in_(lidar_ids))
+    filepaths = [row.filepath for row in query.all()]
+    
+    if not filepaths:
+        raise HTTPException(status_code=404, detail="Aucun fichier LIDAR sur cette emprise")
+    
+    try:
+        dtm = await asyncio.to_thread(
+            _rasterize_area_dtm, filepaths, tuple(bounds), resolution, chunk_size
+        )
+        
+        return _array_response(
+            dtm,
+            "area_dtm.f32",
+            headers={
+                'X-Resolution': str(resolution),
+                'X-Bounds': f"{bounds[0]},{bounds[0] + dtm.shape[1] * resolution},"
+                            f"{bounds[1]},{bounds[1] + dtm.shape[0] * resolution}",
+                'X-File-Count': str(len(filepaths))
+            }
+        )
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/files/{lidar_id}/buildings")
 async def detect_buildings(
     lidar_id: int,
@@ -822,19 +1740,18 @@ async def detect_buildings(
     """
     Détecte les bâtiments et calcule leurs hauteurs
     """
-    lidar = db.query(LidarData).filter(LidarData.id == lidar_id).first()
+    lidar = db.get(LidarData, lidar_id)
     if not lidar:
         raise HTTPException(status_code=404, detail="Fichier LIDAR non trouvé")
     
     try:
-        processor = LidarProcessor(Path(lidar.filepath))
+        processor = await asyncio.to_thread(_get_processor, lidar.filepath)
         
-        # Générer DTM et DSM
-        dtm = processor.generate_dtm(resolution=resolution)
-        dsm = processor.generate_dsm(resolution=resolution)
+        # Générer DTM et DSM (même grille, une seule passe)
+        dtm, dsm = await asyncio.to_thread(processor.generate_dtm_dsm, resolution=resolution)
         
         # Détecter bâtiments
-        buildings = processor.calculate_building_heights(dtm, dsm)
+        buildings = await asyncio.to_thread(processor.calculate_building_heights, dtm, dsm)
         
         return {
             'building_count': len(buildings),
@@ -849,7 +1766,7 @@ async def detect_buildings(
 @router.post("/files/{lidar_id}/volume")
 async def calculate_volume_endpoint(
     lidar_id: int,
-    polygon: List[List[float]],  # [[x1, y1], [x2, y2], ...]
+    polygon: List[Tuple[float, float]],  # [[x1, y1], [x2, y2], ...]
     base_height: float = 0.0,
     db: Session = Depends(get_db)
 ):
@@ -859,17 +1776,17 @@ async def calculate_volume_endpoint(
     - **polygon**: Liste de coordonnées [x, y] définissant le polygone
     - **base_height**: Hauteur de base pour le calcul (défaut: 0)
     """
-    lidar = db.query(LidarData).filter(LidarData.id == lidar_id).first()
+    lidar = db.get(LidarData, lidar_id)
     if not lidar:
         raise HTTPException(status_code=404, detail="Fichier LIDAR non trouvé")
     
     try:
-        processor = LidarProcessor(Path(lidar.filepath))
+        processor = await asyncio.to_thread(_get_processor, lidar.filepath)
         
-        # Convertir liste en tuples
-        polygon_coords = [tuple(coord) for coord in polygon]
+        # Sommets validés (paires) par FastAPI, convertis en un seul tableau (V, 2)
+        polygon_arr = np.asarray(polygon, dtype=np.float64)
         
-        volume = processor.calculate_volume(polygon_coords, base_height)
+        volume = await asyncio.to_thread(processor.calculate_volume, polygon_arr, base_height)
         
         return {
             'volume_m3': volume,
@@ -882,39 +1799,65 @@ async def calculate_volume_endpoint(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/files/{lidar_id}/mesh")
+@router.post("/files/{lidar_id}/mesh", response_model=None)
 async def generate_terrain_mesh(
     lidar_id: int,
     resolution: float = 1.0,
     simplification: float = 0.1,
+    format: str = "binary",  # binary, json
     db: Session = Depends(get_db)
 ):
     """
     Génère un mesh triangulé du terrain
     
+    Format `binary` (défaut) : vertex_count x 3 float32 (X/Y relatifs à l'origine X-Origin,
+    Z absolu), suivis de face_count x 3 uint32 (indices de vertices), little-endian.
+    Format `json` : vertices (coordonnées absolues) et faces en listes JSON.
+    
     - **resolution**: Résolution du DTM en mètres
     - **simplification**: Facteur de simplification (0.0 à 1.0)
+    - **format**: `binary` ou `json`
     """
-    lidar = db.query(LidarData).filter(LidarData.id == lidar_id).first()
+    lidar = db.get(LidarData, lidar_id)
     if not lidar:
         raise HTTPException(status_code=404, detail="Fichier LIDAR non trouvé")
     
     try:
-        processor = LidarProcessor(Path(lidar.filepath))
+        processor = await asyncio.to_thread(_get_processor, lidar.filepath)
         
         # Générer DTM
-        dtm = processor.generate_dtm(resolution=resolution)
+        dtm = await asyncio.to_thread(processor.generate_dtm, resolution=resolution)
         
         # Générer mesh
-        mesh = processor.generate_mesh(dtm, simplification=simplification)
+        mesh = await asyncio.to_thread(processor.generate_mesh, dtm, simplification=simplification)
+        
+        if format == "json":
+            # Tableaux NumPy sérialisés directement par orjson (pas de listes Python)
+            return ORJSONResponse({
+                'vertex_count': mesh['vertex_count'],
+                'face_count': mesh['face_count'],
+                'vertices': mesh['vertices'],
+                'faces': mesh['faces'],
+                'simplification_factor': simplification
+            })
         
-        return {
-            'vertex_count': mesh['vertex_count'],
-            'face_count': mesh['face_count'],
-            'vertices': mesh['vertices'],
-            'faces': mesh['faces'],
-            'simplification_factor': simplification
-        }
+        # Corps binaire : vertices float32 (n x 3, relatifs à X-Origin) puis faces uint32 (m x 3)
+        vertices = np.ascontiguousarray(mesh['vertices'] - processor.origin, dtype='<f4')
+        faces = np.ascontiguousarray(mesh['faces'], dtype='<u4')
+        
+        return StreamingResponse(
+            _iter_array_bytes(vertices, faces),
+            media_type="application/octet-stream",
+            headers={
+                'Content-Disposition': f'attachment; filename="mesh_{lidar_id}.bin"',
+                'Content-Length': str(vertices.nbytes + faces.nbytes),
+                'X-Vertex-Count': str(mesh['vertex_count']),
+                'X-Face-Count': str(mesh['face_count']),
+                'X-Origin': ','.join(str(float(v)) for v in processor.origin),
+                'X-Simplification': str(simplification),
+                **BINARY_HEADERS
+            }
+        )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -933,14 +1876,14 @@ async def plan_drone_coverage(
     - **altitude**: Altitude de vol en mètres
     - **overlap**: Taux de recouvrement entre passes (0.5 à 0.9)
     """
-    lidar = db.query(LidarData).filter(LidarData.id == lidar_id).first()
+    lidar = db.get(LidarData, lidar_id)
     if not lidar:
         raise HTTPException(status_code=404, detail="Fichier LIDAR non trouvé")
     
     try:
-        processor = LidarProcessor(Path(lidar.filepath))
+        processor = await asyncio.to_thread(_get_processor, lidar.filepath)
         
-        path = processor.plan_drone_path(altitude=altitude, overlap=overlap)
+        path = await asyncio.to_thread(processor.plan_drone_path, altitude=altitude, overlap=overlap)
         
         return path
         
@@ -961,57 +1904,64 @@ async def get_streaming_budget(
     - **target_fps**: FPS cible
     - **points_per_frame**: Nombre de points maximum par frame
     """
-    lidar = db.query(LidarData).filter(LidarData.id == lidar_id).first()
+    lidar = db.get(LidarData, lidar_id)
     if not lidar:
         raise HTTPException(status_code=404, detail="Fichier LIDAR non trouvé")
     
     try:
-        processor = LidarProcessor(Path(lidar.filepath))
-        
-        budget = processor.estimate_streaming_budget(target_fps, points_per_frame)
+        # Nombre de points enregistré à l'import : pas de chargement du nuage
+        total_points = lidar.point_count
+        if total_points is None:
+            processor = await asyncio.to_thread(_get_processor, lidar.filepath)
+            total_points = len(processor.x)
         
-        return budget
+        return LidarProcessor.estimate_streaming_budget(total_points, target_fps, points_per_frame)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/files/{lidar_id}/compressed")
+@router.get("/files/{lidar_id}/compressed", response_model=None)
 async def get_compressed_points(
     lidar_id: int,
-    lod: int = 0,
-    quantization_bits: int = 14,
+    lod: int = Query(0, ge=0),
+    quantization_bits: int = Query(14, ge=10, le=16),
+    compression_level: int = Query(10, ge=0, le=10),
     db: Session = Depends(get_db)
 ):
     """
-    Récupère les points compressés (format Draco simulé)
+    Récupère les points compressés (Draco, ou zlib si DracoPy est absent)
+    
+    Les coordonnées X/Y sont relatives à l'origine donnée par l'en-tête X-Origin.
+    Réponse en Content-Encoding: identity : le flux est déjà entropiquement codé,
+    une compression gzip supplémentaire coûterait du CPU sans réduire la taille.
     
     - **lod**: Niveau de détail
     - **quantization_bits**: Bits de quantification (10-16)
+    - **compression_level**: Niveau de compression Draco (0-10)
     """
-    lidar = db.query(LidarData).filter(LidarData.id == lidar_id).first()
+    lidar = db.get(LidarData, lidar_id)
     if not lidar:
         raise HTTPException(status_code=404, detail="Fichier LIDAR non trouvé")
     
     try:
-        processor = LidarProcessor(Path(lidar.filepath))
-        
-        # Obtenir points LOD
-        stride = 4 ** lod
-        points = processor.points[::stride]
-        
-        # Compresser
-        compressed = processor.compress_points_draco(points, quantization_bits)
+        # Blob encodé une seule fois par (fichier, LOD, paramètres), puis servi depuis le disque
+        blob_path, meta = await asyncio.to_thread(
+            _load_compressed, lidar_id, lidar.filepath, lod, quantization_bits, compression_level
+        )
         
-        # Retourner comme bytes
-        return StreamingResponse(
-            io.BytesIO(compressed),
+        extension = 'drc' if meta['encoding'] == 'draco' else 'zlib'
+        return FileResponse(
+            blob_path,
             media_type="application/octet-stream",
+            filename=f"points_lod{lod}_compressed.{extension}",
             headers={
-                'Content-Disposition': f'attachment; filename="points_lod{lod}_compressed.draco"',
-                'X-Original-Point-Count': str(len(points)),
-                'X-Compressed-Size': str(len(compressed)),
-                'X-Compression-Ratio': str(len(points) * 12 / len(compressed))
+                'X-Encoding': meta['encoding'],
+                'X-Origin': ','.join(str(v) for v in meta['origin']),
+                'X-Original-Point-Count': str(meta['point_count']),
+                'X-Compressed-Size': str(meta['compressed_size']),
+                'X-Compression-Ratio': str(meta['point_count'] * 12 / meta['compressed_size']),
+                **BINARY_HEADERS
             }
         )
         
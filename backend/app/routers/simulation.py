@@ -1,15 +1,21 @@
 """Router pour les simulations spatiales"""
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
+from sqlalchemy import select
 from pydantic import BaseModel
 from typing import List, Optional
 import numpy as np
 from shapely.geometry import Point, Polygon, shape, mapping
+from shapely.affinity import translate
+from shapely.wkb import dumps as wkb_dumps
 from datetime import datetime
 import math
 
 from app.database import get_db
 from app.models.spatial_models import SimulationResult
+from app.utils.geometry import geojson_geometries, geometry_mapping
+from app.utils.projection import to_utm, to_wgs84
 
 router = APIRouter()
 
@@ -88,7 +94,7 @@ async def simulate_flood(
         raise HTTPException(status_code=500, detail=f"Erreur simulation: {str(e)}")
 
 
-@router.post("/viewshed")
+@router.post("/viewshed", response_model=None)
 async def calculate_viewshed(
     request: ViewshedRequest,
     db: Session = Depends(get_db)
@@ -104,20 +110,24 @@ async def calculate_viewshed(
         # Simulation simplifiée
         # Dans un vrai cas, on utiliserait GDAL pour le calcul viewshed
         
-        # Création d'une zone visible circulaire (simplification)
-        visible_area = observer.buffer(request.radius / 111320.0)  # Conversion mètres -> degrés
+        # Création d'une zone visible circulaire (simplification), tracée en mètres
+        # dans la zone UTM de l'observateur
+        observer_utm, epsg = to_utm(observer)
+        visible_area_utm = observer_utm.buffer(request.radius)
+        visible_area_sqm = visible_area_utm.area
+        visible_area = to_wgs84(visible_area_utm, epsg)
         
         result = SimulationResult(
             simulation_type="viewshed",
             name=f"Viewshed analysis - {request.radius}m radius",
-            result_vector=f"SRID=4326;{visible_area.wkt}",
+            result_vector=wkb_dumps(visible_area, hex=True, srid=4326),
             parameters={
                 "observer_height": request.observer_height,
                 "radius": request.radius,
                 "dem_source": request.dem_source
             },
             statistics={
-                "visible_area_sqm": visible_area.area * 111320 * 111320,
+                "visible_area_sqm": visible_area_sqm,
                 "radius": request.radius
             }
         )
@@ -126,26 +136,26 @@ async def calculate_viewshed(
         db.commit()
         db.refresh(result)
         
-        return {
+        return ORJSONResponse({
             "simulation_id": result.id,
             "simulation_type": "viewshed",
             "result": {
                 "type": "Feature",
                 "geometry": mapping(visible_area),
                 "properties": {
-                    "visible_area_sqm": visible_area.area * 111320 * 111320,
+                    "visible_area_sqm": visible_area_sqm,
                     "radius": request.radius
                 }
             },
             "note": "Simulation simplifiée - version complète nécessite un MNT"
-        }
+        })
     
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Erreur viewshed: {str(e)}")
 
 
-@router.post("/solar-shadow")
+@router.post("/solar-shadow", response_model=None)
 async def calculate_solar_shadow(
     request: SolarShadowRequest,
     db: Session = Depends(get_db)
@@ -171,18 +181,18 @@ async def calculate_solar_shadow(
         # Direction de l'ombre (opposé au soleil)
         shadow_direction = sun_azimuth + 180
         
-        # Calcul du vecteur de déplacement (simplifié)
-        dx = shadow_length * math.sin(math.radians(shadow_direction)) / 111320.0
-        dy = shadow_length * math.cos(math.radians(shadow_direction)) / 111320.0
+        # Calcul du vecteur de déplacement en mètres
+        dx = shadow_length * math.sin(math.radians(shadow_direction))
+        dy = shadow_length * math.cos(math.radians(shadow_direction))
         
-        # Création de l'ombre (translation du bâtiment)
-        from shapely.affinity import translate
-        shadow = translate(building, xoff=dx, yoff=dy)
+        # Création de l'ombre (translation du bâtiment dans sa zone UTM)
+        building_utm, epsg = to_utm(building)
+        shadow = to_wgs84(translate(building_utm, xoff=dx, yoff=dy), epsg)
         
         result = SimulationResult(
             simulation_type="solar_shadow",
             name=f"Solar shadow - {request.date} {request.time}",
-            result_vector=f"SRID=4326;{shadow.wkt}",
+            result_vector=wkb_dumps(shadow, hex=True, srid=4326),
             parameters={
                 "building_height": request.building_height,
                 "date": request.date,
@@ -201,7 +211,7 @@ async def calculate_solar_shadow(
         db.commit()
         db.refresh(result)
         
-        return {
+        return ORJSONResponse({
             "simulation_id": result.id,
             "simulation_type": "solar_shadow",
             "result": {
@@ -214,7 +224,7 @@ async def calculate_solar_shadow(
                 }
             },
             "note": "Calcul simplifié - pour précision utiliser pysolar"
-        }
+        })
     
     except Exception as e:
         db.rollback()
@@ -224,41 +234,50 @@ async def calculate_solar_shadow(
 @router.get("/results")
 async def list_simulations(
     simulation_type: Optional[str] = None,
+    include_geometry: bool = False,
     db: Session = Depends(get_db)
 ):
-    """Liste toutes les simulations"""
-    query = db.query(SimulationResult)
+    """
+    Liste toutes les simulations
+    
+    - **include_geometry**: Ajoute la géométrie résultat (GeoJSON) de chaque simulation
+    """
+    query = select(
+        SimulationResult.id,
+        SimulationResult.simulation_type.label("type"),
+        SimulationResult.name,
+        SimulationResult.created_at,
+        SimulationResult.parameters,
+        SimulationResult.statistics
+    )
+    if include_geometry:
+        query = query.add_columns(SimulationResult.result_vector.label("geometry"))
     
     if simulation_type:
-        query = query.filter(SimulationResult.simulation_type == simulation_type)
+        query = query.where(SimulationResult.simulation_type == simulation_type)
     
-    results = query.order_by(SimulationResult.created_at.desc()).all()
+    rows = db.execute(query.order_by(SimulationResult.created_at.desc())).mappings().all()
     
-    return {
-        "count": len(results),
-        "simulations": [
-            {
-                "id": r.id,
-                "type": r.simulation_type,
-                "name": r.name,
-                "created_at": r.created_at.isoformat(),
-                "parameters": r.parameters,
-                "statistics": r.statistics
-            }
-            for r in results
-        ]
-    }
+    simulations = [dict(row) for row in rows]
+    if include_geometry:
+        geometries = geojson_geometries([simulation['geometry'] for simulation in simulations])
+        for simulation, geometry in zip(simulations, geometries):
+            simulation['geometry'] = geometry
+    
+    # Lignes Core sérialisées directement par orjson (dates comprises)
+    return ORJSONResponse({
+        "count": len(rows),
+        "simulations": simulations
+    })
 
 
-@router.get("/results/{simulation_id}")
+@router.get("/results/{simulation_id}", response_model=None)
 async def get_simulation_result(
     simulation_id: int,
     db: Session = Depends(get_db)
 ):
     """Récupère le résultat d'une simulation"""
-    result = db.query(SimulationResult).filter(
-        SimulationResult.id == simulation_id
-    ).first()
+    result = db.get(SimulationResult, simulation_id)
     
     if not result:
         raise HTTPException(status_code=404, detail="Simulation non trouvée")
@@ -274,15 +293,13 @@ async def get_simulation_result(
     
     # Ajout de la géométrie si elle existe
     if result.result_vector:
-        from geoalchemy2.shape import to_shape
-        geom = to_shape(result.result_vector)
         response["geometry"] = {
             "type": "Feature",
-            "geometry": mapping(geom),
+            "geometry": geometry_mapping(bytes(result.result_vector.data)),
             "properties": result.statistics
         }
     
-    return response
+    return ORJSONResponse(response)
 
 
 @router.delete("/results/{simulation_id}")
@@ -291,9 +308,7 @@ async def delete_simulation(
     db: Session = Depends(get_db)
 ):
     """Supprime une simulation"""
-    result = db.query(SimulationResult).filter(
-        SimulationResult.id == simulation_id
-    ).first()
+    result = db.get(SimulationResult, simulation_id)
     
     if not result:
         raise HTTPException(status_code=404, detail="Simulation non trouvée")
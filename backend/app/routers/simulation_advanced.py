@@ -12,22 +12,51 @@ Fonctionnalités:
 """
 
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
+from sqlalchemy import func, select
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any, Tuple
 import numpy as np
-from shapely.geometry import Point, Polygon, LineString, shape, mapping, box
+import shapely
+from shapely.geometry import Point, Polygon, LineString, shape, mapping
 from shapely.ops import unary_union
+from shapely.affinity import translate
+from shapely.wkb import dumps as wkb_dumps
+from functools import lru_cache
 from datetime import datetime, timedelta
 import math
+import json
+import asyncio
 from pathlib import Path
 
-from app.database import get_db
+from app.database import SessionLocal, get_db
 from app.models.spatial_models import SimulationResult
 from app.config import settings
+from app.utils.raster import (
+    GPU_VIEWSHED_MIN_CELLS, class_counter, cuda_available,
+    cumulative_viewshed, flood_depth, priority_flood, priority_flood_d8, viewshed, viewshed_r2,
+    viewshed_r2_gpu
+)
+from app.utils.geometry import geojson_geometries, geometry_mapping
+from app.utils.projection import to_utm, to_wgs84, utm_epsg
+from app.utils.solar import julian_day, solar_position, solar_positions
 
 router = APIRouter()
 
+# Taille maximale (cellules) du MNT partagé d'une visibilité cumulée
+MAX_VIEWSHED_CELLS = 16_000_000
+
+# Taille (cellules) des bandes de MNT traitées d'un bloc, ~256 Ko en float32 (cache L2)
+DEM_BAND_CELLS = 65_536
+
+# Taille maximale (cellules) d'un MNT synthétique gardé en cache, 16 Mo en float32 :
+# au plus 4 entrées, soit 64 Mo par processus
+MAX_CACHED_DEM_CELLS = 4_000_000
+
+# Octants d'exposition de 45°, dans l'ordre des indices ((aspect + 22.5) // 45) % 8
+ASPECT_OCTANTS = ("N", "NE", "E", "SE", "S", "SW", "W", "NW")
+
 
 # ==================== MODÈLES PYDANTIC ====================
 
@@ -58,6 +87,7 @@ class ViewshedRequest(BaseModel):
     radius: float = Field(1000, description="Rayon d'analyse (m)", ge=10, le=50000)
     dem_source: str = Field("lidar", description="Source MNT")
     resolution: float = Field(5.0, description="Résolution (m)", ge=1, le=50)
+    algorithm: str = Field("r2", description="Algorithme: r2 (balayage des bords) ou r3 (exact)")
     
     class Config:
         schema_extra = {
@@ -73,6 +103,22 @@ class ViewshedRequest(BaseModel):
         }
 
 
+class ViewshedObserver(BaseModel):
+    """Observateur d'une analyse de visibilité cumulée"""
+    observer_point: dict = Field(..., description="Point d'observation (GeoJSON)")
+    observer_height: float = Field(1.7, description="Hauteur observateur (m)", ge=0.5, le=300)
+    target_height: float = Field(0.0, description="Hauteur cible (m)", ge=0, le=50)
+
+
+class ViewshedBatchRequest(BaseModel):
+    """Visibilité cumulée de plusieurs observateurs sur un même MNT"""
+    observers: List[ViewshedObserver] = Field(..., description="Observateurs", min_length=1, max_length=1000)
+    radius: float = Field(1000, description="Rayon d'analyse autour de chaque observateur (m)", ge=10, le=50000)
+    dem_source: str = Field("lidar", description="Source MNT")
+    resolution: float = Field(5.0, description="Résolution (m)", ge=1, le=50)
+    include_grid: bool = Field(False, description="Inclure la grille de comptage")
+
+
 class SolarShadowRequest(BaseModel):
     """Analyse d'ombrage solaire précis"""
     building_geojson: dict = Field(..., description="Bâtiment (GeoJSON Polygon)")
@@ -144,78 +190,55 @@ class SolarCalculator:
         """
         Calcule la position du soleil (azimut et élévation)
         
+        Les positions sont mémorisées par lieu arrondi au centième de degré (~1 km, écart
+        de position du soleil négligeable), date et heure.
+        
         Retourne: (azimut en degrés, élévation en degrés)
         """
-        # Parse date et heure
-        dt = datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M")
-        
-        # Nombre de jours depuis J2000.0
-        y = dt.year
-        m = dt.month
-        d = dt.day
-        h = dt.hour + dt.minute / 60.0
-        
-        # Jour julien
-        if m <= 2:
-            y -= 1
-            m += 12
-        
-        A = int(y / 100)
-        B = 2 - A + int(A / 4)
-        
-        JD = int(365.25 * (y + 4716)) + int(30.6001 * (m + 1)) + d + B - 1524.5
-        JD += h / 24.0
-        
-        # Siècles juliens depuis J2000.0
-        T = (JD - 2451545.0) / 36525.0
-        
-        # Longitude moyenne du soleil
-        L0 = (280.46646 + 36000.76983 * T + 0.0003032 * T * T) % 360
-        
-        # Anomalie moyenne
-        M = (357.52911 + 35999.05029 * T - 0.0001537 * T * T) % 360
-        
-        # Équation du centre
-        C = ((1.914602 - 0.004817 * T - 0.000014 * T * T) * math.sin(math.radians(M))
-             + (0.019993 - 0.000101 * T) * math.sin(math.radians(2 * M))
-             + 0.000289 * math.sin(math.radians(3 * M)))
-        
-        # Longitude vraie
-        L = L0 + C
-        
-        # Obliquité de l'écliptique
-        epsilon = 23.439291 - 0.0130042 * T
-        
-        # Ascension droite et déclinaison
-        RA = math.degrees(math.atan2(math.cos(math.radians(epsilon)) * math.sin(math.radians(L)),
-                                      math.cos(math.radians(L))))
-        delta = math.degrees(math.asin(math.sin(math.radians(epsilon)) * math.sin(math.radians(L))))
-        
-        # Angle horaire
-        GMST = (280.46061837 + 360.98564736629 * (JD - 2451545.0) +
-                0.000387933 * T * T - T * T * T / 38710000.0) % 360
-        
-        LST = (GMST + lon) % 360
-        H = (LST - RA) % 360
-        if H > 180:
-            H -= 360
+        return SolarCalculator._solar_position_cached(
+            round(float(lat), 2), round(float(lon), 2), date_str, time_str
+        )
+    
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _solar_position_cached(lat: float, lon: float, date_str: str, time_str: str) -> Tuple[float, float]:
+        """Position du soleil d'un lieu déjà arrondi (mémorisée)"""
+        return solar_position(julian_day(date_str, time_str), lat, lon)
+    
+    @staticmethod
+    def solar_positions(lat: float, lon: float, jd: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Positions du soleil en un lieu pour un tableau de jours juliens (un seul appel)
         
-        # Élévation et azimut
-        lat_rad = math.radians(lat)
-        delta_rad = math.radians(delta)
-        H_rad = math.radians(H)
+        Retourne: (azimuts en degrés, élévations en degrés)
+        """
+        jd = np.asarray(jd, dtype=np.float64)
+        return solar_positions(jd, np.full(len(jd), lat, dtype=np.float64),
+                               np.full(len(jd), lon, dtype=np.float64))
+    
+    @staticmethod
+    def shadow_offsets(heights: np.ndarray, azimuths: np.ndarray,
+                       elevations: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Déplacements d'ombre portée d'un lot de bâtiments (soleil au-dessus de l'horizon)
         
-        elevation = math.degrees(math.asin(
-            math.sin(lat_rad) * math.sin(delta_rad) +
-            math.cos(lat_rad) * math.cos(delta_rad) * math.cos(H_rad)
-        ))
+        Returns:
+            Dictionnaire de tableaux : longueur (m), azimut de l'ombre, dx et dy (m)
+        """
+        heights = np.asarray(heights, dtype=np.float64)
+        elevations = np.asarray(elevations, dtype=np.float64)
         
-        azimuth = math.degrees(math.atan2(
-            -math.sin(H_rad),
-            math.tan(delta_rad) * math.cos(lat_rad) - math.sin(lat_rad) * math.cos(H_rad)
-        )) + 180
+        # Longueur de l'ombre et direction opposée au soleil
+        shadow_length = heights / np.tan(np.radians(elevations))
+        shadow_azimuth = (np.asarray(azimuths, dtype=np.float64) + 180) % 360
+        shadow_rad = np.radians(shadow_azimuth)
         
-        return (azimuth % 360, elevation)
+        return {
+            'shadow_length': shadow_length,
+            'shadow_azimuth': shadow_azimuth,
+            'dx': shadow_length * np.sin(shadow_rad),
+            'dy': shadow_length * np.cos(shadow_rad)
+        }
 
 
 class DEMProcessor:
@@ -227,6 +250,10 @@ class DEMProcessor:
         """
         Génère un MNT synthétique pour démo
         
+        Les petits MNT (au plus MAX_CACHED_DEM_CELLS cellules) sont mis en cache par
+        (emprise arrondie à 1e-6°, résolution) et réutilisés en lecture seule ; les
+        grands sont recalculés à chaque requête pour ne pas rester en mémoire.
+        
         Args:
             bounds: (min_x, min_y, max_x, max_y)
             resolution: Résolution en mètres
@@ -234,57 +261,134 @@ class DEMProcessor:
         Returns:
             Array 2D d'élévations
         """
-        min_x, min_y, max_x, max_y = bounds
+        key = (tuple(round(v, 6) for v in bounds), float(resolution))
+        nx, ny = DEMProcessor._dem_shape(*key)
         
-        # Taille de la grille
-        nx = int((max_x - min_x) * 111320 / resolution)
-        ny = int((max_y - min_y) * 111320 / resolution)
+        if nx * ny <= MAX_CACHED_DEM_CELLS:
+            return DEMProcessor._cached_synthetic_dem(*key)
+        return DEMProcessor._synthetic_dem(*key)
+    
+    @staticmethod
+    def _dem_shape(bounds: Tuple[float, float, float, float], resolution: float) -> Tuple[int, int]:
+        """Taille (nx, ny) de la grille d'un MNT"""
+        min_x, min_y, max_x, max_y = bounds
+        return (
+            int((max_x - min_x) * 111320 / resolution),
+            int((max_y - min_y) * 111320 / resolution)
+        )
+    
+    @staticmethod
+    @lru_cache(maxsize=4)
+    def _cached_synthetic_dem(bounds: Tuple[float, float, float, float], resolution: float) -> np.ndarray:
+        """_synthetic_dem mis en cache (petites grilles uniquement)"""
+        return DEMProcessor._synthetic_dem(bounds, resolution)
+    
+    @staticmethod
+    def _synthetic_dem(bounds: Tuple[float, float, float, float], resolution: float) -> np.ndarray:
+        """MNT synthétique déterministe (bruit tiré d'un générateur initialisé par la clé)"""
+        nx, ny = DEMProcessor._dem_shape(bounds, resolution)
         
-        # Génération d'un terrain avec bruit de Perlin simulé
-        x = np.linspace(0, 10, nx)
-        y = np.linspace(0, 10, ny)
-        X, Y = np.meshgrid(x, y)
+        # Génération d'un terrain avec bruit de Perlin simulé, en float32 (précision
+        # millimétrique suffisante, moitié moins de mémoire pour tous les noyaux MNT) ;
+        # axes en ligne (1, nx) et en colonne (ny, 1) diffusés sans meshgrid
+        x = np.linspace(0, 10, nx, dtype=np.float32)[np.newaxis, :]
+        y = np.linspace(0, 10, ny, dtype=np.float32)[:, np.newaxis]
         
         # Terrain ondulé
-        Z = (50 + 20 * np.sin(X) * np.cos(Y) +
-             10 * np.sin(2 * X) +
-             5 * np.cos(3 * Y) +
-             np.random.randn(ny, nx) * 2)
-        
+        rng = np.random.default_rng(abs(hash((bounds, resolution))))
+        Z = rng.standard_normal((ny, nx), dtype=np.float32)
+        Z *= 2
+        Z += 50 + 20 * np.sin(x) * np.cos(y)
+        Z += 10 * np.sin(2 * x)
+        Z += 5 * np.cos(3 * y)
+        
+        Z.setflags(write=False)
         return Z
     
     @staticmethod
-    def calculate_slope(dem: np.ndarray, resolution: float) -> np.ndarray:
+    def calculate_slope_and_aspect(dem: np.ndarray, resolution: float) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Calcule la pente depuis un MNT
+        Calcule pente et exposition depuis un MNT, sur un seul calcul de gradient
         
         Returns:
-            Array 2D de pentes en pourcentage
+            (pentes en pourcentage, expositions en degrés 0-360)
         """
-        # Gradients
         dz_dx, dz_dy = np.gradient(dem, resolution)
         
-        # Pente en radians puis en pourcentage
-        slope_rad = np.arctan(np.sqrt(dz_dx**2 + dz_dy**2))
-        slope_percent = np.tan(slope_rad) * 100
+        # Exposition (indépendante de l'échelle du gradient), calculée en place
+        aspect_deg = np.arctan2(-dz_dy, dz_dx)
+        np.degrees(aspect_deg, out=aspect_deg)
+        np.subtract(90, aspect_deg, out=aspect_deg)
+        np.mod(aspect_deg, 360, out=aspect_deg)
         
-        return slope_percent
+        # Pente en pourcentage = 100 * |gradient| (tan(arctan(x)) == x)
+        slope_percent = np.hypot(dz_dx, dz_dy, out=dz_dx)
+        slope_percent *= 100
+        
+        return slope_percent, aspect_deg
     
     @staticmethod
-    def calculate_aspect(dem: np.ndarray) -> np.ndarray:
+    def slope_aspect_histograms(dem: np.ndarray, resolution: float, thresholds: List[float],
+                                band_cells: int = DEM_BAND_CELLS) -> Tuple[np.ndarray, np.ndarray, Dict[str, float]]:
         """
-        Calcule l'exposition (orientation des pentes)
+        Histogrammes de pentes et d'expositions d'un MNT, par bandes de lignes
+        
+        Chaque bande (~band_cells cellules, plus une ligne de bord de chaque côté pour le
+        gradient central) passe gradient -> pente/exposition -> comptages tant qu'elle est
+        en cache ; aucun tableau de pente ou d'exposition de la taille du MNT n'est créé.
+        
+        Args:
+            thresholds: Seuils de pente croissants (%)
         
         Returns:
-            Array 2D d'aspects en degrés (0-360)
+            (comptes par classe de pente, comptes par octant d'exposition,
+             statistiques de pente min/max/mean/std)
         """
-        dz_dx, dz_dy = np.gradient(dem)
+        rows, cols = dem.shape
+        band_rows = max(1, band_cells // cols)
         
-        aspect = np.arctan2(-dz_dy, dz_dx)
-        aspect_deg = np.degrees(aspect)
-        aspect_deg = (90 - aspect_deg) % 360
+        # Classes de pente : compteur compilé avec les seuils en constantes
+        # (np.digitize au premier usage des seuils ou au-delà de MAX_CONSTANT_EDGES)
+        count_classes = class_counter(tuple(float(t) for t in thresholds))
         
-        return aspect_deg
+        slope_counts = np.zeros(len(thresholds) + 1, dtype=np.int64)
+        octant_counts = np.zeros(len(ASPECT_OCTANTS), dtype=np.int64)
+        slope_min, slope_max = np.inf, -np.inf
+        slope_sum = slope_sq_sum = 0.0
+        
+        for start in range(0, rows, band_rows):
+            stop = min(start + band_rows, rows)
+            
+            # Bande avec une ligne de bord (gradient central identique au MNT entier)
+            lo = max(start - 1, 0)
+            hi = min(stop + 1, rows)
+            slope, aspect = DEMProcessor.calculate_slope_and_aspect(dem[lo:hi], resolution)
+            slope = slope[start - lo:stop - lo].ravel()
+            aspect = aspect[start - lo:stop - lo].ravel()
+            
+            slope_counts += count_classes(slope)
+            
+            # Octants de 45° centrés sur N, NE, ..., NW (rotation de 22.5° pour que N
+            # couvre [337.5, 22.5[)
+            octants = aspect + 22.5
+            octants //= 45
+            octants = octants.astype(np.intp)
+            octants %= 8
+            octant_counts += np.bincount(octants, minlength=len(ASPECT_OCTANTS))
+            
+            slope_min = min(slope_min, float(slope.min()))
+            slope_max = max(slope_max, float(slope.max()))
+            slope_sum += float(slope.sum(dtype=np.float64))
+            slope_sq_sum += float(np.dot(slope.astype(np.float64), slope))
+        
+        mean = slope_sum / dem.size
+        stats = {
+            "min": slope_min,
+            "max": slope_max,
+            "mean": mean,
+            "std": math.sqrt(max(slope_sq_sum / dem.size - mean * mean, 0.0))
+        }
+        return slope_counts, octant_counts, stats
 
 
 class FloodSimulator:
@@ -299,38 +403,39 @@ class FloodSimulator:
         Returns:
             Dictionnaire avec zones inondées et statistiques
         """
-        # Zones submergées
-        flooded = dem <= water_level
+        # Zones submergées : seules les cuvettes dont le niveau de débordement est
+        # atteint sont en eau (MNT comblé depuis les bords). Les directions D8 sont
+        # obtenues pendant le même comblement, seulement si demandées.
+        if include_flow:
+            filled, flow_direction = priority_flood_d8(dem)
+        else:
+            filled = priority_flood(dem)
         
-        # Profondeur d'eau
-        water_depth = np.maximum(0, water_level - dem)
-        water_depth[~flooded] = 0
+        # Masque, profondeur d'eau (nulle hors zone en eau) et statistiques en un passage
+        flooded, water_depth, flooded_cells, max_depth, sum_depth = flood_depth(
+            dem, filled, float(water_level)
+        )
         
         # Statistiques
         total_cells = dem.size
-        flooded_cells = flooded.sum()
         flooded_area = flooded_cells * resolution * resolution
-        
-        max_depth = water_depth.max()
-        avg_depth = water_depth[flooded].mean() if flooded_cells > 0 else 0
+        avg_depth = sum_depth / flooded_cells if flooded_cells > 0 else 0
         
         result = {
             'flooded_mask': flooded,
             'water_depth': water_depth,
             'statistics': {
                 'total_area_sqm': total_cells * resolution * resolution,
-                'flooded_area_sqm': flooded_area,
-                'flooded_percentage': (flooded_cells / total_cells) * 100,
+                'flooded_area_sqm': float(flooded_area),
+                'flooded_percentage': float((flooded_cells / total_cells) * 100),
                 'max_depth_m': float(max_depth),
                 'avg_depth_m': float(avg_depth),
                 'flooded_cells': int(flooded_cells)
             }
         }
         
-        # Direction d'écoulement (optionnel)
+        # Direction d'écoulement D8 (optionnel, codes ESRI, 0 = exutoire de bord)
         if include_flow:
-            dz_dx, dz_dy = np.gradient(dem)
-            flow_direction = np.arctan2(dz_dy, dz_dx)
             result['flow_direction'] = flow_direction
         
         return result
@@ -341,7 +446,8 @@ class ViewshedAnalyzer:
     
     @staticmethod
     def calculate(dem: np.ndarray, observer_pos: Tuple[int, int],
-                  observer_height: float, target_height: float = 0) -> np.ndarray:
+                  observer_height: float, target_height: float = 0,
+                  algorithm: str = "r2") -> np.ndarray:
         """
         Calcule le viewshed depuis un point
         
@@ -350,83 +456,194 @@ class ViewshedAnalyzer:
             observer_pos: (row, col) position observateur
             observer_height: Hauteur observateur
             target_height: Hauteur cible
+            algorithm: "r2" (rayons vers les seules cellules du bord, O(n)) ou
+                "r3" (ligne de vue vers chaque cellule, exact)
         
         Returns:
             Array booléen indiquant visibilité
         """
-        rows, cols = dem.shape
         obs_row, obs_col = observer_pos
+        if algorithm == "r3":
+            kernel = viewshed
+        elif dem.size >= GPU_VIEWSHED_MIN_CELLS and cuda_available():
+            # Grands MNT : un thread CUDA par rayon vers le bord
+            kernel = viewshed_r2_gpu
+        else:
+            kernel = viewshed_r2
         
-        # Élévation observateur
-        obs_elevation = dem[obs_row, obs_col] + observer_height
-        
-        # Matrice de visibilité
-        visible = np.zeros_like(dem, dtype=bool)
-        visible[obs_row, obs_col] = True
-        
-        # Pour chaque cellule, vérifier ligne de vue
-        for i in range(rows):
-            for j in range(cols):
-                if i == obs_row and j == obs_col:
-                    continue
-                
-                # Ligne entre observateur et cible
-                line_points = ViewshedAnalyzer._bresenham_line(
-                    obs_row, obs_col, i, j
-                )
-                
-                # Élévation cible
-                target_elevation = dem[i, j] + target_height
-                
-                # Vérifier si ligne de vue dégagée
-                is_visible = True
-                for point_idx, (r, c) in enumerate(line_points[1:-1], 1):
-                    # Interpolation linéaire de la ligne de vue
-                    fraction = point_idx / len(line_points)
-                    sight_line_elevation = (obs_elevation + 
-                                           fraction * (target_elevation - obs_elevation))
-                    
-                    # Si terrain bloque
-                    if dem[r, c] > sight_line_elevation:
-                        is_visible = False
-                        break
-                
-                visible[i, j] = is_visible
-        
-        return visible
+        return kernel(
+            np.asarray(dem, dtype=np.float32), int(obs_row), int(obs_col),
+            float(observer_height), float(target_height)
+        )
     
     @staticmethod
-    def _bresenham_line(x0: int, y0: int, x1: int, y1: int) -> List[Tuple[int, int]]:
-        """Algorithme de Bresenham pour tracer une ligne"""
-        points = []
-        dx = abs(x1 - x0)
-        dy = abs(y1 - y0)
-        sx = 1 if x0 < x1 else -1
-        sy = 1 if y0 < y1 else -1
-        err = dx - dy
-        
-        x, y = x0, y0
-        while True:
-            points.append((x, y))
-            if x == x1 and y == y1:
-                break
-            e2 = 2 * err
-            if e2 > -dy:
-                err -= dy
-                x += sx
-            if e2 < dx:
-                err += dx
-                y += sy
-        
-        return points
+    def cumulative(dem: np.ndarray, observer_positions: List[Tuple[int, int]],
+                   observer_heights: List[float],
+                   target_heights: List[float]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Visibilité cumulée (R2) de plusieurs observateurs sur un même MNT
+        
+        Returns:
+            (nombre d'observateurs voyant chaque cellule, cellules visibles par observateur)
+        """
+        positions = np.asarray(observer_positions, dtype=np.int64).reshape(-1, 2)
+        return cumulative_viewshed(
+            np.asarray(dem, dtype=np.float32), positions[:, 0], positions[:, 1],
+            observer_heights, target_heights
+        )
+
+
+@lru_cache(maxsize=None)
+def _rasterio():
+    """(rasterio.features, Affine), importés une fois par processus ; None sans rasterio"""
+    try:
+        from rasterio import features
+        from rasterio.transform import Affine
+    except ImportError:
+        return None
+    return features, Affine
+
+
+def _mask_runs_to_geometry(mask: np.ndarray, min_x: float, min_y: float,
+                           cell_x: float, cell_y: float):
+    """
+    Polygonise un masque sans rasterio : une boîte par suite de cellules vraies d'une ligne,
+    fusionnées en une passe GEOS
+    """
+    rows, cols = mask.shape
+    padded = np.zeros((rows, cols + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    
+    # Débuts et fins de suites, dans le même ordre ligne par ligne
+    run_rows, starts = np.nonzero(edges == 1)
+    ends = np.nonzero(edges == -1)[1]
+    
+    boxes = shapely.box(
+        min_x + starts * cell_x, min_y + run_rows * cell_y,
+        min_x + ends * cell_x, min_y + (run_rows + 1) * cell_y
+    )
+    return shapely.union_all(boxes)
+
+
+def _mask_to_geometry(mask: np.ndarray, bounds: Tuple[float, float, float, float]):
+    """
+    Polygonise un masque raster couvrant bounds (ligne 0 = min_y)
+    
+    Utilise rasterio.features.shapes (polygonisation GDAL), sinon une fusion de suites de
+    cellules ; le contour en marches d'escalier est simplifié à une demi-cellule (sans
+    préservation de topologie, bien plus rapide, contour brut conservé s'il devient invalide).
+    """
+    min_x, min_y, max_x, max_y = bounds
+    rows, cols = mask.shape
+    cell_x = (max_x - min_x) / cols
+    cell_y = (max_y - min_y) / rows
+    
+    if _rasterio() is None:
+        geometry = _mask_runs_to_geometry(mask, min_x, min_y, cell_x, cell_y)
+    else:
+        features, Affine = _rasterio()
+        transform = Affine(cell_x, 0, min_x, 0, cell_y, min_y)
+        geometry = unary_union([
+            shape(geom)
+            for geom, _ in features.shapes(mask.astype(np.uint8), mask=mask, transform=transform)
+        ])
+    
+    simplified = shapely.simplify(geometry, 0.5 * min(cell_x, cell_y), preserve_topology=False)
+    return simplified if simplified.is_valid else geometry
 
 
 # ==================== ENDPOINTS ====================
 
-@router.post("/flood")
+def _run_simulation_job(simulation_id: int, compute, request):
+    """
+    Calcule une simulation en tâche de fond
+    
+    compute(request) renvoie (géométrie, statistiques), enregistrées dans l'entrée
+    simulation_id avec status "completed" ; en cas d'échec, status "error" et le
+    message d'erreur sont enregistrés dans ses statistiques.
+    """
+    db = SessionLocal()
+    try:
+        result = db.get(SimulationResult, simulation_id)
+        if result is None:
+            return
+        
+        try:
+            geometry, statistics = compute(request)
+            result.result_vector = wkb_dumps(geometry, hex=True, srid=4326)
+            result.statistics = {**statistics, "status": "completed"}
+        except Exception as e:
+            result.statistics = {"status": "error", "error": str(e)}
+        
+        db.commit()
+    finally:
+        db.close()
+
+
+def _queue_simulation(result: SimulationResult, compute, request,
+                      background_tasks: BackgroundTasks, db: Session) -> ORJSONResponse:
+    """Enregistre une simulation en cours (status: processing) et lance son calcul après la réponse"""
+    result.statistics = {"status": "processing"}
+    db.add(result)
+    db.commit()
+    db.refresh(result)
+    
+    background_tasks.add_task(_run_simulation_job, result.id, compute, request)
+    
+    return ORJSONResponse({
+        "simulation_id": result.id,
+        "simulation_type": result.simulation_type,
+        "status": "processing",
+        "message": f"Simulation lancée. Résultat via /results/{result.id}"
+    }, status_code=202)
+
+
+def _flood_bounds(request: FloodSimulationRequest) -> Tuple[float, float, float, float]:
+    """Emprise (minx, miny, maxx, maxy) de la zone d'étude d'une simulation d'inondation"""
+    if request.area_geojson:
+        return shape(request.area_geojson).bounds
+    # Zone par défaut (exemple: Montréal)
+    return (-73.6, 45.4, -73.5, 45.6)
+
+
+def _simulate_flood(request: FloodSimulationRequest):
+    """Infos du MNT, résultat de FloodSimulator et polygone inondé d'une requête"""
+    bounds = _flood_bounds(request)
+    
+    # Générer ou charger MNT
+    dem = DEMProcessor.generate_synthetic_dem(bounds, request.resolution)
+    
+    # Simulation
+    flood_result = FloodSimulator.simulate(
+        dem, 
+        request.water_level,
+        request.resolution,
+        request.include_flow
+    )
+    
+    # Convertir zones inondées en polygone
+    flooded_area = _mask_to_geometry(flood_result['flooded_mask'], bounds)
+    
+    dem_info = {
+        "resolution": request.resolution,
+        "shape": list(dem.shape),
+        "elevation_range": [float(dem.min()), float(dem.max())]
+    }
+    return dem_info, flood_result, flooded_area
+
+
+def _flood_job(request: FloodSimulationRequest):
+    """(polygone inondé, statistiques) d'une simulation d'inondation"""
+    _, flood_result, flooded_area = _simulate_flood(request)
+    return flooded_area, flood_result['statistics']
+
+
+@router.post("/flood", response_model=None)
 async def simulate_flood(
     request: FloodSimulationRequest,
     background_tasks: BackgroundTasks,
+    background: bool = False,
     db: Session = Depends(get_db)
 ):
     """
@@ -434,46 +651,33 @@ async def simulate_flood(
     
     Calcule les zones inondables à partir d'un MNT et d'un niveau d'eau.
     Inclut profondeur, statistiques et optionnellement direction d'écoulement.
+    
+    - **background**: Renvoie immédiatement l'identifiant (status: processing) et
+      calcule en tâche de fond ; le résultat se consulte via /results/{id}
     """
     try:
-        # Définir zone d'étude
-        if request.area_geojson:
-            area = shape(request.area_geojson)
-            bounds = area.bounds  # (minx, miny, maxx, maxy)
-        else:
-            # Zone par défaut (exemple: Montréal)
-            bounds = (-73.6, 45.4, -73.5, 45.6)
-        
-        # Générer ou charger MNT
-        dem = DEMProcessor.generate_synthetic_dem(bounds, request.resolution)
-        
-        # Simulation
-        flood_result = FloodSimulator.simulate(
-            dem, 
-            request.water_level,
-            request.resolution,
-            request.include_flow
-        )
-        
-        # Convertir zones inondées en polygone
-        # (Simplification: créer un rectangle englobant)
-        flooded_area = box(*bounds)  # En production, utiliser rasterio.features.shapes
-        
-        # Sauvegarder résultat
         result = SimulationResult(
             simulation_type="flood",
             name=f"Simulation inondation - {request.water_level}m",
-            result_vector=f"SRID=4326;{flooded_area.wkt}",
             parameters={
                 "water_level": request.water_level,
                 "dem_source": request.dem_source,
                 "resolution": request.resolution,
                 "include_flow": request.include_flow,
-                "bounds": bounds
-            },
-            statistics=flood_result['statistics']
+                "bounds": _flood_bounds(request)
+            }
         )
         
+        if background:
+            return _queue_simulation(result, _flood_job, request, background_tasks, db)
+        
+        # Calcul (MNT, noyaux Numba, polygonisation) hors de la boucle d'événements
+        dem_info, flood_result, flooded_area = await asyncio.to_thread(_simulate_flood, request)
+        
+        # Sauvegarder résultat
+        result.result_vector = wkb_dumps(flooded_area, hex=True, srid=4326)
+        result.statistics = flood_result['statistics']
+        
         db.add(result)
         db.commit()
         db.refresh(result)
@@ -489,11 +693,7 @@ async def simulate_flood(
                     "properties": flood_result['statistics']
                 },
                 "statistics": flood_result['statistics'],
-                "dem_info": {
-                    "resolution": request.resolution,
-                    "shape": list(dem.shape),
-                    "elevation_range": [float(dem.min()), float(dem.max())]
-                }
+                "dem_info": dem_info
             },
             "message": "Simulation réussie"
         }
@@ -503,9 +703,56 @@ async def simulate_flood(
         raise HTTPException(status_code=500, detail=f"Erreur simulation inondation: {str(e)}")
 
 
-@router.post("/viewshed")
+def _viewshed_job(request: ViewshedRequest):
+    """(polygone visible, statistiques) d'une analyse de visibilité"""
+    obs_coords = shape(request.observer_point).coords[0]
+    
+    # Zone d'analyse
+    radius_deg = request.radius / 111320.0
+    bounds = (
+        obs_coords[0] - radius_deg,
+        obs_coords[1] - radius_deg,
+        obs_coords[0] + radius_deg,
+        obs_coords[1] + radius_deg
+    )
+    
+    # Générer MNT
+    dem = DEMProcessor.generate_synthetic_dem(bounds, request.resolution)
+    
+    # Position observateur dans la grille
+    rows, cols = dem.shape
+    obs_row = rows // 2
+    obs_col = cols // 2
+    
+    # Calcul viewshed
+    visible_mask = ViewshedAnalyzer.calculate(
+        dem,
+        (obs_row, obs_col),
+        request.observer_height,
+        request.target_height,
+        request.algorithm
+    )
+    
+    # Statistiques
+    total_cells = dem.size
+    visible_cells = visible_mask.sum()
+    visible_area = visible_cells * request.resolution * request.resolution
+    
+    # Polygone de zone visible
+    return _mask_to_geometry(visible_mask, bounds), {
+        "visible_area_sqm": float(visible_area),
+        "visible_cells": int(visible_cells),
+        "total_cells": int(total_cells),
+        "visibility_percentage": float((visible_cells / total_cells) * 100),
+        "radius": request.radius
+    }
+
+
+@router.post("/viewshed", response_model=None)
 async def calculate_viewshed(
     request: ViewshedRequest,
+    background_tasks: BackgroundTasks,
+    background: bool = False,
     db: Session = Depends(get_db)
 ):
     """
@@ -513,60 +760,117 @@ async def calculate_viewshed(
     
     Calcule les zones visibles depuis un point d'observation en tenant compte
     du relief (MNT) et des hauteurs d'observation et de cible.
+    
+    - **background**: Renvoie immédiatement l'identifiant (status: processing) et
+      calcule en tâche de fond ; le résultat se consulte via /results/{id}
     """
     try:
-        observer = shape(request.observer_point)
-        obs_coords = observer.coords[0]
-        
-        # Zone d'analyse
-        radius_deg = request.radius / 111320.0
-        bounds = (
-            obs_coords[0] - radius_deg,
-            obs_coords[1] - radius_deg,
-            obs_coords[0] + radius_deg,
-            obs_coords[1] + radius_deg
+        result = SimulationResult(
+            simulation_type="viewshed",
+            name=f"Analyse visibilité - {request.radius}m",
+            parameters={
+                "observer_height": request.observer_height,
+                "target_height": request.target_height,
+                "radius": request.radius,
+                "resolution": request.resolution,
+                "algorithm": request.algorithm
+            }
         )
         
-        # Générer MNT
-        dem = DEMProcessor.generate_synthetic_dem(bounds, request.resolution)
+        if background:
+            return _queue_simulation(result, _viewshed_job, request, background_tasks, db)
         
-        # Position observateur dans la grille
+        visible_area_geom, result.statistics = await asyncio.to_thread(_viewshed_job, request)
+        result.result_vector = wkb_dumps(visible_area_geom, hex=True, srid=4326)
+        
+        db.add(result)
+        db.commit()
+        db.refresh(result)
+        
+        return ORJSONResponse({
+            "simulation_id": result.id,
+            "simulation_type": "viewshed",
+            "result": {
+                "type": "Feature",
+                "geometry": mapping(visible_area_geom),
+                "properties": result.statistics
+            },
+            "statistics": result.statistics,
+            "message": "Analyse de visibilité réussie"
+        })
+        
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Erreur viewshed: {str(e)}")
+
+
+@router.post("/viewshed-batch", response_model=None)
+async def calculate_viewshed_batch(
+    request: ViewshedBatchRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Visibilité cumulée de plusieurs observateurs (parc éolien, réseau d'antennes...)
+    
+    Un seul MNT couvre tous les observateurs ; chaque cellule reçoit le nombre
+    d'observateurs qui la voient.
+    """
+    points = [shape(observer.observer_point) for observer in request.observers]
+    lons = np.array([point.x for point in points])
+    lats = np.array([point.y for point in points])
+    
+    # Emprise commune : tous les observateurs plus le rayon d'analyse
+    radius_deg = request.radius / 111320.0
+    bounds = (
+        float(lons.min() - radius_deg),
+        float(lats.min() - radius_deg),
+        float(lons.max() + radius_deg),
+        float(lats.max() + radius_deg)
+    )
+    cells_per_deg = 111320 / request.resolution
+    cells = int((bounds[2] - bounds[0]) * cells_per_deg) * int((bounds[3] - bounds[1]) * cells_per_deg)
+    if cells > MAX_VIEWSHED_CELLS:
+        raise HTTPException(status_code=400, detail=f"Zone trop grande ({cells} cellules, max {MAX_VIEWSHED_CELLS})")
+    
+    try:
+        dem = DEMProcessor.generate_synthetic_dem(bounds, request.resolution)
         rows, cols = dem.shape
-        obs_row = rows // 2
-        obs_col = cols // 2
         
-        # Calcul viewshed
-        visible_mask = ViewshedAnalyzer.calculate(
+        # Positions des observateurs dans la grille (ligne 0 = min_y)
+        obs_rows = np.clip(((lats - bounds[1]) * cells_per_deg).astype(np.int64), 0, rows - 1)
+        obs_cols = np.clip(((lons - bounds[0]) * cells_per_deg).astype(np.int64), 0, cols - 1)
+        
+        counts, visible_counts = ViewshedAnalyzer.cumulative(
             dem,
-            (obs_row, obs_col),
-            request.observer_height,
-            request.target_height
+            np.column_stack([obs_rows, obs_cols]),
+            [observer.observer_height for observer in request.observers],
+            [observer.target_height for observer in request.observers]
         )
         
         # Statistiques
+        cell_area = request.resolution * request.resolution
         total_cells = dem.size
-        visible_cells = visible_mask.sum()
-        visible_area = visible_cells * request.resolution * request.resolution
+        seen_cells = int(np.count_nonzero(counts))
         
-        # Créer polygone de zone visible (simplifié)
-        visible_area_geom = Point(obs_coords).buffer(radius_deg)
+        # Zone vue par au moins un observateur
+        visible_area_geom = _mask_to_geometry(counts > 0, bounds)
         
         result = SimulationResult(
-            simulation_type="viewshed",
-            name=f"Analyse visibilité - {request.radius}m",
-            result_vector=f"SRID=4326;{visible_area_geom.wkt}",
+            simulation_type="cumulative_viewshed",
+            name=f"Visibilité cumulée - {len(points)} observateurs",
+            result_vector=wkb_dumps(visible_area_geom, hex=True, srid=4326),
             parameters={
-                "observer_height": request.observer_height,
-                "target_height": request.target_height,
+                "observer_count": len(points),
                 "radius": request.radius,
-                "resolution": request.resolution
+                "resolution": request.resolution,
+                "bounds": bounds
             },
             statistics={
-                "visible_area_sqm": float(visible_area),
-                "visible_cells": int(visible_cells),
+                "visible_area_sqm": float(seen_cells * cell_area),
+                "visible_cells": seen_cells,
                 "total_cells": int(total_cells),
-                "visibility_percentage": float((visible_cells / total_cells) * 100),
-                "radius": request.radius
+                "visibility_percentage": float((seen_cells / total_cells) * 100),
+                "max_observer_count": int(counts.max())
             }
         )
         
@@ -574,24 +878,74 @@ async def calculate_viewshed(
         db.commit()
         db.refresh(result)
         
-        return {
+        response = {
             "simulation_id": result.id,
-            "simulation_type": "viewshed",
+            "simulation_type": "cumulative_viewshed",
             "result": {
                 "type": "Feature",
                 "geometry": mapping(visible_area_geom),
                 "properties": result.statistics
             },
+            "observers": [
+                {
+                    "index": i,
+                    "visible_cells": int(count),
+                    "visible_area_sqm": float(count * cell_area)
+                }
+                for i, count in enumerate(visible_counts)
+            ],
             "statistics": result.statistics,
-            "message": "Analyse de visibilité réussie"
+            "message": "Analyse de visibilité cumulée réussie"
         }
         
+        # Grille de comptage (ligne 0 = min_y), sérialisée directement par orjson
+        if request.include_grid:
+            response["grid"] = {"bounds": bounds, "shape": [rows, cols], "counts": counts}
+        
+        return ORJSONResponse(response)
+        
     except Exception as e:
         db.rollback()
-        raise HTTPException(status_code=500, detail=f"Erreur viewshed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erreur visibilité cumulée: {str(e)}")
 
 
-@router.post("/solar-shadow")
+def _shadow_animation(building, request: SolarShadowRequest) -> List[dict]:
+    """Position du soleil et ombre heure par heure sur time_range_hours (animation)"""
+    start = datetime.strptime(f"{request.date} {request.time}", "%Y-%m-%d %H:%M")
+    hours = np.arange(request.time_range_hours + 1)
+    
+    # Toutes les positions en un appel vectorisé
+    jd = julian_day(request.date, request.time) + hours / 24.0
+    azimuths, elevations = SolarCalculator.solar_positions(request.latitude, request.longitude, jd)
+    
+    # Ombres des seules images où le soleil est levé
+    lit = np.flatnonzero(elevations > 0)
+    offsets = SolarCalculator.shadow_offsets(
+        np.full(len(lit), request.building_height), azimuths[lit], elevations[lit]
+    )
+    building_utm, epsg = to_utm(building)
+    shadows = to_wgs84(np.array([
+        translate(building_utm, xoff=dx, yoff=dy) for dx, dy in zip(offsets['dx'], offsets['dy'])
+    ], dtype=object), epsg)
+    
+    frames = [
+        {
+            "time": (start + timedelta(hours=int(hour))).strftime("%Y-%m-%d %H:%M"),
+            "sun_azimuth": float(azimuth),
+            "sun_elevation": float(elevation),
+            "shadow_length_m": None,
+            "geometry": None
+        }
+        for hour, azimuth, elevation in zip(hours, azimuths, elevations)
+    ]
+    for k, i in enumerate(lit):
+        frames[i]["shadow_length_m"] = float(offsets['shadow_length'][k])
+        frames[i]["geometry"] = mapping(shadows[k])
+    
+    return frames
+
+
+@router.post("/solar-shadow", response_model=None)
 async def calculate_solar_shadow(
     request: SolarShadowRequest,
     db: Session = Depends(get_db)
@@ -605,6 +959,9 @@ async def calculate_solar_shadow(
     try:
         building = shape(request.building_geojson)
         
+        # Animation : positions et ombres heure par heure depuis l'heure demandée
+        animation = _shadow_animation(building, request) if request.time_range_hours else None
+        
         # Calculer position du soleil
         azimuth, elevation = SolarCalculator.solar_position(
             request.latitude,
@@ -615,31 +972,28 @@ async def calculate_solar_shadow(
         
         # Si soleil sous l'horizon, pas d'ombre
         if elevation <= 0:
-            return {
+            return ORJSONResponse({
                 "simulation_id": None,
                 "simulation_type": "solar_shadow",
                 "message": "Soleil sous l'horizon - pas d'ombre",
                 "sun_position": {
                     "azimuth": azimuth,
                     "elevation": elevation
-                }
-            }
-        
-        # Longueur de l'ombre
-        shadow_length = request.building_height / math.tan(math.radians(elevation))
-        
-        # Direction de l'ombre (opposée au soleil)
-        shadow_azimuth = (azimuth + 180) % 360
-        
-        # Vecteur de déplacement en degrés
-        dx = shadow_length * math.sin(math.radians(shadow_azimuth)) / 111320.0
-        dy = shadow_length * math.cos(math.radians(shadow_azimuth)) / 111320.0
+                },
+                "animation": animation
+            })
         
-        # Créer l'ombre
-        from shapely.affinity import translate, scale
+        # Longueur et vecteur de déplacement de l'ombre (mètres)
+        offsets = SolarCalculator.shadow_offsets(
+            [request.building_height], [azimuth], [elevation]
+        )
+        shadow_length = offsets['shadow_length'][0]
+        shadow_azimuth = float(offsets['shadow_azimuth'][0])
         
-        # Projeter le bâtiment
-        shadow = translate(building, xoff=dx, yoff=dy)
+        # Projeter le bâtiment dans sa zone UTM
+        building_utm, epsg = to_utm(building)
+        shadow_utm = translate(building_utm, xoff=offsets['dx'][0], yoff=offsets['dy'][0])
+        shadow = to_wgs84(shadow_utm, epsg)
         
         # Étirer selon angle (optionnel pour plus de réalisme)
         stretch_factor = 1.0 / max(0.1, math.sin(math.radians(elevation)))
@@ -647,7 +1001,7 @@ async def calculate_solar_shadow(
         result = SimulationResult(
             simulation_type="solar_shadow",
             name=f"Ombre solaire - {request.date} {request.time}",
-            result_vector=f"SRID=4326;{shadow.wkt}",
+            result_vector=wkb_dumps(shadow, hex=True, srid=4326),
             parameters={
                 "building_height": request.building_height,
                 "date": request.date,
@@ -660,7 +1014,7 @@ async def calculate_solar_shadow(
                 "sun_azimuth": float(azimuth),
                 "sun_elevation": float(elevation),
                 "shadow_azimuth": float(shadow_azimuth),
-                "shadow_area_sqm": float(shadow.area * 111320 * 111320)
+                "shadow_area_sqm": float(shadow_utm.area)
             }
         )
         
@@ -668,7 +1022,7 @@ async def calculate_solar_shadow(
         db.commit()
         db.refresh(result)
         
-        return {
+        return ORJSONResponse({
             "simulation_id": result.id,
             "simulation_type": "solar_shadow",
             "result": {
@@ -682,107 +1036,208 @@ async def calculate_solar_shadow(
                 "shadow_azimuth": shadow_azimuth
             },
             "statistics": result.statistics,
+            "animation": animation,
             "message": "Calcul d'ombre solaire réussi"
-        }
+        })
         
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Erreur ombre solaire: {str(e)}")
 
 
-@router.post("/slope-analysis")
-async def analyze_slope(
-    request: SlopeAnalysisRequest,
+@router.post("/solar-shadow/batch", response_model=None)
+async def calculate_solar_shadow_batch(
+    requests: List[SolarShadowRequest],
     db: Session = Depends(get_db)
 ):
     """
-    Analyse de pente et exposition
+    Ombres portées d'un lot de bâtiments (carte d'ombrage à l'échelle d'un quartier)
     
-    Calcule les pentes et orientations du terrain, classifie par catégories.
+    Positions du soleil calculées en un appel du noyau compilé, puis déplacements
+    et translations appliqués à tous les bâtiments en une passe vectorisée.
     """
     try:
-        area = shape(request.area_geojson)
-        bounds = area.bounds
-        
-        # Générer MNT
-        dem = DEMProcessor.generate_synthetic_dem(bounds, request.resolution)
-        
-        # Calculer pente
-        slope = DEMProcessor.calculate_slope(dem, request.resolution)
-        
-        # Calculer exposition
-        aspect = DEMProcessor.calculate_aspect(dem)
-        
-        # Classifier les pentes
-        slope_classes = {}
-        for i, threshold in enumerate(request.slope_classes):
-            if i == 0:
-                mask = slope < threshold
-                class_name = f"0-{threshold}%"
-            else:
-                prev_threshold = request.slope_classes[i-1]
-                mask = (slope >= prev_threshold) & (slope < threshold)
-                class_name = f"{prev_threshold}-{threshold}%"
-            
-            slope_classes[class_name] = {
-                "area_sqm": float(mask.sum() * request.resolution * request.resolution),
-                "percentage": float((mask.sum() / slope.size) * 100),
-                "cell_count": int(mask.sum())
+        if not requests:
+            return {"simulation_type": "solar_shadow", "count": 0, "results": []}
+        
+        # Position du soleil de tous les bâtiments en un appel vectorisé
+        jd = np.array([julian_day(r.date, r.time) for r in requests])
+        latitudes = np.array([r.latitude for r in requests], dtype=np.float64)
+        longitudes = np.array([r.longitude for r in requests], dtype=np.float64)
+        azimuths, elevations = solar_positions(jd, latitudes, longitudes)
+        heights = np.array([r.building_height for r in requests], dtype=np.float64)
+        
+        # Seuls les bâtiments éclairés (soleil au-dessus de l'horizon) ont une ombre
+        lit = np.flatnonzero(elevations > 0)
+        offsets = SolarCalculator.shadow_offsets(heights[lit], azimuths[lit], elevations[lit])
+        
+        buildings = shapely.from_geojson([json.dumps(requests[i].building_geojson) for i in lit])
+        
+        # Translation de toutes les coordonnées d'un coup (un décalage par sommet),
+        # en mètres dans la zone UTM de chaque bâtiment
+        centroids = shapely.centroid(buildings)
+        zones = np.array([
+            utm_epsg(x, y) for x, y in zip(shapely.get_x(centroids), shapely.get_y(centroids))
+        ])
+        shadows = np.empty(len(lit), dtype=object)
+        shadow_areas = np.empty(len(lit))
+        for epsg in np.unique(zones):
+            group = np.flatnonzero(zones == epsg)
+            buildings_utm, _ = to_utm(buildings[group], int(epsg))
+            vertex_counts = shapely.get_num_coordinates(buildings_utm)
+            shift = np.column_stack((
+                np.repeat(offsets['dx'][group], vertex_counts),
+                np.repeat(offsets['dy'][group], vertex_counts)
+            ))
+            shadows_utm = shapely.transform(buildings_utm, lambda coords: coords + shift)
+            shadow_areas[group] = shapely.area(shadows_utm)
+            shadows[group] = to_wgs84(shadows_utm, int(epsg))
+        
+        # EWKB hexadécimal de tout le lot en un appel (stockage sans passage par le WKT)
+        shadow_ewkb = shapely.to_wkb(shapely.set_srid(shadows, 4326), hex=True, include_srid=True)
+        
+        results = [None] * len(requests)
+        records = []
+        for k, i in enumerate(lit):
+            request = requests[i]
+            statistics = {
+                "shadow_length_m": float(offsets['shadow_length'][k]),
+                "sun_azimuth": float(azimuths[i]),
+                "sun_elevation": float(elevations[i]),
+                "shadow_azimuth": float(offsets['shadow_azimuth'][k]),
+                "shadow_area_sqm": float(shadow_areas[k])
+            }
+            record = SimulationResult(
+                simulation_type="solar_shadow",
+                name=f"Ombre solaire - {request.date} {request.time}",
+                result_vector=shadow_ewkb[k],
+                parameters={
+                    "building_height": request.building_height,
+                    "date": request.date,
+                    "time": request.time,
+                    "latitude": request.latitude,
+                    "longitude": request.longitude
+                },
+                statistics=statistics
+            )
+            records.append(record)
+            results[i] = {
+                "type": "Feature",
+                "geometry": mapping(shadows[k]),
+                "properties": statistics
             }
         
-        # Classe > max
-        max_threshold = max(request.slope_classes)
-        mask = slope >= max_threshold
-        slope_classes[f">{max_threshold}%"] = {
-            "area_sqm": float(mask.sum() * request.resolution * request.resolution),
-            "percentage": float((mask.sum() / slope.size) * 100),
-            "cell_count": int(mask.sum())
-        }
+        # Un seul commit pour tout le lot
+        db.add_all(records)
+        db.commit()
         
-        # Classifier les expositions
-        aspect_classes = {
-            "N": {"min": 337.5, "max": 22.5},
-            "NE": {"min": 22.5, "max": 67.5},
-            "E": {"min": 67.5, "max": 112.5},
-            "SE": {"min": 112.5, "max": 157.5},
-            "S": {"min": 157.5, "max": 202.5},
-            "SW": {"min": 202.5, "max": 247.5},
-            "W": {"min": 247.5, "max": 292.5},
-            "NW": {"min": 292.5, "max": 337.5}
-        }
+        for record, i in zip(records, lit):
+            results[i]["properties"] = {"simulation_id": record.id, **results[i]["properties"]}
         
-        aspect_distribution = {}
-        for direction, ranges in aspect_classes.items():
-            if direction == "N":
-                mask = (aspect >= ranges["min"]) | (aspect < ranges["max"])
-            else:
-                mask = (aspect >= ranges["min"]) & (aspect < ranges["max"])
-            
-            aspect_distribution[direction] = {
-                "area_sqm": float(mask.sum() * request.resolution * request.resolution),
-                "percentage": float((mask.sum() / aspect.size) * 100)
+        for i in np.flatnonzero(elevations <= 0):
+            results[i] = {
+                "type": "Feature",
+                "geometry": None,
+                "properties": {
+                    "message": "Soleil sous l'horizon - pas d'ombre",
+                    "sun_azimuth": float(azimuths[i]),
+                    "sun_elevation": float(elevations[i])
+                }
             }
         
+        return ORJSONResponse({
+            "simulation_type": "solar_shadow",
+            "count": len(requests),
+            "shadow_count": len(records),
+            "results": results,
+            "message": "Calcul d'ombres solaires réussi"
+        })
+        
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Erreur ombre solaire: {str(e)}")
+
+
+def _slope_job(request: SlopeAnalysisRequest):
+    """(zone d'analyse, statistiques de pente et d'exposition) d'une analyse de pente"""
+    area = shape(request.area_geojson)
+    bounds = area.bounds
+    
+    # Générer MNT
+    dem = DEMProcessor.generate_synthetic_dem(bounds, request.resolution)
+    
+    # Pentes et expositions classées par bandes du MNT, sur les seuils croissants
+    # (classe 0 : < premier seuil, dernière classe : >= seuil max)
+    thresholds = sorted(request.slope_classes)
+    counts, octant_counts, slope_stats = DEMProcessor.slope_aspect_histograms(
+        dem, request.resolution, thresholds
+    )
+    
+    # Facteurs constants par requête : surface d'une cellule et pourcentage par cellule
+    cell_area = request.resolution * request.resolution
+    inv_size = 100.0 / dem.size
+    
+    class_names = (
+        [f"0-{thresholds[0]}%"] +
+        [f"{low}-{high}%" for low, high in zip(thresholds[:-1], thresholds[1:])] +
+        [f">{thresholds[-1]}%"]
+    )
+    
+    slope_classes = {
+        class_name: {
+            "area_sqm": float(count * cell_area),
+            "percentage": float(count * inv_size),
+            "cell_count": int(count)
+        }
+        for class_name, count in zip(class_names, counts)
+    }
+    
+    aspect_distribution = {
+        direction: {
+            "area_sqm": float(count * cell_area),
+            "percentage": float(count * inv_size)
+        }
+        for direction, count in zip(ASPECT_OCTANTS, octant_counts)
+    }
+    
+    return area, {
+        "slope_classes": slope_classes,
+        "aspect_distribution": aspect_distribution,
+        "slope_stats": slope_stats
+    }
+
+
+@router.post("/slope-analysis", response_model=None)
+async def analyze_slope(
+    request: SlopeAnalysisRequest,
+    background_tasks: BackgroundTasks,
+    background: bool = False,
+    db: Session = Depends(get_db)
+):
+    """
+    Analyse de pente et exposition
+    
+    Calcule les pentes et orientations du terrain, classifie par catégories.
+    
+    - **background**: Renvoie immédiatement l'identifiant (status: processing) et
+      calcule en tâche de fond ; le résultat se consulte via /results/{id}
+    """
+    try:
         result = SimulationResult(
             simulation_type="slope_analysis",
             name=f"Analyse pente - {datetime.now().strftime('%Y-%m-%d %H:%M')}",
-            result_vector=f"SRID=4326;{area.wkt}",
             parameters={
                 "resolution": request.resolution,
                 "slope_classes": request.slope_classes
-            },
-            statistics={
-                "slope_classes": slope_classes,
-                "aspect_distribution": aspect_distribution,
-                "slope_stats": {
-                    "min": float(slope.min()),
-                    "max": float(slope.max()),
-                    "mean": float(slope.mean()),
-                    "std": float(slope.std())
-                }
             }
         )
         
+        if background:
+            return _queue_simulation(result, _slope_job, request, background_tasks, db)
+        
+        area, result.statistics = await asyncio.to_thread(_slope_job, request)
+        result.result_vector = wkb_dumps(area, hex=True, srid=4326)
+        
         db.add(result)
         db.commit()
         db.refresh(result)
@@ -804,45 +1259,58 @@ async def list_simulations(
     simulation_type: Optional[str] = None,
     limit: int = 50,
     offset: int = 0,
+    include_geometry: bool = False,
     db: Session = Depends(get_db)
 ):
-    """Liste toutes les simulations avec pagination"""
-    query = db.query(SimulationResult)
+    """
+    Liste toutes les simulations avec pagination
+    
+    - **include_geometry**: Ajoute la géométrie résultat (GeoJSON) de chaque simulation
+    """
+    query = select(
+        SimulationResult.id,
+        SimulationResult.simulation_type.label("type"),
+        SimulationResult.name,
+        SimulationResult.created_at,
+        SimulationResult.parameters,
+        SimulationResult.statistics
+    )
+    if include_geometry:
+        query = query.add_columns(SimulationResult.result_vector.label("geometry"))
+    count_query = select(func.count()).select_from(SimulationResult)
     
     if simulation_type:
-        query = query.filter(SimulationResult.simulation_type == simulation_type)
+        query = query.where(SimulationResult.simulation_type == simulation_type)
+        count_query = count_query.where(SimulationResult.simulation_type == simulation_type)
     
-    total = query.count()
-    results = query.order_by(SimulationResult.created_at.desc()).offset(offset).limit(limit).all()
+    total = db.scalar(count_query)
+    rows = db.execute(
+        query.order_by(SimulationResult.created_at.desc()).offset(offset).limit(limit)
+    ).mappings().all()
     
-    return {
-        "count": len(results),
+    simulations = [dict(row) for row in rows]
+    if include_geometry:
+        geometries = geojson_geometries([simulation['geometry'] for simulation in simulations])
+        for simulation, geometry in zip(simulations, geometries):
+            simulation['geometry'] = geometry
+    
+    # Lignes Core sérialisées directement par orjson (dates comprises)
+    return ORJSONResponse({
+        "count": len(rows),
         "total": total,
         "offset": offset,
         "limit": limit,
-        "simulations": [
-            {
-                "id": r.id,
-                "type": r.simulation_type,
-                "name": r.name,
-                "created_at": r.created_at.isoformat(),
-                "parameters": r.parameters,
-                "statistics": r.statistics
-            }
-            for r in results
-        ]
-    }
+        "simulations": simulations
+    })
 
 
-@router.get("/results/{simulation_id}")
+@router.get("/results/{simulation_id}", response_model=None)
 async def get_simulation_result(
     simulation_id: int,
     db: Session = Depends(get_db)
 ):
     """Récupère le résultat détaillé d'une simulation"""
-    result = db.query(SimulationResult).filter(
-        SimulationResult.id == simulation_id
-    ).first()
+    result = db.get(SimulationResult, simulation_id)
     
     if not result:
         raise HTTPException(status_code=404, detail="Simulation non trouvée")
@@ -858,15 +1326,13 @@ async def get_simulation_result(
     
     # Géométrie si présente
     if result.result_vector:
-        from geoalchemy2.shape import to_shape
-        geom = to_shape(result.result_vector)
         response["geometry"] = {
             "type": "Feature",
-            "geometry": mapping(geom),
+            "geometry": geometry_mapping(bytes(result.result_vector.data)),
             "properties": result.statistics
         }
     
-    return response
+    return ORJSONResponse(response)
 
 
 @router.delete("/results/{simulation_id}")
@@ -875,9 +1341,7 @@ async def delete_simulation(
     db: Session = Depends(get_db)
 ):
     """Supprime une simulation"""
-    result = db.query(SimulationResult).filter(
-        SimulationResult.id == simulation_id
-    ).first()
+    result = db.get(SimulationResult, simulation_id)
     
     if not result:
         raise HTTPException(status_code=404, detail="Simulation non trouvée")
@@ -908,6 +1372,12 @@ async def get_simulation_types():
                 "description": "Zones visibles depuis un point",
                 "requires": ["dem", "observer_point"]
             },
+            {
+                "type": "cumulative_viewshed",
+                "name": "Visibilité cumulée",
+                "description": "Nombre d'observateurs voyant chaque zone",
+                "requires": ["dem", "observers"]
+            },
             {
                 "type": "solar_shadow",
                 "name": "Ombre solaire",
@@ -1,16 +1,21 @@
 """Router pour les analyses spatiales"""
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import JSON, cast, func, insert, literal, literal_column, null, select
 from typing import List, Optional
 from pydantic import BaseModel
-from geoalchemy2.shape import to_shape, from_shape
+from geoalchemy2 import Geography
+import shapely
 from shapely.geometry import shape, mapping
 from shapely.ops import unary_union
 import json
+import orjson
 
 from app.database import get_db
 from app.models.spatial_models import SpatialFeature, AnalysisResult
+from app.utils.geometry import geojson_geometries
+from app.utils.projection import utm_epsg
 
 router = APIRouter()
 
@@ -39,39 +44,48 @@ class DistanceRequest(BaseModel):
     feature2: GeoJSONFeature
 
 
-@router.get("/features")
+@router.get("/features", response_model=None)
 async def get_all_features(
     category: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """Récupère toutes les entités spatiales"""
-    query = db.query(SpatialFeature)
+    query = select(
+        SpatialFeature.id,
+        SpatialFeature.name,
+        SpatialFeature.category,
+        SpatialFeature.description,
+        SpatialFeature.properties,
+        SpatialFeature.geom
+    ).where(SpatialFeature.geom.isnot(None))
     
     if category:
-        query = query.filter(SpatialFeature.category == category)
+        query = query.where(SpatialFeature.category == category)
     
-    features = query.all()
+    rows = db.execute(query).all()
     
-    geojson_features = []
-    for feature in features:
-        if feature.geom:
-            geom = to_shape(feature.geom)
-            geojson_features.append({
-                "type": "Feature",
-                "id": feature.id,
-                "geometry": mapping(geom),
-                "properties": {
-                    "name": feature.name,
-                    "category": feature.category,
-                    "description": feature.description,
-                    **(feature.properties or {})
-                }
-            })
+    # Décodage EWKB -> GeoJSON groupé au lieu d'un to_shape par entité
+    geometries = geojson_geometries([row.geom for row in rows])
     
-    return {
+    geojson_features = [
+        {
+            "type": "Feature",
+            "id": row.id,
+            "geometry": geometry,
+            "properties": {
+                "name": row.name,
+                "category": row.category,
+                "description": row.description,
+                **(row.properties or {})
+            }
+        }
+        for row, geometry in zip(rows, geometries)
+    ]
+    
+    return ORJSONResponse({
         "type": "FeatureCollection",
         "features": geojson_features
-    }
+    })
 
 
 @router.post("/features")
@@ -109,6 +123,50 @@ async def create_feature(
         raise HTTPException(status_code=400, detail=f"Erreur: {str(e)}")
 
 
+def _geojson_geometry(geometry: dict):
+    """Expression PostGIS (SRID 4326) construite côté serveur depuis une géométrie GeoJSON"""
+    return func.ST_SetSRID(func.ST_GeomFromGeoJSON(json.dumps(geometry)), 4326)
+
+
+def _insert_analysis(
+    db: Session,
+    analysis_type: str,
+    input_features: dict,
+    parameters: Optional[dict],
+    geometry
+):
+    """
+    Calcule et enregistre une analyse en un seul INSERT ... RETURNING
+    
+    La géométrie résultat est calculée par PostGIS ; les résultats vides ne sont
+    pas insérés (None est alors renvoyé).
+    """
+    computed = select(geometry.label("geom")).cte("computed")
+    
+    stmt = insert(AnalysisResult).from_select(
+        ["analysis_type", "input_features", "parameters", "result_geom", "result_data"],
+        select(
+            literal(analysis_type),
+            literal(input_features, JSON),
+            cast(null(), JSON) if parameters is None else literal(parameters, JSON),
+            computed.c.geom,
+            func.json_build_object(
+                "area", func.ST_Area(computed.c.geom),
+                "area_m2", func.ST_Area(cast(computed.c.geom, Geography(srid=4326)))
+            )
+        ).where(~func.ST_IsEmpty(computed.c.geom))
+    ).returning(
+        AnalysisResult.id,
+        func.ST_AsBinary(AnalysisResult.result_geom).label("wkb"),
+        AnalysisResult.result_data["area"].as_float().label("area"),
+        AnalysisResult.result_data["area_m2"].as_float().label("area_m2")
+    )
+    
+    row = db.execute(stmt).one_or_none()
+    db.commit()
+    return row
+
+
 @router.post("/buffer")
 async def create_buffer(
     request: BufferRequest,
@@ -121,41 +179,45 @@ async def create_buffer(
     - **feature**: GeoJSON de l'entité
     """
     try:
-        # Conversion en Shapely
-        geom = shape(request.feature.geometry)
-        
-        # Transformation en système métrique (Web Mercator pour approximation)
-        # Pour une vraie projection, utiliser pyproj
+        # Buffer en mètres dans la zone UTM du centre de l'emprise, puis retour en WGS84
+        min_x, min_y, max_x, max_y = shape(request.feature.geometry).bounds
+        epsg = utm_epsg((min_x + max_x) / 2, (min_y + max_y) / 2)
         
-        # Buffer (approximation simple)
-        # Pour convertir mètres en degrés (approximation à l'équateur)
-        meters_to_degrees = request.distance / 111320.0
-        buffered = geom.buffer(meters_to_degrees)
+        geom = _geojson_geometry(request.feature.geometry)
+        buffered = func.ST_Transform(
+            func.ST_Buffer(func.ST_Transform(geom, epsg), request.distance),
+            4326
+        )
         
-        # Sauvegarde du résultat
-        result = AnalysisResult(
-            analysis_type="buffer",
-            input_features={"feature": request.feature.dict()},
-            parameters={"distance": request.distance},
-            result_geom=f"SRID=4326;{buffered.wkt}",
-            result_data={"area": buffered.area}
+        row = _insert_analysis(
+            db,
+            "buffer",
+            {"feature": request.feature.dict()},
+            {"distance": request.distance},
+            buffered
         )
         
-        db.add(result)
-        db.commit()
+        # Buffer négatif ayant érodé toute la géométrie
+        if row is None:
+            return {
+                "message": "Buffer vide",
+                "buffer": None
+            }
         
         return {
             "type": "Feature",
-            "geometry": mapping(buffered),
+            "geometry": mapping(shapely.from_wkb(bytes(row.wkb))),
             "properties": {
-                "analysis_id": result.id,
+                "analysis_id": row.id,
                 "analysis_type": "buffer",
                 "distance": request.distance,
-                "area_sq_degrees": buffered.area
+                "area_sq_degrees": row.area,
+                "area_m2": row.area_m2
             }
         }
     
     except Exception as e:
+        db.rollback()
         raise HTTPException(status_code=400, detail=f"Erreur buffer: {str(e)}")
 
 
@@ -166,42 +228,41 @@ async def calculate_intersection(
 ):
     """Calcule l'intersection entre deux géométries"""
     try:
-        geom1 = shape(request.feature1.geometry)
-        geom2 = shape(request.feature2.geometry)
-        
-        intersection = geom1.intersection(geom2)
-        
-        if intersection.is_empty:
-            return {
-                "message": "Pas d'intersection",
-                "intersection": None
-            }
+        intersection = func.ST_Intersection(
+            _geojson_geometry(request.feature1.geometry),
+            _geojson_geometry(request.feature2.geometry)
+        )
         
-        # Sauvegarde
-        result = AnalysisResult(
-            analysis_type="intersection",
-            input_features={
+        row = _insert_analysis(
+            db,
+            "intersection",
+            {
                 "feature1": request.feature1.dict(),
                 "feature2": request.feature2.dict()
             },
-            result_geom=f"SRID=4326;{intersection.wkt}",
-            result_data={"area": intersection.area}
+            None,
+            intersection
         )
         
-        db.add(result)
-        db.commit()
+        if row is None:
+            return {
+                "message": "Pas d'intersection",
+                "intersection": None
+            }
         
         return {
             "type": "Feature",
-            "geometry": mapping(intersection),
+            "geometry": mapping(shapely.from_wkb(bytes(row.wkb))),
             "properties": {
-                "analysis_id": result.id,
+                "analysis_id": row.id,
                 "analysis_type": "intersection",
-                "area_sq_degrees": intersection.area
+                "area_sq_degrees": row.area,
+                "area_m2": row.area_m2
             }
         }
     
     except Exception as e:
+        db.rollback()
         raise HTTPException(status_code=400, detail=f"Erreur intersection: {str(e)}")
 
 
@@ -229,22 +290,30 @@ async def calculate_distance(request: DistanceRequest):
 @router.get("/analysis/{analysis_id}")
 async def get_analysis_result(analysis_id: int, db: Session = Depends(get_db)):
     """Récupère le résultat d'une analyse"""
-    result = db.query(AnalysisResult).filter(AnalysisResult.id == analysis_id).first()
+    # GeoJSON produit directement par PostGIS (pas de décodage WKB ni de mapping)
+    row = db.execute(
+        select(
+            AnalysisResult.id,
+            AnalysisResult.analysis_type,
+            AnalysisResult.created_at,
+            AnalysisResult.parameters,
+            AnalysisResult.result_data,
+            func.ST_AsGeoJSON(AnalysisResult.result_geom).label("geojson")
+        ).where(AnalysisResult.id == analysis_id)
+    ).one_or_none()
     
-    if not result:
+    if not row:
         raise HTTPException(status_code=404, detail="Analyse non trouvée")
     
-    geom = to_shape(result.result_geom)
-    
     return {
         "type": "Feature",
-        "id": result.id,
-        "geometry": mapping(geom),
+        "id": row.id,
+        "geometry": orjson.loads(row.geojson) if row.geojson else None,
         "properties": {
-            "analysis_type": result.analysis_type,
-            "created_at": result.created_at.isoformat(),
-            "parameters": result.parameters,
-            "result_data": result.result_data
+            "analysis_type": row.analysis_type,
+            "created_at": row.created_at.isoformat(),
+            "parameters": row.parameters,
+            "result_data": row.result_data
         }
     }
 
@@ -253,17 +322,22 @@ async def get_analysis_result(analysis_id: int, db: Session = Depends(get_db)):
 async def get_spatial_statistics(db: Session = Depends(get_db)):
     """Statistiques sur les données spatiales"""
     
-    total_features = db.query(SpatialFeature).count()
-    total_analyses = db.query(AnalysisResult).count()
+    # Nombre par catégorie, agrégé en objet JSON par PostgreSQL
+    categories = (
+        select(SpatialFeature.category, func.count().label("count"))
+        .where(SpatialFeature.category.isnot(None))
+        .group_by(SpatialFeature.category)
+        .subquery()
+    )
     
-    # Nombre par catégorie
-    categories = db.query(
-        SpatialFeature.category,
-        text("COUNT(*) as count")
-    ).group_by(SpatialFeature.category).all()
+    # Les trois métriques en une seule requête (un aller-retour)
+    query = select(
+        select(func.count()).select_from(SpatialFeature).scalar_subquery().label("total_features"),
+        select(func.count()).select_from(AnalysisResult).scalar_subquery().label("total_analyses"),
+        select(func.coalesce(
+            func.json_object_agg(categories.c.category, categories.c.count),
+            literal_column("'{}'::json")
+        )).scalar_subquery().label("features_by_category")
+    )
     
-    return {
-        "total_features": total_features,
-        "total_analyses": total_analyses,
-        "features_by_category": {cat: count for cat, count in categories if cat}
-    }
+    return dict(db.execute(query).one()._mapping)
@@ -0,0 +1,35 @@
+"""Conversions des géométries stockées (EWKB PostGIS) en GeoJSON"""
+from functools import lru_cache
+from typing import List, Optional, Sequence
+
+import orjson
+import shapely
+from geoalchemy2.elements import WKBElement
+from geoalchemy2.shape import to_shape
+from shapely.geometry import mapping
+
+
+@lru_cache(maxsize=256)
+def _cached_mapping(ewkb: bytes) -> dict:
+    return mapping(to_shape(WKBElement(ewkb, extended=True)))
+
+
+def geometry_mapping(ewkb: bytes) -> dict:
+    """
+    GeoJSON d'une géométrie EWKB, décodée une fois par processus
+
+    Les résultats stockés ne sont jamais modifiés : les géométries consultées souvent
+    sont servies depuis le cache. Chaque appel reçoit sa propre copie du dictionnaire
+    (les coordonnées sont des tuples, non modifiables).
+    """
+    return dict(_cached_mapping(ewkb))
+
+
+def geojson_geometries(elements: Sequence[Optional[WKBElement]]) -> List[Optional[dict]]:
+    """
+    GeoJSON (dict) d'une liste de géométries EWKB, décodées en un seul lot shapely (en C)
+
+    Les valeurs None restent None.
+    """
+    geoms = shapely.from_wkb([None if e is None else bytes(e.data) for e in elements])
+    return [None if g is None else orjson.loads(g) for g in shapely.to_geojson(geoms)]
@@ -0,0 +1,159 @@
+"""Noyaux numériques compilés (Numba) pour les nuages de points"""
+from typing import Tuple
+
+import numba
+import numpy as np
+from numba import njit, prange
+
+
+@njit(parallel=True)
+def xyz_bounds(x: np.ndarray, y: np.ndarray, z: np.ndarray) -> np.ndarray:
+    """
+    Emprise 3D en une seule passe mémoire
+
+    Chaque thread réduit un bloc contigu, puis les résultats partiels sont fusionnés.
+
+    Returns:
+        Array [min_x, max_x, min_y, max_y, min_z, max_z]
+    """
+    n = x.shape[0]
+    n_blocks = max(1, min(numba.get_num_threads(), n))
+    block = (n + n_blocks - 1) // n_blocks
+
+    partial = np.empty((n_blocks, 6))
+    for b in prange(n_blocks):
+        start = b * block
+        end = min(start + block, n)
+        min_x = min_y = min_z = np.inf
+        max_x = max_y = max_z = -np.inf
+        for i in range(start, end):
+            xi = x[i]
+            yi = y[i]
+            zi = z[i]
+            if xi < min_x: min_x = xi
+            if xi > max_x: max_x = xi
+            if yi < min_y: min_y = yi
+            if yi > max_y: max_y = yi
+            if zi < min_z: min_z = zi
+            if zi > max_z: max_z = zi
+        partial[b, 0] = min_x
+        partial[b, 1] = max_x
+        partial[b, 2] = min_y
+        partial[b, 3] = max_y
+        partial[b, 4] = min_z
+        partial[b, 5] = max_z
+
+    bounds = np.empty(6)
+    bounds[0] = partial[:, 0].min()
+    bounds[1] = partial[:, 1].max()
+    bounds[2] = partial[:, 2].min()
+    bounds[3] = partial[:, 3].max()
+    bounds[4] = partial[:, 4].min()
+    bounds[5] = partial[:, 5].max()
+    return bounds
+
+
+# ==================== CODES DE MORTON (Z-ORDER) ====================
+
+# Nombre maximal de bits par axe pour un code 3D sur 64 bits
+MORTON_MAX_BITS = 21
+
+
+def _part1by2(v: np.ndarray) -> np.ndarray:
+    """Insère deux bits nuls entre chaque bit (21 bits utiles -> 63 bits)"""
+    v = v.astype(np.uint64) & np.uint64(0x1FFFFF)
+    v = (v | (v << np.uint64(32))) & np.uint64(0x1F00000000FFFF)
+    v = (v | (v << np.uint64(16))) & np.uint64(0x1F0000FF0000FF)
+    v = (v | (v << np.uint64(8))) & np.uint64(0x100F00F00F00F00F)
+    v = (v | (v << np.uint64(4))) & np.uint64(0x10C30C30C30C30C3)
+    v = (v | (v << np.uint64(2))) & np.uint64(0x1249249249249249)
+    return v
+
+
+def _compact1by2(v: np.ndarray) -> np.ndarray:
+    """Opération inverse de _part1by2"""
+    v = v.astype(np.uint64) & np.uint64(0x1249249249249249)
+    v = (v ^ (v >> np.uint64(2))) & np.uint64(0x10C30C30C30C30C3)
+    v = (v ^ (v >> np.uint64(4))) & np.uint64(0x100F00F00F00F00F)
+    v = (v ^ (v >> np.uint64(8))) & np.uint64(0x1F0000FF0000FF)
+    v = (v ^ (v >> np.uint64(16))) & np.uint64(0x1F00000000FFFF)
+    v = (v ^ (v >> np.uint64(32))) & np.uint64(0x1FFFFF)
+    return v
+
+
+def morton_encode(ix: np.ndarray, iy: np.ndarray, iz: np.ndarray) -> np.ndarray:
+    """
+    Code de Morton 3D de coordonnées entières (< 2**21)
+
+    Le bit 0 de chaque triplet vient de x, le bit 1 de y et le bit 2 de z, soit la même
+    numérotation d'octants que OctreeNode (x: +1, y: +2, z: +4).
+    """
+    return _part1by2(ix) | (_part1by2(iy) << np.uint64(1)) | (_part1by2(iz) << np.uint64(2))
+
+
+def morton_decode(codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Coordonnées entières (ix, iy, iz) d'un tableau de codes de Morton"""
+    codes = codes.astype(np.uint64)
+    return (
+        _compact1by2(codes),
+        _compact1by2(codes >> np.uint64(1)),
+        _compact1by2(codes >> np.uint64(2)),
+    )
+
+
+@njit
+def _spread_bits(v: np.uint64) -> np.uint64:
+    """Version scalaire compilée de _part1by2"""
+    v &= np.uint64(0x1FFFFF)
+    v = (v | (v << np.uint64(32))) & np.uint64(0x1F00000000FFFF)
+    v = (v | (v << np.uint64(16))) & np.uint64(0x1F0000FF0000FF)
+    v = (v | (v << np.uint64(8))) & np.uint64(0x100F00F00F00F00F)
+    v = (v | (v << np.uint64(4))) & np.uint64(0x10C30C30C30C30C3)
+    v = (v | (v << np.uint64(2))) & np.uint64(0x1249249249249249)
+    return v
+
+
+@njit(parallel=True)
+def morton_codes(points: np.ndarray, mins: np.ndarray, ranges: np.ndarray, level: int) -> np.ndarray:
+    """
+    Quantification sur une grille 2**level par axe et encodage Morton en une passe
+
+    Équivaut à morton_encode sur les indices de cellule écrêtés, sans tableaux
+    intermédiaires (n, 3).
+    """
+    n = points.shape[0]
+    n_cells = 1 << level
+    codes = np.empty(n, dtype=np.uint64)
+    for i in prange(n):
+        code = np.uint64(0)
+        for axis in range(3):
+            c = int((points[i, axis] - mins[axis]) / ranges[axis] * n_cells)
+            if c < 0:
+                c = 0
+            elif c > n_cells - 1:
+                c = n_cells - 1
+            code |= _spread_bits(np.uint64(c)) << np.uint64(axis)
+        codes[i] = code
+    return codes
+
+
+# ==================== QUANTIFICATION ====================
+
+def _make_quantizer(bits: int):
+    """Noyau de quantification spécialisé pour un nombre de bits (constante figée à la compilation)"""
+    levels = np.float32((1 << bits) - 1)
+
+    @njit(parallel=True)
+    def quantize(points: np.ndarray, mins: np.ndarray, ranges: np.ndarray) -> np.ndarray:
+        n = points.shape[0]
+        quantized = np.empty((n, 3), dtype=np.uint16)
+        for i in prange(n):
+            for axis in range(3):
+                quantized[i, axis] = np.uint16((points[i, axis] - mins[axis]) / ranges[axis] * levels)
+        return quantized
+
+    return quantize
+
+
+# Quantificateurs (n, 3) float32 -> uint16 par nombre de bits : (p - min) / étendue * (2**bits - 1)
+QUANTIZERS = {bits: _make_quantizer(bits) for bits in range(10, 17)}
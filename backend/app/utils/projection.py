@@ -0,0 +1,49 @@
+"""Reprojection WGS84 <-> UTM locale pour les calculs en mètres"""
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import numpy as np
+import shapely
+from pyproj import Transformer
+
+
+@lru_cache(maxsize=None)
+def _transformers(epsg: int) -> Tuple[Transformer, Transformer]:
+    """Transformateurs (WGS84 -> UTM, UTM -> WGS84) d'une zone, créés une fois"""
+    return (
+        Transformer.from_crs(4326, epsg, always_xy=True),
+        Transformer.from_crs(epsg, 4326, always_xy=True),
+    )
+
+
+def utm_epsg(lon: float, lat: float) -> int:
+    """Code EPSG de la zone UTM WGS84 contenant (lon, lat)"""
+    zone = min(int((lon + 180) // 6) + 1, 60)
+    return (32600 if lat >= 0 else 32700) + zone
+
+
+def _reproject(transformer: Transformer, geometry):
+    """Applique un transformateur à toutes les coordonnées en un appel vectorisé"""
+    return shapely.transform(
+        geometry, lambda coords: np.column_stack(transformer.transform(coords[:, 0], coords[:, 1]))
+    )
+
+
+def to_utm(geometry, epsg: Optional[int] = None):
+    """
+    Géométrie (ou tableau de géométries) WGS84 en UTM
+
+    Sans epsg, la zone est celle du centre de l'emprise.
+
+    Returns:
+        (géométrie en mètres, code EPSG utilisé)
+    """
+    if epsg is None:
+        min_x, min_y, max_x, max_y = shapely.total_bounds(geometry)
+        epsg = utm_epsg((min_x + max_x) / 2, (min_y + max_y) / 2)
+    return _reproject(_transformers(epsg)[0], geometry), epsg
+
+
+def to_wgs84(geometry, epsg: int):
+    """Géométrie (ou tableau de géométries) UTM de la zone epsg en WGS84"""
+    return _reproject(_transformers(epsg)[1], geometry)
@@ -0,0 +1,445 @@
+"""Noyaux numériques compilés (Numba) pour les MNT raster"""
+import heapq
+import math
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Tuple
+
+import numpy as np
+from numba import cuda, get_num_threads, njit, prange
+
+
+# Codes D8 (convention ESRI) des 8 voisins (dr, dc), la ligne 0 étant au sud (min_y) :
+# 1 = E, 2 = SE, 4 = S, 8 = SO, 16 = O, 32 = NO, 64 = N, 128 = NE ; 0 = exutoire
+D8_CODES = np.array([[8, 4, 2], [16, 0, 1], [32, 64, 128]], dtype=np.uint8)
+
+
+@njit(cache=True)
+def priority_flood_d8(dem: np.ndarray):
+    """
+    Comblement des dépressions d'un MNT et directions d'écoulement D8 (Priority-Flood,
+    Barnes et al. 2014)
+
+    Les cellules de bord sont les exutoires : l'eau se propage vers l'intérieur par
+    élévation croissante (file de priorité), et chaque cellule est relevée au niveau de
+    débordement de sa cuvette. Chaque cellule atteinte s'écoule vers la cellule qui l'a
+    atteinte, ce qui donne des directions cohérentes jusque dans les zones comblées
+    (plates). Les cellules NaN sont ignorées (hors emprise).
+
+    Returns:
+        (MNT comblé du type de dem, toujours >= dem, codes D8 uint8)
+    """
+    rows, cols = dem.shape
+    filled = dem.copy()
+    closed = np.isnan(filled)
+    directions = np.zeros((rows, cols), dtype=np.uint8)
+
+    # File de priorité (élévation, indice linéaire) amorcée avec les bords
+    heap = [(0.0, 0)]
+    heap.pop()
+    for r in range(rows):
+        for c in range(cols):
+            if (r == 0 or c == 0 or r == rows - 1 or c == cols - 1) and not closed[r, c]:
+                closed[r, c] = True
+                heap.append((np.float64(filled[r, c]), r * cols + c))
+    heapq.heapify(heap)
+
+    while len(heap) > 0:
+        elevation, index = heapq.heappop(heap)
+        r = index // cols
+        c = index % cols
+        for dr in range(-1, 2):
+            for dc in range(-1, 2):
+                nr = r + dr
+                nc = c + dc
+                if nr < 0 or nc < 0 or nr >= rows or nc >= cols or closed[nr, nc]:
+                    continue
+                closed[nr, nc] = True
+                if filled[nr, nc] < elevation:
+                    filled[nr, nc] = elevation
+                # Le voisin s'écoule vers (r, c), soit le décalage (-dr, -dc)
+                directions[nr, nc] = D8_CODES[1 - dr, 1 - dc]
+                heapq.heappush(heap, (np.float64(filled[nr, nc]), nr * cols + nc))
+
+    return filled, directions
+
+
+@njit(cache=True)
+def priority_flood(dem: np.ndarray) -> np.ndarray:
+    """
+    Comblement des dépressions d'un MNT (Priority-Flood, voir priority_flood_d8)
+
+    Returns:
+        MNT comblé (type de dem), toujours >= dem
+    """
+    return priority_flood_d8(dem)[0]
+
+
+@njit(parallel=True, cache=True)
+def flood_depth(dem: np.ndarray, filled: np.ndarray, water_level: float):
+    """
+    Masque inondé, profondeur d'eau et statistiques en un seul passage sur le MNT
+
+    Une cellule est en eau si son niveau comblé (priority_flood) est atteint ; sa
+    profondeur est alors water_level - dem, nulle ailleurs (cuvettes fermées comprises).
+
+    Returns:
+        (masque inondé, profondeur, cellules inondées, profondeur max, somme des profondeurs)
+    """
+    rows, cols = dem.shape
+    flooded = np.empty((rows, cols), dtype=np.bool_)
+    depth = np.empty_like(dem)
+    count = 0
+    max_depth = 0.0
+    sum_depth = 0.0
+
+    for i in prange(rows):
+        for j in range(cols):
+            wet = filled[i, j] <= water_level
+            d = water_level - dem[i, j] if wet else 0.0
+            flooded[i, j] = wet
+            depth[i, j] = d
+            count += 1 if wet else 0
+            sum_depth += d
+            max_depth = max(max_depth, d)
+
+    return flooded, depth, count, max_depth, sum_depth
+
+
+@njit(cache=True, fastmath=True)
+def _los_visible(dem: np.ndarray, r0: int, c0: int, r1: int, c1: int,
+                 obs_elevation: float, target_elevation: float) -> bool:
+    """
+    Ligne de vue de Bresenham de (r0, c0) vers (r1, c1), sans allocation
+
+    La hauteur de la ligne de vue est mise à jour par incrément constant à chaque pas ;
+    le parcours s'arrête au premier obstacle.
+    """
+    dx = abs(r1 - r0)
+    dy = abs(c1 - c0)
+    sx = 1 if r0 < r1 else -1
+    sy = 1 if c0 < c1 else -1
+    err = dx - dy
+    x = r0
+    y = c0
+
+    # Interpolation linéaire observateur -> cible sur max(dx, dy) + 1 points
+    delta = (target_elevation - obs_elevation) / (max(dx, dy) + 1)
+    sight_line = obs_elevation
+
+    while True:
+        # Pas sans branchement : les deux conditions deviennent des sélections (cmov)
+        e2 = 2 * err
+        step_x = e2 > -dy
+        step_y = e2 < dx
+        err += (dx if step_y else 0) - (dy if step_x else 0)
+        x += sx if step_x else 0
+        y += sy if step_y else 0
+        if x == r1 and y == c1:
+            return True
+
+        sight_line += delta
+        if dem[x, y] > sight_line:
+            return False
+
+
+@njit(parallel=True, cache=True)
+def viewshed(dem: np.ndarray, obs_row: int, obs_col: int,
+             observer_height: float, target_height: float) -> np.ndarray:
+    """
+    Visibilité exacte de chaque cellule depuis un observateur (algorithme R3)
+
+    Une ligne de vue par cellule (_los_visible). Lignes du raster réparties entre les threads.
+
+    Returns:
+        Masque booléen des cellules visibles
+    """
+    rows, cols = dem.shape
+    obs_elevation = dem[obs_row, obs_col] + observer_height
+    visible = np.zeros((rows, cols), dtype=np.bool_)
+
+    for i in prange(rows):
+        for j in range(cols):
+            if i == obs_row and j == obs_col:
+                visible[i, j] = True
+            else:
+                visible[i, j] = _los_visible(dem, obs_row, obs_col, i, j,
+                                             obs_elevation, dem[i, j] + target_height)
+
+    return visible
+
+
+@njit(cache=True)
+def _r2_ray(dem: np.ndarray, obs_row: int, obs_col: int, obs_elevation: float,
+            target_height: float, k: int, visible: np.ndarray):
+    """
+    Balaye le rayon R2 de l'observateur vers la k-ième cellule du bord
+
+    Cellules du bord numérotées : lignes 0 et rows-1, puis colonnes 0 et cols-1 sans
+    les coins. Une cellule est marquée visible si la pente vers sa cible atteint la
+    plus forte pente du terrain rencontrée jusque-là sur le rayon.
+    """
+    rows, cols = dem.shape
+    if k < cols:
+        i, j = 0, k
+    elif k < 2 * cols:
+        i, j = rows - 1, k - cols
+    elif k < 2 * cols + rows - 2:
+        i, j = k - 2 * cols + 1, 0
+    else:
+        i, j = k - 2 * cols - rows + 3, cols - 1
+
+    dx = abs(i - obs_row)
+    dy = abs(j - obs_col)
+    sx = 1 if obs_row < i else -1
+    sy = 1 if obs_col < j else -1
+    err = dx - dy
+    x = obs_row
+    y = obs_col
+    max_slope = -np.inf
+
+    while x != i or y != j:
+        e2 = 2 * err
+        step_x = e2 > -dy
+        step_y = e2 < dx
+        err += (dx if step_y else 0) - (dy if step_x else 0)
+        x += sx if step_x else 0
+        y += sy if step_y else 0
+
+        distance = np.sqrt((x - obs_row) ** 2 + (y - obs_col) ** 2)
+        slope = (dem[x, y] - obs_elevation) / distance
+        if (dem[x, y] + target_height - obs_elevation) / distance >= max_slope:
+            visible[x, y] = True
+        if slope > max_slope:
+            max_slope = slope
+
+
+@njit(parallel=True, cache=True)
+def viewshed_r2(dem: np.ndarray, obs_row: int, obs_col: int,
+                observer_height: float, target_height: float) -> np.ndarray:
+    """
+    Visibilité approchée par balayage des bords (algorithme R2, Franklin & Ray 1994)
+
+    Une ligne de vue de Bresenham est tracée vers chaque cellule du bord du raster
+    (_r2_ray) ; chaque cellule intérieure prend la visibilité des rayons qui la
+    traversent : O(n) au lieu de O(n·√n) pour R3.
+    Rayons indépendants répartis entre les threads : les cellules partagées par deux
+    rayons ne sont jamais qu'écrites à True, la pente maximale reste locale au rayon.
+
+    Returns:
+        Masque booléen des cellules visibles
+    """
+    rows, cols = dem.shape
+    obs_elevation = dem[obs_row, obs_col] + observer_height
+    visible = np.zeros((rows, cols), dtype=np.bool_)
+    visible[obs_row, obs_col] = True
+
+    n_boundary = 2 * cols + 2 * max(rows - 2, 0)
+    for k in prange(n_boundary):
+        _r2_ray(dem, obs_row, obs_col, obs_elevation, target_height, k, visible)
+
+    return visible
+
+
+def cumulative_viewshed(dem: np.ndarray, obs_rows: np.ndarray, obs_cols: np.ndarray,
+                        obs_heights: np.ndarray, target_heights: np.ndarray):
+    """
+    Visibilité cumulée de plusieurs observateurs sur un même MNT (R2 par observateur)
+
+    Observateurs répartis en blocs, un par thread ; chaque bloc cumule dans son propre
+    tampon de comptage, sommés à la fin (pas d'écriture concurrente).
+
+    Returns:
+        (nombre d'observateurs voyant chaque cellule int32, cellules visibles par observateur)
+    """
+    n_blocks = max(min(get_num_threads(), len(obs_rows)), 1)
+    return _cumulative_viewshed(
+        dem, np.asarray(obs_rows, dtype=np.int64), np.asarray(obs_cols, dtype=np.int64),
+        np.asarray(obs_heights, dtype=np.float64), np.asarray(target_heights, dtype=np.float64),
+        n_blocks
+    )
+
+
+@njit(parallel=True, cache=True)
+def _cumulative_viewshed(dem: np.ndarray, obs_rows: np.ndarray, obs_cols: np.ndarray,
+                         obs_heights: np.ndarray, target_heights: np.ndarray, n_blocks: int):
+    """Noyau de cumulative_viewshed : un bloc d'observateurs et un tampon par itération"""
+    rows, cols = dem.shape
+    n_observers = obs_rows.shape[0]
+    n_boundary = 2 * cols + 2 * max(rows - 2, 0)
+
+    buffers = np.zeros((n_blocks, rows, cols), dtype=np.int32)
+    visible_counts = np.zeros(n_observers, dtype=np.int64)
+
+    for b in prange(n_blocks):
+        visible = np.empty((rows, cols), dtype=np.bool_)
+        for o in range(b, n_observers, n_blocks):
+            r0 = obs_rows[o]
+            c0 = obs_cols[o]
+            visible[:] = False
+            visible[r0, c0] = True
+            obs_elevation = dem[r0, c0] + obs_heights[o]
+            for k in range(n_boundary):
+                _r2_ray(dem, r0, c0, obs_elevation, target_heights[o], k, visible)
+
+            count = 0
+            for i in range(rows):
+                for j in range(cols):
+                    if visible[i, j]:
+                        buffers[b, i, j] += 1
+                        count += 1
+            visible_counts[o] = count
+
+    return buffers.sum(axis=0).astype(np.int32), visible_counts
+
+
+# Nombre maximal de seuils compilés en dur par class_counter
+MAX_CONSTANT_EDGES = 16
+
+# Jeux de seuils déjà demandés (les plus récents), compilés à partir de leur 2e usage
+_seen_edges: "OrderedDict[Tuple[float, ...], None]" = OrderedDict()
+_seen_edges_lock = threading.Lock()
+
+
+def _digitize_counter(edges: Tuple[float, ...]):
+    """Compteur de classes NumPy (np.digitize), sans compilation ; NaN ignorés"""
+    bins = np.asarray(edges, dtype=np.float64)
+
+    def count(values: np.ndarray) -> np.ndarray:
+        values = values[~np.isnan(values)]
+        return np.bincount(np.digitize(values, bins), minlength=len(edges) + 1)
+
+    return count
+
+
+@lru_cache(maxsize=32)
+def _compiled_class_counter(edges: Tuple[float, ...]):
+    """Compteur compilé avec les seuils en constantes (voir class_counter)"""
+    n_classes = len(edges) + 1
+
+    @njit
+    def count(values: np.ndarray) -> np.ndarray:
+        counts = np.zeros(n_classes, dtype=np.int64)
+        for i in range(values.shape[0]):
+            value = values[i]
+            if value != value:
+                continue
+            k = 0
+            for edge in edges:
+                k += value >= edge
+            counts[k] += 1
+        return counts
+
+    return count
+
+
+def class_counter(edges: Tuple[float, ...]):
+    """
+    Compteur de classes pour des seuils croissants fixés (évaluation partielle)
+
+    Les seuils sont des constantes du code compilé : la classe d'une valeur est le nombre
+    de seuils qu'elle atteint, en comparaisons sans branchement. Les valeurs NaN sont
+    ignorées ; sinon équivalent à np.bincount(np.digitize(values, edges)).
+
+    La compilation (fermeture non mise en cache sur disque) coûte de l'ordre de la
+    seconde : le premier usage d'un jeu de seuils, ou un jeu de plus de
+    MAX_CONSTANT_EDGES seuils, passe par np.digitize ; le noyau n'est compilé qu'au
+    second usage, puis réutilisé par le processus.
+
+    Returns:
+        Fonction values -> comptes (len(edges) + 1 classes)
+    """
+    if len(edges) > MAX_CONSTANT_EDGES:
+        return _digitize_counter(edges)
+
+    with _seen_edges_lock:
+        seen = edges in _seen_edges
+        _seen_edges[edges] = None
+        _seen_edges.move_to_end(edges)
+        while len(_seen_edges) > 256:
+            _seen_edges.popitem(last=False)
+
+    if seen:
+        return _compiled_class_counter(edges)
+    return _digitize_counter(edges)
+
+
+# Taille (cellules) à partir de laquelle le viewshed R2 passe sur GPU si CUDA est disponible
+GPU_VIEWSHED_MIN_CELLS = 4_000_000
+
+
+@lru_cache(maxsize=None)
+def cuda_available() -> bool:
+    """Vrai si un GPU CUDA est utilisable par Numba (testé une fois par processus)"""
+    try:
+        return cuda.is_available()
+    except Exception:
+        return False
+
+
+@cuda.jit
+def _viewshed_r2_cuda(dem, visible, obs_row, obs_col, obs_elevation, target_height, n_boundary):
+    """Noyau CUDA du viewshed R2 : un thread par rayon (compilé au premier lancement)"""
+    k = cuda.grid(1)
+    if k >= n_boundary:
+        return
+
+    rows, cols = dem.shape
+    if k < cols:
+        i, j = 0, k
+    elif k < 2 * cols:
+        i, j = rows - 1, k - cols
+    elif k < 2 * cols + rows - 2:
+        i, j = k - 2 * cols + 1, 0
+    else:
+        i, j = k - 2 * cols - rows + 3, cols - 1
+
+    dx = abs(i - obs_row)
+    dy = abs(j - obs_col)
+    sx = 1 if obs_row < i else -1
+    sy = 1 if obs_col < j else -1
+    err = dx - dy
+    x = obs_row
+    y = obs_col
+    max_slope = -math.inf
+
+    while x != i or y != j:
+        e2 = 2 * err
+        step_x = e2 > -dy
+        step_y = e2 < dx
+        err += (dx if step_y else 0) - (dy if step_x else 0)
+        x += sx if step_x else 0
+        y += sy if step_y else 0
+
+        distance = math.sqrt(float((x - obs_row) ** 2 + (y - obs_col) ** 2))
+        slope = (dem[x, y] - obs_elevation) / distance
+        if (dem[x, y] + target_height - obs_elevation) / distance >= max_slope:
+            visible[x, y] = True
+        if slope > max_slope:
+            max_slope = slope
+
+
+def viewshed_r2_gpu(dem: np.ndarray, obs_row: int, obs_col: int,
+                    observer_height: float, target_height: float,
+                    threads_per_block: int = 256) -> np.ndarray:
+    """
+    Viewshed R2 sur GPU CUDA : un thread par rayon vers le bord (même résultat que viewshed_r2)
+
+    Returns:
+        Masque booléen des cellules visibles
+    """
+    rows, cols = dem.shape
+    n_boundary = 2 * cols + 2 * max(rows - 2, 0)
+    obs_elevation = float(dem[obs_row, obs_col]) + observer_height
+
+    d_dem = cuda.to_device(np.ascontiguousarray(dem))
+    visible = np.zeros((rows, cols), dtype=np.bool_)
+    visible[obs_row, obs_col] = True
+    d_visible = cuda.to_device(visible)
+
+    blocks = (n_boundary + threads_per_block - 1) // threads_per_block
+    _viewshed_r2_cuda[blocks, threads_per_block](
+        d_dem, d_visible, obs_row, obs_col, obs_elevation, target_height, n_boundary
+    )
+    return d_visible.copy_to_host()
@@ -0,0 +1,91 @@
+"""Position du soleil (noyau Numba vectorisé sur des lots de dates et de lieux)"""
+import math
+from datetime import datetime
+from typing import Tuple
+
+import numpy as np
+from numba import njit
+
+
+def julian_day(date_str: str, time_str: str) -> float:
+    """Jour julien d'une date 'YYYY-MM-DD' et d'une heure 'HH:MM' (temps universel)"""
+    dt = datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M")
+    y = dt.year
+    m = dt.month
+    d = dt.day
+    h = dt.hour + dt.minute / 60.0
+
+    if m <= 2:
+        y -= 1
+        m += 12
+
+    A = int(y / 100)
+    B = 2 - A + int(A / 4)
+
+    JD = int(365.25 * (y + 4716)) + int(30.6001 * (m + 1)) + d + B - 1524.5
+    return JD + h / 24.0
+
+
+@njit(cache=True)
+def solar_position(jd: float, lat: float, lon: float) -> Tuple[float, float]:
+    """Azimut dans [0, 360) et élévation du soleil (degrés) pour un jour julien et un lieu"""
+    # Siècles juliens depuis J2000.0
+    T = (jd - 2451545.0) / 36525.0
+
+    # Longitude moyenne, anomalie moyenne et équation du centre
+    L0 = (280.46646 + 36000.76983 * T + 0.0003032 * T * T) % 360
+    M = (357.52911 + 35999.05029 * T - 0.0001537 * T * T) % 360
+    C = ((1.914602 - 0.004817 * T - 0.000014 * T * T) * math.sin(math.radians(M))
+         + (0.019993 - 0.000101 * T) * math.sin(math.radians(2 * M))
+         + 0.000289 * math.sin(math.radians(3 * M)))
+
+    # Longitude vraie et obliquité de l'écliptique
+    L = math.radians(L0 + C)
+    epsilon = math.radians(23.439291 - 0.0130042 * T)
+
+    # Ascension droite et déclinaison
+    RA = math.degrees(math.atan2(math.cos(epsilon) * math.sin(L), math.cos(L)))
+    delta = math.asin(math.sin(epsilon) * math.sin(L))
+
+    # Angle horaire
+    GMST = (280.46061837 + 360.98564736629 * (jd - 2451545.0) +
+            0.000387933 * T * T - T * T * T / 38710000.0) % 360
+    LST = (GMST + lon) % 360
+    H = (LST - RA) % 360
+    if H > 180:
+        H -= 360
+    H = math.radians(H)
+
+    # Élévation et azimut
+    phi = math.radians(lat)
+    elevation = math.degrees(math.asin(
+        math.sin(phi) * math.sin(delta) + math.cos(phi) * math.cos(delta) * math.cos(H)
+    ))
+    azimuth = (math.degrees(math.atan2(
+        -math.sin(H),
+        math.tan(delta) * math.cos(phi) - math.sin(phi) * math.cos(H)
+    )) + 180) % 360
+
+    return azimuth, elevation
+
+
+@njit(cache=True)
+def solar_positions(jd: np.ndarray, lat: np.ndarray,
+                    lon: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Azimut et élévation du soleil (degrés) pour des tableaux de jours juliens et de lieux
+
+    Boucle séquentielle sur solar_position (intégrée à la compilation), vectorisée par
+    le compilateur : pas de pool de threads à lancer pour quelques milliers de positions.
+
+    Returns:
+        (azimuts dans [0, 360), élévations)
+    """
+    n = jd.shape[0]
+    azimuth = np.empty(n)
+    elevation = np.empty(n)
+
+    for i in range(n):
+        azimuth[i], elevation[i] = solar_position(jd[i], lat[i], lon[i])
+
+    return azimuth, elevation
@@ -0,0 +1,57 @@
+"""Enregistrement des fichiers LAS uploadés et lecture de leur en-tête"""
+import asyncio
+import shutil
+from pathlib import Path
+
+import laspy
+from fastapi import HTTPException, UploadFile
+
+from app.config import settings
+
+# Taille des blocs copiés lors de l'upload (1 MiB)
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+
+def _copy_upload(src, filepath: Path) -> int:
+    """Copie le fichier temporaire d'un upload vers sa destination, retourne sa taille"""
+    with open(filepath, "wb") as dst:
+        shutil.copyfileobj(src, dst, length=UPLOAD_CHUNK_SIZE)
+        return dst.tell()
+
+
+async def save_upload(file: UploadFile, filepath: Path) -> int:
+    """
+    Enregistre un upload sur disque, hors de la boucle d'événements
+
+    La taille est limitée à settings.MAX_UPLOAD_SIZE : vérifiée dès la réception
+    du formulaire si elle est connue, puis après copie (fichier supprimé si dépassée).
+
+    Returns:
+        Taille du fichier enregistré, en octets
+
+    Raises:
+        HTTPException 400 si le fichier est trop volumineux
+    """
+    too_large = HTTPException(
+        status_code=400,
+        detail=f"Fichier trop volumineux (max {settings.MAX_UPLOAD_SIZE / 1024 / 1024} MB)"
+    )
+
+    if file.size is not None and file.size > settings.MAX_UPLOAD_SIZE:
+        raise too_large
+
+    # Copie directe du fichier temporaire de l'upload, sans passer par un objet bytes
+    await file.seek(0)
+    size = await asyncio.to_thread(_copy_upload, file.file, filepath)
+
+    if size > settings.MAX_UPLOAD_SIZE:
+        filepath.unlink()
+        raise too_large
+
+    return size
+
+
+def read_header(filepath) -> laspy.LasHeader:
+    """Lit l'en-tête LAS sans décoder les points"""
+    with laspy.open(filepath) as reader:
+        return reader.header
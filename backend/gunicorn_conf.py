@@ -0,0 +1,30 @@
+"""Configuration Gunicorn (production) avec workers Uvicorn"""
+import multiprocessing
+import os
+
+from uvicorn.workers import UvicornWorker
+
+
+class LidarUvicornWorker(UvicornWorker):
+    """Worker Uvicorn avec boucle uvloop et parseur httptools (uvicorn[standard])"""
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools", "limit_concurrency": 500}
+
+
+# Un worker par cœur (2n+1), surchargeable via WEB_CONCURRENCY
+workers = int(os.getenv("WEB_CONCURRENCY", 2 * multiprocessing.cpu_count() + 1))
+worker_class = LidarUvicornWorker
+
+# Connexions PostgreSQL réparties entre workers : chaque worker a son propre pool
+# SQLAlchemy, le total (pool + débordement) reste sous DB_MAX_CONNECTIONS
+# (max_connections = 100 par défaut côté serveur). Au-delà, passer par PgBouncer.
+# Les variables POOL_SIZE / MAX_OVERFLOW explicites restent prioritaires.
+db_connections_per_worker = max(2, int(os.getenv("DB_MAX_CONNECTIONS", 90)) // workers)
+os.environ.setdefault("POOL_SIZE", str(max(1, db_connections_per_worker // 2)))
+os.environ.setdefault("MAX_OVERFLOW", str(db_connections_per_worker - int(os.environ["POOL_SIZE"])))
+bind = os.getenv("BIND", "0.0.0.0:8000")
+
+# Traitements LIDAR longs : délai plus large que les 30 s par défaut
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+
+# Connexions keep-alive conservées entre requêtes (transmis à Uvicorn)
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
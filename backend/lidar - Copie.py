@@ -1,31 +1,73 @@
 import os
 import json
 import uuid
+import shutil
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, reduce as fold
+
 import numpy as np
 import laspy
+from numba import njit, prange
 
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 
 router = APIRouter(prefix="/lidar", tags=["Lidar"])
 
 DATA_DIR = "lidar_data"
 os.makedirs(DATA_DIR, exist_ok=True)
 
+# Codes de classe des points (classify)
+CLASS_GROUND = 0
+CLASS_BUILDING = 1
+
 TILE_SIZE = 200
 GRID_SIZE = 5
 SAMPLE_POINTS = 200_000
+UPLOAD_CHUNK = 1 << 22
+INDEX_BUCKETS = 64
+
+# Pool de threads autour des noyaux NumPy (le GIL est relâché dans le C)
+WORKERS = os.cpu_count() or 1
+CHUNK_POINTS = 1_000_000
+
+# Tirages sans remise en O(k) (pas de permutation des N points)
+rng = np.random.default_rng()
 
 # -------------------------------------------------------
 # Upload LIDAR
 # -------------------------------------------------------
+def save_upload(src, path):
+    with open(path, "wb") as dst:
+        shutil.copyfileobj(src, dst, length=UPLOAD_CHUNK)
+
+
+def remove_upload(path):
+    for f in (path, points_path(path), index_path(path)):
+        if os.path.exists(f):
+            os.remove(f)
+
+
 @router.post("/upload")
 async def upload_lidar(file: UploadFile = File(...)):
     lidar_id = str(uuid.uuid4())
     path = os.path.join(DATA_DIR, f"{lidar_id}.las")
 
-    with open(path, "wb") as f:
-        f.write(await file.read())
+    try:
+        # Copie par blocs de 4 Mo hors de la boucle d'événements : mémoire O(bloc)
+        # quelle que soit la taille du LAS
+        await asyncio.to_thread(save_upload, file.file, path)
+
+        # Décodage LAS hors de la boucle d'événements
+        await asyncio.to_thread(save_points, path)
+    except laspy.errors.LaspyException:
+        remove_upload(path)
+        raise HTTPException(400, "Invalid LAS file")
+    except Exception:
+        # Aucun fichier orphelin dans DATA_DIR, quelle que soit l'erreur
+        remove_upload(path)
+        raise
 
     return {"lidar_id": lidar_id}
 
@@ -33,36 +75,170 @@ async def upload_lidar(file: UploadFile = File(...)):
 # -------------------------------------------------------
 # Chargement points
 # -------------------------------------------------------
-def load_points(path, max_points=None):
+def points_path(path):
+    return os.path.splitext(path)[0] + ".npy"
+
+
+def read_las_points(path):
     las = laspy.read(path)
-    pts = np.vstack((las.x, las.y, las.z)).transpose()
+    return np.stack((las.x, las.y, las.z), axis=1)
 
-    if max_points and len(pts) > max_points:
-        idx = np.random.choice(len(pts), max_points, replace=False)
-        pts = pts[idx]
 
-    return pts
+def index_path(path):
+    return os.path.splitext(path)[0] + "_index.json"
+
+
+def save_points(path):
+    # Décodage LAS une seule fois : tableau (N, 3) contigu, relu en mmap
+    # (float64 : les coordonnées projetées perdent le décimètre en float32)
+    pts = read_las_points(path)
+    if len(pts) == 0:
+        raise HTTPException(400, "Empty LAS file")
+
+    # Index spatial : points triés par case d'une grille INDEX_BUCKETS x INDEX_BUCKETS,
+    # la case ix * INDEX_BUCKETS + iy couvrant pts[offsets[id]:offsets[id + 1]],
+    # et par x à l'intérieur de chaque case
+    min_x, min_y = pts[:, 0].min(), pts[:, 1].min()
+    max_x, max_y = pts[:, 0].max(), pts[:, 1].max()
+    ix, iy = bucket_indices(pts[:, 0], pts[:, 1], [min_x, min_y, max_x, max_y])
+    buckets = ix * INDEX_BUCKETS + iy
+
+    order = np.lexsort((pts[:, 0], buckets))
+    counts = np.bincount(buckets, minlength=INDEX_BUCKETS * INDEX_BUCKETS)
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    np.save(points_path(path), pts[order])
+
+    with open(index_path(path), "w") as f:
+        json.dump({
+            "bounds": [float(min_x), float(min_y), float(max_x), float(max_y)],
+            "max_z": float(pts[:, 2].max()),
+            "x_sorted": True,
+            "offsets": offsets.tolist(),
+        }, f)
+
+    open_points.cache_clear()
+    load_index.cache_clear()
+
+
+# Nuages (mmap) et index gardés ouverts par processus : le cache de pages de l'OS
+# gère la mémoire réelle, seules les relectures np.load / json sont évitées
+@lru_cache(maxsize=8)
+def open_points(path):
+    return np.load(points_path(path), mmap_mode="r")
+
+
+@lru_cache(maxsize=8)
+def load_index(path):
+    if not (os.path.exists(index_path(path)) and os.path.exists(points_path(path))):
+        return None
+
+    with open(index_path(path)) as f:
+        return json.load(f)
+
+
+def cloud_extent(path):
+    # Emprise (min_x, min_y, max_x, max_y) et z max : index écrit à l'upload,
+    # sinon en-tête LAS (aucun point décodé)
+    index = load_index(path)
+    if index is not None and "max_z" in index:
+        return index["bounds"], index["max_z"]
+
+    with laspy.open(path) as reader:
+        mins, maxs = reader.header.mins, reader.header.maxs
+    return [mins[0], mins[1], maxs[0], maxs[1]], maxs[2]
+
+
+def bucket_indices(x, y, bounds):
+    min_x, min_y, max_x, max_y = bounds
+    size_x = max(max_x - min_x, 1e-9) / INDEX_BUCKETS
+    size_y = max(max_y - min_y, 1e-9) / INDEX_BUCKETS
+
+    ix = np.clip(((np.asarray(x) - min_x) / size_x).astype(np.int64), 0, INDEX_BUCKETS - 1)
+    iy = np.clip(((np.asarray(y) - min_y) / size_y).astype(np.int64), 0, INDEX_BUCKETS - 1)
+    return ix, iy
+
+
+def sample_indices(n, max_points):
+    # Exactement max_points indices régulièrement espacés (croissants)
+    return np.linspace(0, n - 1, max_points).astype(np.int64)
+
+
+def load_points(path, max_points=None):
+    if os.path.exists(points_path(path)):
+        pts = open_points(path)
+
+        if max_points and len(pts) > max_points:
+            # Lecture à pas régulier du mmap : seules les pages des points gardés sont lues
+            # (points triés par case : l'échantillon couvre tout le nuage)
+            pts = pts[sample_indices(len(pts), max_points)]
+
+        return pts
+
+    with laspy.open(path) as reader:
+        n = reader.header.point_count
+        if not max_points or n <= max_points:
+            return read_las_points(path)
+
+        # Sans cache .npy : lecture LAS par blocs, seuls les points échantillonnés gardés
+        idx = sample_indices(n, max_points)
+        parts = [np.empty((0, 3))]
+        read = 0
+
+        for chunk in reader.chunk_iterator(1_000_000):
+            lo, hi = np.searchsorted(idx, [read, read + len(chunk)])
+            kept = chunk[idx[lo:hi] - read]
+            read += len(chunk)
+            parts.append(np.stack((kept.x, kept.y, kept.z), axis=1))
+
+    return np.concatenate(parts)
+
+
+# -------------------------------------------------------
+# Réponse binaire des points
+# -------------------------------------------------------
+def binary_points(pts):
+    # XYZ float32 little-endian relatifs à l'origine X-Points-Origin (les coordonnées
+    # projetées absolues perdent le décimètre en float32) ; côté client :
+    # new Float32Array(await resp.arrayBuffer())
+    origin = pts.min(axis=0) if len(pts) else np.zeros(3)
+    data = np.ascontiguousarray(pts - origin, dtype="<f4")
+
+    return Response(
+        content=data.tobytes(),
+        media_type="application/octet-stream",
+        headers={
+            "X-Points-Count": str(len(data)),
+            "X-Points-Origin": ",".join(repr(float(v)) for v in origin),
+        },
+    )
+
+
+def points_response(pts, format):
+    if format == "json":
+        return JSONResponse(content={"points": pts.tolist()})
+    return binary_points(pts)
 
 
 # -------------------------------------------------------
 # Sample viewer
 # -------------------------------------------------------
 @router.get("/files/{lidar_id}/sample")
-def sample_points(lidar_id: str):
+def sample_points(lidar_id: str, format: str = "binary"):
     path = os.path.join(DATA_DIR, f"{lidar_id}.las")
     if not os.path.exists(path):
         raise HTTPException(404)
 
     pts = load_points(path, SAMPLE_POINTS)
-    return JSONResponse(content={"points": pts.tolist()})
+    return points_response(pts, format)
 
 
 # -------------------------------------------------------
 # Découpage en tuiles
 # -------------------------------------------------------
 def compute_tile_index(x, y, min_x, min_y):
-    tx = int((x - min_x) / TILE_SIZE)
-    ty = int((y - min_y) / TILE_SIZE)
+    tx = ((x - min_x) / TILE_SIZE).astype(np.int64)
+    ty = ((y - min_y) / TILE_SIZE).astype(np.int64)
     return tx, ty
 
 
@@ -72,18 +248,36 @@ def generate_tiles(lidar_id: str):
     pts = load_points(path)
 
     min_x, min_y = pts[:, 0].min(), pts[:, 1].min()
-    tiles = {}
+    tx, ty = compute_tile_index(pts[:, 0], pts[:, 1], min_x, min_y)
+
+    # Tri unique par clé de tuile : chaque tuile est une plage contiguë
+    ny = ty.max() + 1
+    keys = tx * ny + ty
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    pts = pts[order]
 
-    for p in pts:
-        tx, ty = compute_tile_index(p[0], p[1], min_x, min_y)
-        tiles.setdefault((tx, ty), []).append(p.tolist())
+    tile_keys, starts = np.unique(keys, return_index=True)
+    stops = np.append(starts[1:], len(keys))
+    tiles = [[int(key // ny), int(key % ny)] for key in tile_keys]
 
     tile_dir = os.path.join(DATA_DIR, f"tiles_{lidar_id}")
     os.makedirs(tile_dir, exist_ok=True)
 
-    for (tx, ty), arr in tiles.items():
-        with open(f"{tile_dir}/{tx}_{ty}.json", "w") as f:
-            json.dump(arr, f)
+    def save_tile(tile):
+        (tx, ty), start, stop = tile
+        np.save(f"{tile_dir}/{tx}_{ty}.npy", pts[start:stop])
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as ex:
+        list(ex.map(save_tile, zip(tiles, starts, stops)))
+
+    with open(f"{tile_dir}/index.json", "w") as f:
+        json.dump({
+            "origin": [float(min_x), float(min_y)],
+            "tiles": tiles,
+        }, f)
+
+    load_tile_index.cache_clear()
 
     return {"tiles": len(tiles)}
 
@@ -91,29 +285,69 @@ def generate_tiles(lidar_id: str):
 # -------------------------------------------------------
 # Octree LOD
 # -------------------------------------------------------
-def build_octree(points, depth=0, max_depth=6, max_points=50_000):
-    if depth >= max_depth or len(points) <= max_points:
-        return {"points": points.tolist(), "children": []}
+@njit(cache=True)
+def part1by2(v):
+    # Intercale 2 bits nuls entre chaque bit (10 bits -> 30 bits)
+    v = v & 0x000003FF
+    v = (v | (v << 16)) & 0x030000FF
+    v = (v | (v << 8)) & 0x0300F00F
+    v = (v | (v << 4)) & 0x030C30C3
+    v = (v | (v << 2)) & 0x09249249
+    return v
+
+
+@njit(parallel=True, cache=True)
+def morton_kernel(points, mins, scale, cells):
+    # Quantification et entrelacement en un passage, sans tableau intermédiaire
+    codes = np.empty(points.shape[0], dtype=np.uint32)
+
+    for i in prange(points.shape[0]):
+        code = 0
+        for axis in range(3):
+            q = min(int((points[i, axis] - mins[axis]) * scale[axis]), cells - 1)
+            code |= part1by2(q) << (2 - axis)
+        codes[i] = code
+
+    return codes
 
-    center = points.mean(axis=0)
-    children = []
 
-    for dx in [0, 1]:
-        for dy in [0, 1]:
-            for dz in [0, 1]:
-                mask = (
-                    ((points[:, 0] > center[0]) == dx)
-                    & ((points[:, 1] > center[1]) == dy)
-                    & ((points[:, 2] > center[2]) == dz)
-                )
+def morton_codes(points, max_depth):
+    mins = points.min(axis=0)
+    extent = np.maximum(points.max(axis=0) - mins, 1e-9)
+    cells = 1 << max_depth
 
-                subset = points[mask]
-                if len(subset):
-                    children.append(
-                        build_octree(subset, depth + 1, max_depth, max_points)
-                    )
+    return morton_kernel(points, mins, cells / extent, cells)
 
-    return {"points": [], "children": children}
+
+def build_octree(points, max_depth=6, max_points=50_000):
+    # Tri unique selon le code de Morton : chaque noeud est une plage contiguë
+    codes = morton_codes(points, max_depth)
+    order = np.argsort(codes, kind="stable")
+    codes = codes[order]
+    points = points[order]
+
+    def build(lo, hi, depth):
+        if depth >= max_depth or hi - lo <= max_points:
+            return {"points": points[lo:hi].tolist(), "children": []}
+
+        # Frontières des 8 octants (bits 3 * (max_depth - depth - 1) du code)
+        shift = 3 * (max_depth - depth - 1)
+        base = (int(codes[lo]) >> (shift + 3)) << (shift + 3)
+        splits = lo + np.searchsorted(
+            codes[lo:hi], base + (np.arange(1, 8, dtype=np.int64) << shift)
+        )
+        edges = [lo, *splits.tolist(), hi]
+
+        return {
+            "points": [],
+            "children": [
+                build(start, stop, depth + 1)
+                for start, stop in zip(edges[:-1], edges[1:])
+                if stop > start
+            ],
+        }
+
+    return build(0, len(points), 0)
 
 
 @router.post("/files/{lidar_id}/octree")
@@ -148,15 +382,79 @@ def load_octree(lidar_id: str):
 # Streaming adaptatif
 # -------------------------------------------------------
 @router.get("/files/{lidar_id}/adaptive")
-def adaptive_stream(lidar_id: str, distance: float = 1000):
+def adaptive_stream(lidar_id: str, distance: float = 1000, format: str = "binary"):
     path = os.path.join(DATA_DIR, f"{lidar_id}.las")
     pts = load_points(path)
 
     factor = min(1, 500 / distance)
     sample = max(1000, int(len(pts) * factor))
 
-    idx = np.random.choice(len(pts), sample, replace=False)
-    return {"points": pts[idx].tolist()}
+    idx = rng.choice(len(pts), sample, replace=False, shuffle=False)
+    return points_response(pts[idx], format)
+
+
+# -------------------------------------------------------
+# Réduction sur grille (min / max de Z par cellule)
+# -------------------------------------------------------
+def point_chunks(n):
+    # Plages contiguës d'au moins CHUNK_POINTS points, au plus une par thread
+    k = max(1, min(WORKERS, n // CHUNK_POINTS))
+    bounds = np.linspace(0, n, k + 1).astype(np.int64)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def grid_reduce(pts, reduce):
+    min_x, min_y = pts[:, 0].min(), pts[:, 1].min()
+    nx = int((pts[:, 0].max() - min_x) / GRID_SIZE) + 1
+    ny = int((pts[:, 1].max() - min_y) / GRID_SIZE) + 1
+    fill = np.inf if reduce is np.minimum else -np.inf
+
+    # Raster partiel par plage de points, fusionné ensuite par reduce
+    def reduce_chunk(bounds):
+        chunk = pts[bounds[0]:bounds[1]]
+        gx = ((chunk[:, 0] - min_x) / GRID_SIZE).astype(np.int64)
+        gy = ((chunk[:, 1] - min_y) / GRID_SIZE).astype(np.int64)
+
+        z = np.full(nx * ny, fill, dtype=pts.dtype)
+        reduce.at(z, gx * ny + gy, chunk[:, 2])
+        return z
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as ex:
+        z = fold(reduce, ex.map(reduce_chunk, point_chunks(len(pts))))
+
+    # Raster (nx, ny) dense, NaN pour les cellules sans point
+    z[np.isinf(z)] = np.nan
+    return z.reshape(nx, ny), min_x, min_y
+
+
+def raster_cells(raster, min_x, min_y):
+    gx, gy = np.nonzero(~np.isnan(raster))
+    out = np.column_stack((
+        min_x + gx * GRID_SIZE,
+        min_y + gy * GRID_SIZE,
+        raster[gx, gy],
+    ))
+    return out.tolist()
+
+
+def save_raster(name, lidar_id, raster, min_x, min_y):
+    np.savez(
+        os.path.join(DATA_DIR, f"{name}_{lidar_id}.npz"),
+        z=raster.astype(np.float32),
+        origin=np.array([min_x, min_y]),
+    )
+
+    load_raster.cache_clear()
+
+
+@lru_cache(maxsize=16)
+def load_raster(name, lidar_id):
+    path = os.path.join(DATA_DIR, f"{name}_{lidar_id}.npz")
+    if not os.path.exists(path):
+        raise HTTPException(404, f"{name.upper()} not generated")
+
+    with np.load(path) as data:
+        return data["z"], data["origin"]
 
 
 # -------------------------------------------------------
@@ -167,20 +465,9 @@ def generate_dtm(lidar_id: str):
     path = os.path.join(DATA_DIR, f"{lidar_id}.las")
     pts = load_points(path)
 
-    min_x, min_y = pts[:, 0].min(), pts[:, 1].min()
-    grid = {}
-
-    for p in pts:
-        gx = int((p[0] - min_x) / GRID_SIZE)
-        gy = int((p[1] - min_y) / GRID_SIZE)
-        key = (gx, gy)
-        grid[key] = min(grid.get(key, p[2]), p[2])
-
-    out = []
-    for (gx, gy), z in grid.items():
-        x = min_x + gx * GRID_SIZE
-        y = min_y + gy * GRID_SIZE
-        out.append([x, y, z])
+    raster, min_x, min_y = grid_reduce(pts, np.minimum)
+    save_raster("dtm", lidar_id, raster, min_x, min_y)
+    out = raster_cells(raster, min_x, min_y)
 
     with open(os.path.join(DATA_DIR, f"dtm_{lidar_id}.json"), "w") as f:
         json.dump(out, f)
@@ -196,20 +483,9 @@ def generate_dsm(lidar_id: str):
     path = os.path.join(DATA_DIR, f"{lidar_id}.las")
     pts = load_points(path)
 
-    min_x, min_y = pts[:, 0].min(), pts[:, 1].min()
-    grid = {}
-
-    for p in pts:
-        gx = int((p[0] - min_x) / GRID_SIZE)
-        gy = int((p[1] - min_y) / GRID_SIZE)
-        key = (gx, gy)
-        grid[key] = max(grid.get(key, p[2]), p[2])
-
-    out = []
-    for (gx, gy), z in grid.items():
-        x = min_x + gx * GRID_SIZE
-        y = min_y + gy * GRID_SIZE
-        out.append([x, y, z])
+    raster, min_x, min_y = grid_reduce(pts, np.maximum)
+    save_raster("dsm", lidar_id, raster, min_x, min_y)
+    out = raster_cells(raster, min_x, min_y)
 
     with open(os.path.join(DATA_DIR, f"dsm_{lidar_id}.json"), "w") as f:
         json.dump(out, f)
@@ -221,12 +497,50 @@ def generate_dsm(lidar_id: str):
 # Mesh terrain
 # -------------------------------------------------------
 @router.get("/files/{lidar_id}/terrain-mesh")
-def terrain_mesh(lidar_id: str):
-    with open(os.path.join(DATA_DIR, f"dtm_{lidar_id}.json")) as f:
-        vertices = json.load(f)
-
-    faces = [[i, i + 1, i + 2] for i in range(len(vertices) - 2)]
-    return {"vertices": vertices, "faces": faces}
+def terrain_mesh(lidar_id: str, format: str = "binary"):
+    z, (min_x, min_y) = load_raster("dtm", lidar_id)
+    nx, ny = z.shape
+
+    # Deux triangles par maille de la grille DTM, indices des sommets i * ny + j
+    i, j = np.meshgrid(np.arange(nx - 1), np.arange(ny - 1), indexing="ij")
+    v0 = (i * ny + j).ravel()
+    faces = np.concatenate((
+        np.stack((v0, v0 + 1, v0 + ny), axis=1),
+        np.stack((v0 + 1, v0 + ny + 1, v0 + ny), axis=1),
+    ))
+
+    # Seules les cellules renseignées sont des sommets (indices renumérotés)
+    valid = ~np.isnan(z.ravel())
+    faces = faces[valid[faces].all(axis=1)]
+    remap = np.cumsum(valid) - 1
+    faces = remap[faces].astype(np.uint32)
+
+    gx, gy = np.nonzero(~np.isnan(z))
+    vertices = np.column_stack((
+        min_x + gx * GRID_SIZE,
+        min_y + gy * GRID_SIZE,
+        z[gx, gy],
+    ))
+
+    if format == "json":
+        return JSONResponse(content={
+            "vertices": vertices.tolist(),
+            "faces": faces.tolist(),
+        })
+
+    # Sommets float32 relatifs à X-Points-Origin, puis faces uint32
+    origin = vertices.min(axis=0) if len(vertices) else np.zeros(3)
+    data = np.ascontiguousarray(vertices - origin, dtype="<f4").tobytes()
+
+    return Response(
+        content=data + faces.astype("<u4").tobytes(),
+        media_type="application/octet-stream",
+        headers={
+            "X-Vertex-Count": str(len(vertices)),
+            "X-Face-Count": str(len(faces)),
+            "X-Points-Origin": ",".join(repr(float(v)) for v in origin),
+        },
+    )
 
 
 # -------------------------------------------------------
@@ -238,16 +552,18 @@ def classify_points(lidar_id: str):
     pts = load_points(path)
 
     ground = np.percentile(pts[:, 2], 5)
-    classified = []
-
-    for p in pts:
-        cls = "ground" if p[2] - ground < 1 else "building"
-        classified.append([p[0], p[1], p[2], cls])
-
-    with open(os.path.join(DATA_DIR, f"classified_{lidar_id}.json"), "w") as f:
-        json.dump(classified, f)
+    classes = np.where(
+        pts[:, 2] - ground < 1, CLASS_GROUND, CLASS_BUILDING
+    ).astype(np.uint8)
+
+    # Points et codes de classe alignés, en binaire
+    np.savez(
+        os.path.join(DATA_DIR, f"classified_{lidar_id}.npz"),
+        points=pts,
+        classes=classes,
+    )
 
-    return {"points": len(classified)}
+    return {"points": len(classes)}
 
 
 # -------------------------------------------------------
@@ -259,10 +575,9 @@ def extract_buildings(lidar_id: str):
     pts = load_points(path)
 
     ground = np.percentile(pts[:, 2], 5)
-    buildings = [p.tolist() for p in pts if p[2] - ground > 2]
+    buildings = pts[pts[:, 2] - ground > 2]
 
-    with open(os.path.join(DATA_DIR, f"buildings_{lidar_id}.json"), "w") as f:
-        json.dump(buildings, f)
+    np.save(os.path.join(DATA_DIR, f"buildings_{lidar_id}.npy"), buildings)
 
     return {"building_points": len(buildings)}
 
@@ -272,20 +587,16 @@ def extract_buildings(lidar_id: str):
 # -------------------------------------------------------
 @router.post("/files/{lidar_id}/building-heights")
 def building_heights(lidar_id: str):
-    with open(os.path.join(DATA_DIR, f"dtm_{lidar_id}.json")) as f:
-        dtm = {tuple(p[:2]): p[2] for p in json.load(f)}
+    dtm, dtm_origin = load_raster("dtm", lidar_id)
+    dsm, dsm_origin = load_raster("dsm", lidar_id)
 
-    with open(os.path.join(DATA_DIR, f"dsm_{lidar_id}.json")) as f:
-        dsm = json.load(f)
+    # DTM et DSM issus des mêmes points : même origine, même grille
+    if dtm.shape != dsm.shape or not np.array_equal(dtm_origin, dsm_origin):
+        raise HTTPException(409, "DTM and DSM grids differ, regenerate both")
 
-    heights = []
-    for x, y, z in dsm:
-        ground = dtm.get((x, y), z)
-        h = max(0, z - ground)
-        if h > 2:
-            heights.append([x, y, h])
-
-    return {"buildings_detected": len(heights)}
+    # Cellules vides (NaN) jamais retenues
+    h = np.maximum(dsm - dtm, 0)
+    return {"buildings_detected": int(np.count_nonzero(h > 2))}
 
 
 # -------------------------------------------------------
@@ -296,11 +607,12 @@ def compute_volume(lidar_id: str):
     path = os.path.join(DATA_DIR, f"{lidar_id}.las")
     pts = load_points(path)
 
-    ground = np.percentile(pts[:, 2], 5)
+    z = pts[:, 2]
+    ground = np.percentile(z, 5)
     area = GRID_SIZE * GRID_SIZE
 
-    volume = sum(max(0, p[2] - ground) * area / 10 for p in pts)
-    return {"estimated_volume_m3": float(volume)}
+    volume = float(np.maximum(z - ground, 0.0).sum()) * (area / 10)
+    return {"estimated_volume_m3": volume}
 
 
 # -------------------------------------------------------
@@ -309,24 +621,30 @@ def compute_volume(lidar_id: str):
 @router.get("/files/{lidar_id}/drone-path")
 def drone_path(lidar_id: str):
     path = os.path.join(DATA_DIR, f"{lidar_id}.las")
-    pts = load_points(path, 50_000)
+    (min_x, min_y, max_x, max_y), max_z = cloud_extent(path)
 
-    min_x, max_x = pts[:, 0].min(), pts[:, 0].max()
-    min_y, max_y = pts[:, 1].min(), pts[:, 1].max()
-    max_z = pts[:, 2].max() + 30
-
-    path_pts = []
+    # Aller-retour entre les bords y min / y max, à 30 m au-dessus du point le plus haut
     steps = 20
+    i = np.arange(steps)
+    path_pts = np.stack((
+        min_x + (max_x - min_x) * i / steps,
+        min_y + (max_y - min_y) * (i % 2),
+        np.full(steps, max_z + 30),
+    ), axis=1)
 
-    for i in range(steps):
-        x = min_x + (max_x - min_x) * i / steps
-        y = min_y + (max_y - min_y) * (i % 2)
-        path_pts.append([x, y, max_z])
-
-    return {"path": path_pts}
+    return {"path": path_pts.tolist()}
 # -------------------------------------------------------
 # Streaming par bounding box caméra
 # -------------------------------------------------------
+def in_bbox(pts, minx, miny, maxx, maxy):
+    return (
+        (pts[:, 0] >= minx)
+        & (pts[:, 0] <= maxx)
+        & (pts[:, 1] >= miny)
+        & (pts[:, 1] <= maxy)
+    )
+
+
 @router.get("/files/{lidar_id}/stream-bbox")
 def stream_bbox(
     lidar_id: str,
@@ -335,25 +653,47 @@ def stream_bbox(
     maxx: float,
     maxy: float,
     max_points: int = 200000,
+    format: str = "binary",
 ):
 
     path = os.path.join(DATA_DIR, f"{lidar_id}.las")
-    pts = load_points(path)
-
-    mask = (
-        (pts[:, 0] >= minx)
-        & (pts[:, 0] <= maxx)
-        & (pts[:, 1] >= miny)
-        & (pts[:, 1] <= maxy)
-    )
 
-    subset = pts[mask]
+    index = load_index(path)
+
+    if index is not None:
+        # Seules les cases de l'index recouvrant la bbox sont lues du mmap,
+        # rognées en x par recherche dichotomique (cases triées par x)
+        pts = open_points(path)
+        offsets = index["offsets"]
+        x_sorted = index.get("x_sorted", False)
+        (ix0, ix1), (iy0, iy1) = bucket_indices(
+            [minx, maxx], [miny, maxy], index["bounds"]
+        )
+
+        parts = [pts[:0]]
+        for ix in range(ix0, ix1 + 1):
+            for iy in range(iy0, iy1 + 1):
+                start = offsets[ix * INDEX_BUCKETS + iy]
+                stop = offsets[ix * INDEX_BUCKETS + iy + 1]
+
+                if x_sorted:
+                    xs = pts[start:stop, 0]
+                    stop = start + np.searchsorted(xs, maxx, side="right")
+                    start += np.searchsorted(xs, minx)
+
+                part = pts[start:stop]
+                parts.append(part[in_bbox(part, minx, miny, maxx, maxy)])
+
+        subset = np.concatenate(parts)
+    else:
+        pts = load_points(path)
+        subset = pts[in_bbox(pts, minx, miny, maxx, maxy)]
 
     if len(subset) > max_points:
-        idx = np.random.choice(len(subset), max_points, replace=False)
+        idx = rng.choice(len(subset), max_points, replace=False, shuffle=False)
         subset = subset[idx]
 
-    return {"points": subset.tolist()}
+    return points_response(subset, format)
 
 
 # -------------------------------------------------------
@@ -366,30 +706,68 @@ def stream_lod(
     camy: float,
     distance: float = 1000,
     budget: int = 200000,
+    format: str = "binary",
 ):
 
     path = os.path.join(DATA_DIR, f"{lidar_id}.las")
-    pts = load_points(path)
-
-    dx = pts[:, 0] - camx
-    dy = pts[:, 1] - camy
-    dist = np.sqrt(dx * dx + dy * dy)
-
-    factor = np.clip(distance / (dist + 1), 0.05, 1)
-    keep = np.random.rand(len(pts)) < factor
-
-    subset = pts[keep]
+    index = load_index(path)
+
+    if index is not None:
+        # Facteur de LOD par case de l'index (distance au centre de la case) :
+        # nombre de points gardés tiré par case, puis tirage dans sa plage du mmap
+        pts = open_points(path)
+        offsets = np.asarray(index["offsets"])
+        counts = np.diff(offsets)
+
+        min_x, min_y, max_x, max_y = index["bounds"]
+        size_x = max(max_x - min_x, 1e-9) / INDEX_BUCKETS
+        size_y = max(max_y - min_y, 1e-9) / INDEX_BUCKETS
+        bucket = np.arange(INDEX_BUCKETS * INDEX_BUCKETS)
+        dx = min_x + (bucket // INDEX_BUCKETS + 0.5) * size_x - camx
+        dy = min_y + (bucket % INDEX_BUCKETS + 0.5) * size_y - camy
+        dist = np.sqrt(dx * dx + dy * dy)
+
+        factor = np.clip(distance / (dist + 1), 0.05, 1)
+        kept = rng.binomial(counts, factor)
+
+        idx = np.concatenate([
+            offsets[b] + rng.choice(counts[b], kept[b], replace=False, shuffle=False)
+            for b in np.flatnonzero(kept)
+        ] + [np.empty(0, dtype=np.int64)])
+        subset = pts[np.sort(idx)]
+    else:
+        pts = load_points(path)
+
+        dx = pts[:, 0] - camx
+        dy = pts[:, 1] - camy
+        dist = np.sqrt(dx * dx + dy * dy)
+
+        factor = np.clip(distance / (dist + 1), 0.05, 1)
+        keep = rng.random(len(pts)) < factor
+
+        subset = pts[keep]
 
     if len(subset) > budget:
-        idx = np.random.choice(len(subset), budget, replace=False)
+        idx = rng.choice(len(subset), budget, replace=False, shuffle=False)
         subset = subset[idx]
 
-    return {"points": subset.tolist()}
+    return points_response(subset, format)
 
 
 # -------------------------------------------------------
 # Streaming par tuiles visibles
 # -------------------------------------------------------
+@lru_cache(maxsize=8)
+def load_tile_index(lidar_id):
+    index_file = os.path.join(DATA_DIR, f"tiles_{lidar_id}", "index.json")
+
+    if not os.path.exists(index_file):
+        return None
+
+    with open(index_file) as f:
+        return json.load(f)
+
+
 @router.get("/files/{lidar_id}/visible-tiles")
 def visible_tiles(
     lidar_id: str,
@@ -399,24 +777,23 @@ def visible_tiles(
     maxy: float,
 ):
 
-    tile_dir = os.path.join(DATA_DIR, f"tiles_{lidar_id}")
+    index = load_tile_index(lidar_id)
 
-    if not os.path.exists(tile_dir):
+    if index is None:
         raise HTTPException(404, "Tiles not generated")
 
+    # Tuiles relatives à l'origine (min_x, min_y) du nuage, comme generate_tiles
+    origin_x, origin_y = index["origin"]
     tiles = []
 
-    for fname in os.listdir(tile_dir):
-        tx, ty = fname.replace(".json", "").split("_")
-        tx, ty = int(tx), int(ty)
-
-        x0 = tx * TILE_SIZE
-        y0 = ty * TILE_SIZE
+    for tx, ty in index["tiles"]:
+        x0 = origin_x + tx * TILE_SIZE
+        y0 = origin_y + ty * TILE_SIZE
         x1 = x0 + TILE_SIZE
         y1 = y0 + TILE_SIZE
 
         if not (x1 < minx or x0 > maxx or y1 < miny or y0 > maxy):
-            tiles.append(fname)
+            tiles.append(f"{tx}_{ty}.npy")
 
     return {"tiles": tiles}
 
@@ -425,13 +802,13 @@ def visible_tiles(
 # Budget GPU anti-freeze
 # -------------------------------------------------------
 @router.get("/files/{lidar_id}/point-budget")
-def point_budget(lidar_id: str, budget: int = 150000):
+def point_budget(lidar_id: str, budget: int = 150000, format: str = "binary"):
 
     path = os.path.join(DATA_DIR, f"{lidar_id}.las")
     pts = load_points(path)
 
     if len(pts) > budget:
-        idx = np.random.choice(len(pts), budget, replace=False)
+        idx = rng.choice(len(pts), budget, replace=False, shuffle=False)
         pts = pts[idx]
 
-    return {"points": pts.tolist()}
\ No newline at end of file
+    return points_response(pts, format)
\ No newline at end of file
@@ -141,7 +141,7 @@
                     }
                 });
                 
-                const area_sqm = data.properties.area_sq_degrees * 111320 * 111320;
+                const area_sqm = data.properties.area_m2;
                 
                 bufferLayer.bindPopup(`
                     <strong>Zone Buffer</strong><br>
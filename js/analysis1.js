@@ -60,7 +60,7 @@ document.getElementById('btn-run-buffer')?.addEventListener('click', async () =>
                 </h5>
                 <hr>
                 <p><strong>Distance:</strong> ${distance} mètres</p>
-                <p><strong>Surface:</strong> ${(result.properties.area_sq_degrees * 111320 * 111320).toFixed(2)} m²</p>
+                <p><strong>Surface:</strong> ${result.properties.area_m2.toFixed(2)} m²</p>
                 <p class="mb-0"><strong>ID:</strong> #${result.properties.analysis_id}</p>
             </div>
         `;
@@ -200,7 +200,7 @@ class APIClient {
 
     // Simulation d'inondation
     async simulateFlood(waterLevel, demSource = 'lidar', areaGeoJSON = null) {
-        return this.request('/simulation/flood', {
+        return this.request('/simulation/basic/flood', {
             method: 'POST',
             body: JSON.stringify({
                 water_level: waterLevel,
@@ -212,7 +212,7 @@ class APIClient {
 
     // Analyse de visibilité
     async calculateViewshed(observerPoint, observerHeight = 1.7, radius = 1000) {
-        return this.request('/simulation/viewshed', {
+        return this.request('/simulation/basic/viewshed', {
             method: 'POST',
             body: JSON.stringify({
                 observer_point: observerPoint,
@@ -225,7 +225,7 @@ class APIClient {
 
     // Ombrage solaire
     async calculateSolarShadow(buildingGeoJSON, buildingHeight, date, time, lat, lng) {
-        return this.request('/simulation/solar-shadow', {
+        return this.request('/simulation/basic/solar-shadow', {
             method: 'POST',
             body: JSON.stringify({
                 building_geojson: buildingGeoJSON,
@@ -241,19 +241,19 @@ class APIClient {
     // Liste des simulations
     async getSimulations(simulationType = null) {
         const endpoint = simulationType
-            ? `/simulation/results?simulation_type=${simulationType}`
-            : '/simulation/results';
+            ? `/simulation/basic/results?simulation_type=${simulationType}`
+            : '/simulation/basic/results';
         return this.request(endpoint);
     }
 
     // Résultat d'une simulation
     async getSimulationResult(simulationId) {
-        return this.request(`/simulation/results/${simulationId}`);
+        return this.request(`/simulation/basic/results/${simulationId}`);
     }
 
     // Supprimer une simulation
     async deleteSimulation(simulationId) {
-        return this.request(`/simulation/results/${simulationId}`, {
+        return this.request(`/simulation/basic/results/${simulationId}`, {
             method: 'DELETE'
         });
     }
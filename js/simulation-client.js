@@ -21,6 +21,7 @@
         ENDPOINTS: {
             FLOOD: '/flood',
             VIEWSHED: '/viewshed',
+            VIEWSHED_BATCH: '/viewshed-batch',
             SOLAR_SHADOW: '/solar-shadow',
             SLOPE: '/slope-analysis',
             RESULTS: '/results',
@@ -119,6 +120,49 @@
             }
         }
         
+        /**
+         * Visibilité cumulée de plusieurs observateurs (un seul MNT)
+         */
+        async runViewshedBatch(observerPoints, options = {}) {
+            console.log('👁️ Analyse viewshed cumulée');
+            
+            const payload = {
+                observers: observerPoints.map(point => ({
+                    observer_point: {
+                        type: 'Point',
+                        coordinates: [point.lng, point.lat]
+                    },
+                    observer_height: options.observerHeight || 1.7,
+                    target_height: options.targetHeight || 0
+                })),
+                radius: options.radius || 1000,
+                dem_source: options.demSource || 'lidar',
+                resolution: options.resolution || 5.0,
+                include_grid: options.includeGrid || false
+            };
+            
+            try {
+                const response = await fetch(SIMULATION_API.BASE_URL + SIMULATION_API.ENDPOINTS.VIEWSHED_BATCH, {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify(payload)
+                });
+                
+                if (!response.ok) {
+                    throw new Error(`Erreur HTTP: ${response.status}`);
+                }
+                
+                const data = await response.json();
+                console.log('✅ Analyse viewshed cumulée réussie:', data);
+                
+                return data;
+                
+            } catch (error) {
+                console.error('❌ Erreur viewshed cumulé:', error);
+                throw error;
+            }
+        }
+        
         /**
          * Calcul ombre solaire
          */